@@ -1,27 +1,41 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Blueprint, Response, request, jsonify, current_app, g, stream_with_context
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, jwt_required, create_access_token, create_refresh_token, get_jwt_identity
 import os
-import io
+import re
 import logging
-from models import db, User, Pattern, PatternPDF
+from datetime import datetime
+from marshmallow import ValidationError, EXCLUDE
+from sqlalchemy.exc import IntegrityError
+from models import db, User, Pattern, PatternPDF, PATTERN_FIELDS
+from blobs import iter_blob, stream_zip, resolve_range, blob_etag
+from changes import changes_bp
+from facets import facets_bp
+from stash import stash_bp
+from filters import load_pattern_filters, apply_pattern_filters
+from commands import register_commands
+from ratelimit import rate_limit, init_rate_limits
+from replicas import init_replicas
+from memory import memory_bp, byte_budget, init_memory_tracking
+from logs import init_logging
+from frontend import init_frontend
+from ownership import (owner_scoped, scope_to_owner, accessible_patterns, get_accessible_pattern, is_admin,
+                       signed_url_or_token)
+from pattern_store import upsert_pattern, SOURCE_USER, SOURCE_SCRAPE
+from pdf_ingest import ingest_pdf, upload_hash, IngestedPDF
+from thumbnails import thumbnail_versions, thumbnails_etag, thumbnail_rows, pack_thumbnails
 from config import Config
+from scraper import BRAND_MAPPINGS, scrape_pattern
+from validation import PatternSchema, PatternUpdateSchema, ScrapeQuerySchema, PatternBatchSchema, ThumbnailBatchSchema
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-app.config.from_object(Config)
-CORS(app)
-jwt = JWTManager(app)
-db.init_app(app)
-
-with app.app_context():
-    db.create_all()
+# All API routes live on this blueprint; the app itself is built by create_app()
+api_bp = Blueprint('api', __name__)
 
 # Authentication routes
-@app.route('/api/auth/login', methods=['POST'])
+@api_bp.route('/api/auth/login', methods=['POST'])
+@rate_limit('auth')
 def login():
     """Login route"""
     try:
@@ -47,10 +61,10 @@ def login():
             "user": user.to_dict()
         }), 200
     except Exception as e:
-        logger.error(f"Login error: {str(e)}")
+        logger.error("Login error: %s", e)
         return jsonify({"error": "Login failed"}), 500
 
-@app.route('/api/auth/check', methods=['GET'])
+@api_bp.route('/api/auth/check', methods=['GET'])
 @jwt_required()
 def check_auth():
     """Check if user is authenticated"""
@@ -67,11 +81,11 @@ def check_auth():
         
         return jsonify(user.to_dict()), 200
     except Exception as e:
-        logger.error(f"Auth check error: {str(e)}")
+        logger.error("Auth check error: %s", e)
         return jsonify({"error": "Authentication check failed"}), 500
 
 # Add the missing /api/auth/me endpoint
-@app.route('/api/auth/me', methods=['GET'])
+@api_bp.route('/api/auth/me', methods=['GET'])
 @jwt_required()
 def get_current_user():
     """Get current authenticated user"""
@@ -88,26 +102,35 @@ def get_current_user():
         
         return jsonify(user.to_dict()), 200
     except Exception as e:
-        logger.error(f"Get current user error: {str(e)}")
+        logger.error("Get current user error: %s", e)
         return jsonify({"error": "Failed to get current user"}), 500
 
 # Pattern routes with pagination
-@app.route('/api/patterns', methods=['GET'])
+@api_bp.route('/api/patterns', methods=['GET'])
 @jwt_required()
+@rate_limit('list')
+@owner_scoped
 def get_patterns():
-    """Get all patterns with pagination"""
+    """Get the user's patterns with pagination and optional filters"""
+    try:
+        filters = load_pattern_filters(request.args)
+    except ValidationError as err:
+        return jsonify({"error": "Validation error", "details": err.messages}), 400
+    
     try:
         # Get pagination parameters from request
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
         
+        query = scope_to_owner(apply_pattern_filters(Pattern.query, filters))
+        
         # Get total count first (lightweight query)
-        total_count = Pattern.query.count()
+        total_count = query.count()
         
         # Then get just the patterns for this page
-        patterns = Pattern.query.limit(per_page).offset((page-1)*per_page).all()
+        patterns = query.order_by(Pattern.id).limit(per_page).offset((page-1)*per_page).all()
         
-        logger.info(f"Fetched page {page} of patterns ({len(patterns)} items)")
+        logger.debug("Fetched page %s of patterns (%s items)", page, len(patterns))
         
         return jsonify({
             'items': [pattern.to_dict() for pattern in patterns],
@@ -116,96 +139,225 @@ def get_patterns():
             'per_page': per_page
         })
     except Exception as e:
-        logger.error(f"Error fetching patterns: {str(e)}")
+        logger.error("Error fetching patterns: %s", e)
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/patterns/<int:pattern_id>', methods=['GET'])
+@api_bp.route('/api/patterns/<int:pattern_id>', methods=['GET'])
 @jwt_required()
 def get_pattern(pattern_id):
     """Get a specific pattern"""
     try:
-        pattern = Pattern.query.get(pattern_id)
+        pattern = get_accessible_pattern(pattern_id)
         
         if not pattern:
             return jsonify({"error": "Pattern not found"}), 404
         
         return jsonify(pattern.to_dict()), 200
     except Exception as e:
-        logger.error(f"Error fetching pattern {pattern_id}: {str(e)}")
+        logger.error("Error fetching pattern %s: %s", pattern_id, e)
+        return jsonify({"error": str(e)}), 500
+
+batch_schema = PatternBatchSchema()
+
+def split_list_arg(value):
+    """Split a comma separated query argument, dropping empty items."""
+    if value is None:
+        return None
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+@api_bp.route('/api/patterns/batch', methods=['GET', 'POST'])
+@jwt_required()
+@rate_limit('list')
+def get_patterns_batch():
+    """Get many patterns by id in one request
+    
+    GET /api/patterns/batch?ids=1,2,3&fields=title,brand or POST the same as
+    JSON ({"ids": [...], "fields": [...]}). Patterns are returned in the
+    requested order; ids that don't exist are listed under 'missing'.
+    """
+    try:
+        if request.method == 'POST':
+            raw = request.get_json(silent=True) or {}
+        else:
+            raw = {
+                'ids': split_list_arg(request.args.get('ids', '')),
+                'fields': split_list_arg(request.args.get('fields'))
+            }
+        data = batch_schema.load(raw)
+    except ValidationError as err:
+        return jsonify({"error": "Validation error", "details": err.messages}), 400
+    
+    # Drop duplicates but keep the requested order
+    ids = list(dict.fromkeys(data['ids']))
+    max_ids = current_app.config['BATCH_MAX_IDS']
+    if len(ids) > max_ids:
+        return jsonify({"error": f"At most {max_ids} ids can be fetched at once"}), 400
+    
+    fields = data.get('fields')
+    if fields is not None:
+        unknown = sorted(set(fields) - set(PATTERN_FIELDS))
+        if unknown:
+            return jsonify({"error": f"Unknown fields: {', '.join(unknown)}"}), 400
+    
+    try:
+        # One IN query for the patterns, plus one for their PDFs if requested
+        query = accessible_patterns(Pattern.query.filter(Pattern.id.in_(ids)))
+        if fields is None or 'pdf_files' in fields:
+            query = query.options(db.selectinload(Pattern.pdf_files))
+        found = {pattern.id: pattern for pattern in query}
+        
+        return jsonify({
+            'items': [found[pattern_id].to_dict(fields=fields) for pattern_id in ids if pattern_id in found],
+            'missing': [pattern_id for pattern_id in ids if pattern_id not in found]
+        }), 200
+    except Exception as e:
+        logger.error("Error fetching pattern batch: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+thumbnail_batch_schema = ThumbnailBatchSchema()
+
+@api_bp.route('/api/patterns/thumbnails', methods=['GET'])
+@jwt_required()
+@rate_limit('blob')
+def get_pattern_thumbnails():
+    """Get the thumbnails of many patterns in one packed response
+    
+        GET /api/patterns/thumbnails?ids=1,2,3
+    
+    See thumbnails.py for the format. Ids without a thumbnail, or of
+    patterns the user may not see, are listed under 'missing' in the index.
+    """
+    try:
+        data = thumbnail_batch_schema.load({'ids': split_list_arg(request.args.get('ids', ''))})
+    except ValidationError as err:
+        return jsonify({"error": "Validation error", "details": err.messages}), 400
+    
+    ids = list(dict.fromkeys(data['ids']))
+    max_ids = current_app.config['THUMBNAIL_MAX_IDS']
+    if len(ids) > max_ids:
+        return jsonify({"error": f"At most {max_ids} thumbnails can be fetched at once"}), 400
+    
+    try:
+        query = accessible_patterns(Pattern.query.filter(Pattern.id.in_(ids)))
+        etag = thumbnails_etag(ids, thumbnail_versions(query))
+        
+        # Revalidations are answered without reading any thumbnail data
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(pack_thumbnails(ids, thumbnail_rows(query)), mimetype='application/octet-stream')
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.set_etag(etag)
+        return response
+    except Exception as e:
+        logger.error("Error fetching thumbnails: %s", e)
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/patterns/<int:pattern_id>/image', methods=['GET'])
+@api_bp.route('/api/patterns/<int:pattern_id>/image', methods=['GET'])
+@signed_url_or_token
+@rate_limit('image')
 def get_pattern_image(pattern_id):
-    """Get a pattern's image"""
+    """Get a pattern's image, streamed from the database"""
     try:
-        pattern = Pattern.query.get(pattern_id)
+        query = db.session.query(db.func.length(Pattern.image_data)).filter(Pattern.id == pattern_id)
+        if not g.signed_url:
+            query = accessible_patterns(query)
+        length = query.scalar()
         
-        if not pattern or not pattern.image_data:
+        if not length:
             return jsonify({"error": "Image not found"}), 404
         
-        return send_file(
-            io.BytesIO(pattern.image_data),
-            mimetype='image/jpeg'
+        # iter_blob checks out a connection per chunk; don't hold one for the download
+        db.session.close()
+        return Response(
+            stream_with_context(iter_blob(Pattern.image_data, Pattern.id, pattern_id, length)),
+            mimetype='image/jpeg',
+            headers={'Content-Length': str(length)}
         )
     except Exception as e:
-        logger.error(f"Error fetching image for pattern {pattern_id}: {str(e)}")
+        logger.error("Error fetching image for pattern %s: %s", pattern_id, e)
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/patterns', methods=['POST'])
+pattern_schema = PatternSchema(unknown=EXCLUDE)
+
+@api_bp.route('/api/patterns', methods=['POST'])
 @jwt_required()
+@byte_budget('IMAGE_UPLOAD_MAX_BYTES')
 def create_pattern():
-    """Create a new pattern"""
+    """Create a new pattern, or update the existing one with the same brand and pattern number"""
+    try:
+        # Handle form data (or JSON)
+        raw = request.get_json(silent=True) or request.form.to_dict()
+        # Forms send empty strings for fields left blank
+        data = pattern_schema.load({key: value for key, value in raw.items() if value != ''})
+    except ValidationError as err:
+        return jsonify({"error": "Validation error", "details": err.messages}), 400
+    
     try:
-        # Handle form data
-        data = request.form.to_dict()
-        image_file = request.files.get('image')
-        
-        # Create pattern
-        pattern = Pattern(**data)
-        
         # Handle image if provided
+        image_file = request.files.get('image')
         if image_file:
-            pattern.image = image_file.read()
+            data['image_data'] = image_file.read()
+        
+        # Added to the creator's collection
+        data['user_id'] = int(get_jwt_identity())
         
-        db.session.add(pattern)
+        pattern, created = upsert_pattern(data, SOURCE_USER)
         db.session.commit()
         
-        return jsonify(pattern.to_dict()), 201
+        return jsonify(pattern.to_dict()), 201 if created else 200
     except Exception as e:
         db.session.rollback()
-        logger.error(f"Error creating pattern: {str(e)}")
+        logger.error("Error creating pattern: %s", e)
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/patterns/<int:pattern_id>', methods=['PUT'])
+# Editable columns only; ids, timestamps, blobs and to_dict() extras are dropped
+pattern_update_schema = PatternUpdateSchema(unknown=EXCLUDE, partial=True)
+
+@api_bp.route('/api/patterns/<int:pattern_id>', methods=['PUT'])
 @jwt_required()
 def update_pattern(pattern_id):
     """Update a pattern"""
     try:
-        pattern = Pattern.query.get(pattern_id)
+        pattern = get_accessible_pattern(pattern_id)
         
         if not pattern:
             return jsonify({"error": "Pattern not found"}), 404
         
-        data = request.get_json()
+        raw = request.get_json(silent=True)
+        if not isinstance(raw, dict):
+            return jsonify({"error": "Request body must be a JSON object"}), 400
+        try:
+            # The edit form sends empty strings for fields it cleared
+            data = pattern_update_schema.load({key: None if value == '' else value for key, value in raw.items()})
+        except ValidationError as err:
+            return jsonify({"error": "Validation error", "details": err.messages}), 400
+        
+        # Only admins move patterns between collections
+        if not is_admin():
+            data.pop('user_id', None)
         
         for key, value in data.items():
-            if hasattr(pattern, key):
-                setattr(pattern, key, value)
+            setattr(pattern, key, value)
         
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({"error": "A pattern with this brand and pattern number already exists in that collection"}), 409
         
         return jsonify(pattern.to_dict()), 200
     except Exception as e:
         db.session.rollback()
-        logger.error(f"Error updating pattern {pattern_id}: {str(e)}")
+        logger.error("Error updating pattern %s: %s", pattern_id, e)
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/patterns/<int:pattern_id>', methods=['DELETE'])
+@api_bp.route('/api/patterns/<int:pattern_id>', methods=['DELETE'])
 @jwt_required()
 def delete_pattern(pattern_id):
     """Delete a pattern"""
     try:
-        pattern = Pattern.query.get(pattern_id)
+        pattern = get_accessible_pattern(pattern_id)
         
         if not pattern:
             return jsonify({"error": "Pattern not found"}), 404
@@ -216,35 +368,175 @@ def delete_pattern(pattern_id):
         return jsonify({"message": "Pattern deleted"}), 200
     except Exception as e:
         db.session.rollback()
-        logger.error(f"Error deleting pattern {pattern_id}: {str(e)}")
+        logger.error("Error deleting pattern %s: %s", pattern_id, e)
         return jsonify({"error": str(e)}), 500
 
 # PDF routes
-@app.route('/api/pdfs/<int:pdf_id>', methods=['GET'])
+@api_bp.route('/api/pdfs/<int:pdf_id>', methods=['GET'])
+@signed_url_or_token
+@rate_limit('blob')
 def get_pdf(pdf_id):
-    """Get a PDF file"""
+    """Get a PDF file, streamed from the database; supports Range requests"""
     try:
-        pdf = PatternPDF.query.get(pdf_id)
-        
-        if not pdf or not pdf.pdf_data:
+        query = db.session.query(
+            PatternPDF.pattern_id, PatternPDF.category, PatternPDF.updated_at,
+            db.func.length(PatternPDF.pdf_data)
+        ).join(Pattern).filter(PatternPDF.id == pdf_id)
+        if not g.signed_url:
+            query = accessible_patterns(query)
+        row = query.first()
+        
+        if not row or not row[3]:
             return jsonify({"error": "PDF not found"}), 404
         
-        return send_file(
-            io.BytesIO(pdf.pdf_data),
+        pattern_id, category, updated_at, length = row
+        byte_range = resolve_range(
+            length, blob_etag(pdf_id, updated_at),
+            request.headers.get('Range'), request.headers.get('If-Range'),
+            request.headers.get('If-None-Match')
+        )
+        headers = dict(byte_range.headers)
+        headers['Content-Disposition'] = f'attachment; filename="{pattern_id}_{category}.pdf"'
+        if byte_range.status in (304, 416):
+            return Response(status=byte_range.status, headers=headers)
+        
+        headers['Content-Length'] = str(byte_range.stop - byte_range.start)
+        # iter_blob checks out a connection per chunk; don't hold one for the download
+        db.session.close()
+        return Response(
+            stream_with_context(iter_blob(
+                PatternPDF.pdf_data, PatternPDF.id, pdf_id, byte_range.stop, start=byte_range.start
+            )),
+            status=byte_range.status,
             mimetype='application/pdf',
-            as_attachment=True,
-            download_name=f"{pdf.pattern_id}_{pdf.category}.pdf"
+            headers=headers
         )
     except Exception as e:
-        logger.error(f"Error fetching PDF {pdf_id}: {str(e)}")
+        logger.error("Error fetching PDF %s: %s", pdf_id, e)
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/patterns/<int:pattern_id>/pdfs', methods=['POST'])
+@api_bp.route('/api/pdfs/<int:pdf_id>', methods=['DELETE'])
 @jwt_required()
+def delete_pdf(pdf_id):
+    """Delete a PDF file"""
+    try:
+        pdf = accessible_patterns(PatternPDF.query.join(Pattern)).filter(PatternPDF.id == pdf_id).first()
+        
+        if not pdf:
+            return jsonify({"error": "PDF not found"}), 404
+        
+        db.session.delete(pdf)
+        db.session.commit()
+        
+        return jsonify({"message": "PDF deleted"}), 200
+    except Exception as e:
+        db.session.rollback()
+        logger.error("Error deleting PDF %s: %s", pdf_id, e)
+        return jsonify({"error": str(e)}), 500
+
+def safe_filename(value):
+    """Make a value safe to use as a file or folder name inside a ZIP."""
+    return re.sub(r'[^A-Za-z0-9._\'-]+', '_', str(value)).strip('_') or 'file'
+
+def pdf_zip_response(pattern_ids, download_name):
+    """Stream all PDFs of the given patterns as one ZIP archive.
+    
+    Files are ordered by file_order within each pattern; with more than one
+    pattern each gets its own folder, named after its id, brand and number
+    (brand and number alone repeat across collections).
+    """
+    rows = db.session.query(
+        PatternPDF.id, PatternPDF.pattern_id, PatternPDF.category,
+        PatternPDF.created_at, db.func.length(PatternPDF.pdf_data),
+        Pattern.brand, Pattern.pattern_number
+    ).join(Pattern).filter(
+        PatternPDF.pattern_id.in_(pattern_ids),
+        PatternPDF.pdf_data.isnot(None)
+    ).order_by(
+        PatternPDF.pattern_id, PatternPDF.file_order.asc().nulls_last(), PatternPDF.id
+    ).all()
+    
+    if not rows:
+        return jsonify({"error": "No PDFs found"}), 404
+    
+    multiple = len({row.pattern_id for row in rows}) > 1
+    # iter_blob checks out a connection per chunk; don't hold one for the download
+    db.session.close()
+    
+    def entries():
+        position = {}
+        for pdf_id, pattern_id, category, created_at, length, brand, pattern_number in rows:
+            position[pattern_id] = position.get(pattern_id, 0) + 1
+            name = f"{position[pattern_id]:02d}_{safe_filename(category)}.pdf"
+            if multiple:
+                name = f"{pattern_id}_{safe_filename(brand)}_{safe_filename(pattern_number)}/{name}"
+            date_time = (created_at or datetime.utcnow()).timetuple()[:6]
+            yield name, date_time, length, iter_blob(PatternPDF.pdf_data, PatternPDF.id, pdf_id, length)
+    
+    return Response(
+        stream_with_context(stream_zip(entries())),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename="{download_name}"'}
+    )
+
+@api_bp.route('/api/patterns/<int:pattern_id>/pdfs.zip', methods=['GET'])
+@jwt_required()
+@rate_limit('blob')
+def get_pattern_pdfs_zip(pattern_id):
+    """Download all PDFs of a pattern as a ZIP archive"""
+    try:
+        pattern = get_accessible_pattern(pattern_id)
+        
+        if not pattern:
+            return jsonify({"error": "Pattern not found"}), 404
+        
+        return pdf_zip_response(
+            [pattern_id],
+            f"{safe_filename(pattern.brand)}_{safe_filename(pattern.pattern_number)}.zip"
+        )
+    except Exception as e:
+        logger.error("Error building PDF archive for pattern %s: %s", pattern_id, e)
+        return jsonify({"error": str(e)}), 500
+
+@api_bp.route('/api/pdfs/zip', methods=['GET'])
+@jwt_required()
+@rate_limit('blob')
+def get_pdfs_zip():
+    """Download all PDFs of several patterns (?pattern_ids=1,2,3) as one ZIP archive"""
+    try:
+        pattern_ids = [int(item) for item in split_list_arg(request.args.get('pattern_ids', ''))]
+    except ValueError:
+        return jsonify({"error": "pattern_ids must be a comma separated list of integers"}), 400
+    
+    if not pattern_ids:
+        return jsonify({"error": "pattern_ids is required"}), 400
+    
+    max_ids = current_app.config['BATCH_MAX_IDS']
+    if len(pattern_ids) > max_ids:
+        return jsonify({"error": f"At most {max_ids} patterns can be downloaded at once"}), 400
+    
+    try:
+        # Patterns the user may not open are reported like ones that don't exist
+        accessible = {row.id for row in accessible_patterns(
+            db.session.query(Pattern.id).filter(Pattern.id.in_(pattern_ids))
+        )}
+        missing = [pattern_id for pattern_id in dict.fromkeys(pattern_ids) if pattern_id not in accessible]
+        if missing:
+            return jsonify({"error": "Patterns not found", "missing": missing}), 404
+        
+        return pdf_zip_response(pattern_ids, "patterns.zip")
+    except Exception as e:
+        logger.error("Error building PDF archive: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+@api_bp.route('/api/patterns/<int:pattern_id>/pdfs', methods=['POST'])
+@jwt_required()
+@rate_limit('blob')
+@byte_budget('PDF_UPLOAD_MAX_BYTES')
 def upload_pdf(pattern_id):
     """Upload a PDF for a pattern"""
     try:
-        pattern = Pattern.query.get(pattern_id)
+        pattern = get_accessible_pattern(pattern_id)
         
         if not pattern:
             return jsonify({"error": "Pattern not found"}), 404
@@ -255,36 +547,68 @@ def upload_pdf(pattern_id):
         if not pdf_file:
             return jsonify({"error": "PDF file is required"}), 400
         
+        data = pdf_file.read()
+        sha256 = upload_hash(data)
+        
+        # The same file uploaded again for this pattern: keep the existing copy
+        existing = PatternPDF.query.filter_by(pattern_id=pattern_id, upload_sha256=sha256).first()
+        if existing:
+            return jsonify(existing.to_dict()), 200
+        
+        # Already ingested for another pattern: copy its optimized bytes
+        # instead of running the ingest step again. This only saves the
+        # CPU time of optimizing; each pattern's row stores its own copy.
+        same_file = db.session.query(PatternPDF.id).filter_by(upload_sha256=sha256).first()
+        if same_file:
+            source = PatternPDF.query.options(db.undefer(PatternPDF.pdf_data)).get(same_file.id)
+            stored = IngestedPDF(source.pdf_data, sha256, len(data), len(source.pdf_data))
+        else:
+            stored = ingest_pdf(
+                data,
+                optimize=current_app.config['PDF_OPTIMIZE'],
+                recompress=current_app.config['PDF_RECOMPRESS']
+            )
+        
         # Create PDF record
         pdf = PatternPDF(
             pattern_id=pattern_id,
             category=category,
-            pdf_data=pdf_file.read()
+            pdf_data=stored.data,
+            upload_sha256=stored.upload_sha256,
+            original_size=stored.original_size,
+            stored_size=stored.stored_size
         )
         
         db.session.add(pdf)
         db.session.commit()
         
+        logger.info("Stored PDF %s for pattern %s: %s bytes uploaded, %s stored",
+                    pdf.id, pattern_id, stored.original_size, stored.stored_size)
         return jsonify(pdf.to_dict()), 201
     except Exception as e:
         db.session.rollback()
-        logger.error(f"Error uploading PDF for pattern {pattern_id}: {str(e)}")
+        logger.error("Error uploading PDF for pattern %s: %s", pattern_id, e)
         return jsonify({"error": str(e)}), 500
 
 # New route to get all PDFs with pagination
-@app.route('/api/pattern_pdfs', methods=['GET'])
+@api_bp.route('/api/pattern_pdfs', methods=['GET'])
+@jwt_required()
+@rate_limit('list')
+@owner_scoped
 def get_all_pdfs():
-    """Get all pattern PDFs with pagination"""
+    """Get the PDFs of the user's patterns with pagination"""
     try:
         # Get pagination parameters from request
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
         
+        query = scope_to_owner(PatternPDF.query.join(Pattern))
+        
         # Get total count
-        total_count = PatternPDF.query.count()
+        total_count = query.count()
         
         # Get PDFs for this page
-        pdfs = PatternPDF.query.limit(per_page).offset((page-1)*per_page).all()
+        pdfs = query.order_by(PatternPDF.id).limit(per_page).offset((page-1)*per_page).all()
         
         # Get pattern information for each PDF
         pdf_list = []
@@ -305,14 +629,105 @@ def get_all_pdfs():
             'per_page': per_page
         })
     except Exception as e:
-        logger.error(f"Error getting all PDFs: {str(e)}")
+        logger.error("Error getting all PDFs: %s", e)
         return jsonify({"error": "Failed to retrieve PDFs"}), 500
 
+# Scraper route
+scrape_query_schema = ScrapeQuerySchema()
+
+@api_bp.route('/api/scrape', methods=['GET'])
+@jwt_required()
+@rate_limit('scrape')
+def scrape():
+    """Scrape pattern details from the vendor site (the image is referenced by URL)"""
+    errors = scrape_query_schema.validate(request.args)
+    if errors:
+        return jsonify({"error": errors}), 400
+    
+    brand = request.args['brand']
+    if brand not in BRAND_MAPPINGS:
+        return jsonify({"error": f"Brand '{brand}' is not supported"}), 400
+    
+    data = scrape_pattern(
+        brand,
+        request.args['pattern_number'],
+        include_image=False
+    )
+    if 'error' in data:
+        return jsonify(data), 502
+    
+    return jsonify(data), 200
+
+@api_bp.route('/api/scrape', methods=['POST'])
+@jwt_required()
+@rate_limit('scrape')
+def scrape_and_import():
+    """Scrape a pattern and add it, or fill in the gaps of the existing one"""
+    raw = request.get_json(silent=True) or request.form.to_dict()
+    errors = scrape_query_schema.validate(raw)
+    if errors:
+        return jsonify({"error": errors}), 400
+    
+    brand = raw['brand']
+    if brand not in BRAND_MAPPINGS:
+        return jsonify({"error": f"Brand '{brand}' is not supported"}), 400
+    
+    data = scrape_pattern(brand, raw['pattern_number'])
+    if 'error' in data:
+        return jsonify(data), 502
+    data['user_id'] = int(get_jwt_identity())
+    
+    try:
+        pattern, created = upsert_pattern(data, SOURCE_SCRAPE)
+        db.session.commit()
+        
+        return jsonify(pattern.to_dict()), 201 if created else 200
+    except Exception as e:
+        db.session.rollback()
+        logger.error("Error importing scraped pattern %s %s: %s", brand, raw['pattern_number'], e)
+        return jsonify({"error": str(e)}), 500
+
 # Test endpoint
-@app.route('/api/test', methods=['GET'])
+@api_bp.route('/api/test', methods=['GET'])
 def test_endpoint():
     """Simple test endpoint that doesn't require authentication"""
     return jsonify({"status": "ok", "message": "API is working"}), 200
 
+def init_migrations(app):
+    """Register Flask-Migrate for the `flask db` commands.
+
+    Only the CLI needs it, so web workers skip importing alembic.
+    """
+    if os.environ.get('FLASK_RUN_FROM_CLI') != 'true':
+        return
+    from flask_migrate import Migrate
+    Migrate(app, db, directory=os.path.join(os.path.dirname(__file__), 'migrations'))
+
+def create_app(config_class=Config):
+    """Application factory.
+
+    Building the app never touches the database; the schema is managed by
+    the migrations in ./migrations (`flask db upgrade`).
+    """
+    app = Flask(__name__)
+    app.config.from_object(config_class)
+    # First, so every request (even one turned away) gets an id and access log line
+    init_logging(app)
+    CORS(app)
+    JWTManager(app)
+    db.init_app(app)
+    init_rate_limits(app)
+    init_replicas(app, db)
+    init_memory_tracking(app)
+    init_migrations(app)
+    register_commands(app)
+    app.register_blueprint(api_bp)
+    app.register_blueprint(changes_bp)
+    app.register_blueprint(facets_bp)
+    app.register_blueprint(stash_bp)
+    app.register_blueprint(memory_bp)
+    init_frontend(app)
+    return app
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', debug=True)
+    create_app().run(host='0.0.0.0', debug=True)
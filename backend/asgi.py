@@ -0,0 +1,359 @@
+"""
+Optional ASGI entry point for the Sewing Patterns backend.
+
+Blob downloads and scraping are almost entirely I/O wait. Under this
+server they run on an event loop with an async Postgres driver (asyncpg),
+streaming blobs in chunks, while every other request is handed to the
+regular Flask app unchanged.
+
+    pip install -r requirements-async.txt
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import contextlib
+import functools
+import logging
+
+import jwt
+from a2wsgi import WSGIMiddleware
+from sqlalchemy import select, func
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route, Mount
+
+from app import create_app
+from blobs import BLOB_CHUNK_SIZE, resolve_range, blob_etag
+from config import Config
+from models import db, User, Pattern, PatternPDF
+from pattern_store import upsert_pattern, SOURCE_SCRAPE
+from logs import REQUEST_ID_HEADER, new_request_id, start_request, end_request
+from ratelimit import client_key
+from scraper import BRAND_MAPPINGS, scrape_pattern_async
+from signed_urls import verify_url
+from validation import ScrapeQuerySchema
+
+logger = logging.getLogger(__name__)
+
+# Async driver to use for each database backend
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+# Match flask_cors' defaults for the routes served here
+CORS_HEADERS = {'Access-Control-Allow-Origin': '*'}
+
+def async_database_url(url):
+    """Swap the sync DBAPI in a database URL for its async counterpart."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{backend}'")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+# No pool_pre_ping: iter_blob checks out a connection per chunk, and a
+# ping on each checkout would double its round trips. As in the Flask app,
+# a dropped connection fails one query and the pool is then refreshed.
+engine = create_async_engine(async_database_url(Config.SQLALCHEMY_DATABASE_URI))
+
+def error_response(error, status_code, headers=None, **extra):
+    """JSON error in the same shape as the Flask routes."""
+    return JSONResponse({"error": error, **extra}, status_code=status_code,
+                        headers={**CORS_HEADERS, **(headers or {})})
+
+def rejection_response(rejection):
+    """429/503 response for a request turned away by the rate limits."""
+    return error_response(rejection.error, rejection.status, retry_after=rejection.retry_after,
+                          headers={'Retry-After': str(rejection.retry_after)})
+
+async def release_after(chunks, release):
+    """Pass chunks through, then call release however the stream ends."""
+    try:
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        release()
+
+def rate_limit(endpoint_class):
+    """Async counterpart of ratelimit.rate_limit, sharing the Flask app's limits.
+
+    The request counts as in flight, and blob requests hold a streaming
+    slot, until the response body has been sent.
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(request):
+            limits = flask_app.extensions['rate_limits']
+            client = client_key(verify_access_token(request), request.client.host if request.client else None)
+            rejection = limits.admit(endpoint_class, client)
+            if not rejection and endpoint_class == 'blob':
+                rejection = limits.acquire_blob_stream()
+            if rejection:
+                return rejection_response(rejection)
+
+            def release():
+                limits.in_flight.release()
+                if endpoint_class == 'blob':
+                    limits.release_blob_stream()
+
+            limits.in_flight.acquire()
+            try:
+                response = await handler(request)
+            except BaseException:
+                release()
+                raise
+            if isinstance(response, StreamingResponse):
+                response.body_iterator = release_after(response.body_iterator, release)
+            else:
+                release()
+            return response
+        return wrapper
+    return decorator
+
+def log_request(handler):
+    """Give the request an id and an access log line, like logs.init_logging.
+
+    Streamed responses are logged when they start rather than when the
+    body has been sent.
+    """
+    @functools.wraps(handler)
+    async def wrapper(request):
+        request_id = new_request_id(request.headers.get(REQUEST_ID_HEADER))
+        token = start_request(request_id)
+        try:
+            response = await handler(request)
+        except BaseException:
+            end_request(token, request.method, request.url.path, 500)
+            raise
+        response.headers[REQUEST_ID_HEADER] = request_id
+        end_request(token, request.method, request.url.path, response.status_code)
+        return response
+    return wrapper
+
+async def blob_length(column, key_column, key):
+    """Return the blob size in bytes, or None if the row or blob is missing."""
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            select(func.length(column)).where(key_column == key)
+        )
+        return result.scalar()
+
+async def iter_blob(column, key_column, key, length, start=0):
+    """Yield bytes [start, length) of a blob in BLOB_CHUNK_SIZE pieces.
+
+    A connection is checked out per chunk, so a slow client holds no
+    connection while its socket drains.
+    """
+    offset = start
+    while offset < length:
+        async with engine.connect() as conn:
+            result = await conn.execute(
+                select(func.substr(column, offset + 1, min(BLOB_CHUNK_SIZE, length - offset)))
+                .where(key_column == key)
+            )
+            chunk = result.scalar()
+        if not chunk:
+            break
+        offset += len(chunk)
+        yield bytes(chunk)
+
+def check_blob_access(request):
+    """Like ownership.signed_url_or_token: returns (signed, identity, error response)."""
+    if verify_url(request.url.path, request.query_params.get('expires'), request.query_params.get('signature'),
+                  secret=flask_app.config['SECRET_KEY']):
+        return True, None, None
+    identity = verify_access_token(request)
+    if identity is None:
+        return False, None, error_response("Authorization required", 401,
+                                           message="Request does not contain a valid access token")
+    return False, identity, None
+
+async def may_open(pattern_id, identity):
+    """Whether the user is the pattern's owner or an admin (ownership.accessible_patterns)."""
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            select(User.is_admin, Pattern.user_id == User.id)
+            .select_from(User).join(Pattern, Pattern.id == pattern_id)
+            .where(User.id == int(identity))
+        )
+        row = result.first()
+    return row is not None and (bool(row[0]) or bool(row[1]))
+
+@log_request
+@rate_limit('image')
+async def get_pattern_image(request):
+    """Stream a pattern's image"""
+    signed, identity, error = check_blob_access(request)
+    if error:
+        return error
+    pattern_id = request.path_params['pattern_id']
+    length = await blob_length(Pattern.image_data, Pattern.id, pattern_id)
+    if not length or not (signed or await may_open(pattern_id, identity)):
+        return error_response("Image not found", 404)
+
+    return StreamingResponse(
+        iter_blob(Pattern.image_data, Pattern.id, pattern_id, length),
+        media_type='image/jpeg',
+        headers={'Content-Length': str(length), **CORS_HEADERS}
+    )
+
+@log_request
+@rate_limit('blob')
+async def get_pdf(request):
+    """Stream a PDF file as an attachment; supports Range requests"""
+    signed, identity, error = check_blob_access(request)
+    if error:
+        return error
+    pdf_id = request.path_params['pdf_id']
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            select(PatternPDF.pattern_id, PatternPDF.category, PatternPDF.updated_at,
+                   func.length(PatternPDF.pdf_data))
+            .where(PatternPDF.id == pdf_id)
+        )
+        row = result.first()
+
+    if not row or not row[3] or not (signed or await may_open(row[0], identity)):
+        return error_response("PDF not found", 404)
+
+    pattern_id, category, updated_at, length = row
+    byte_range = resolve_range(
+        length, blob_etag(pdf_id, updated_at),
+        request.headers.get('Range'), request.headers.get('If-Range'),
+        request.headers.get('If-None-Match')
+    )
+    headers = {
+        **byte_range.headers,
+        'Content-Disposition': f'attachment; filename="{pattern_id}_{category}.pdf"',
+        **CORS_HEADERS
+    }
+    if byte_range.status in (304, 416):
+        return Response(status_code=byte_range.status, headers=headers)
+
+    headers['Content-Length'] = str(byte_range.stop - byte_range.start)
+    return StreamingResponse(
+        iter_blob(PatternPDF.pdf_data, PatternPDF.id, pdf_id, byte_range.stop, start=byte_range.start),
+        status_code=byte_range.status,
+        media_type='application/pdf',
+        headers=headers
+    )
+
+def verify_access_token(request):
+    """Validate the bearer token the way flask_jwt_extended does.
+
+    Returns the token identity, or None if the token is missing or invalid.
+    """
+    auth_header = request.headers.get('Authorization', '')
+    if not auth_header.startswith('Bearer '):
+        return None
+    # The Flask app's config, not Config: the app may be created with
+    # another config class, and JWTManager fills in its defaults there
+    config = flask_app.config
+    try:
+        claims = jwt.decode(
+            auth_header[len('Bearer '):],
+            config['JWT_SECRET_KEY'],
+            algorithms=[config['JWT_ALGORITHM']],
+            leeway=config['JWT_DECODE_LEEWAY']
+        )
+    except jwt.InvalidTokenError:
+        return None
+    if claims.get('type', 'access') != 'access':
+        return None
+    return claims.get(config['JWT_IDENTITY_CLAIM'])
+
+scrape_query_schema = ScrapeQuerySchema()
+
+def check_scrape_request(request, params):
+    """Return an error response for an unauthenticated or invalid scrape request."""
+    if verify_access_token(request) is None:
+        return error_response("Authorization required", 401,
+                              message="Request does not contain a valid access token")
+
+    errors = scrape_query_schema.validate(params)
+    if errors:
+        return error_response(errors, 400)
+
+    if params['brand'] not in BRAND_MAPPINGS:
+        return error_response(f"Brand '{params['brand']}' is not supported", 400)
+
+    return None
+
+@log_request
+@rate_limit('scrape')
+async def scrape(request):
+    """Scrape pattern details from the vendor site (see app.scrape)"""
+    params = dict(request.query_params)
+    error = check_scrape_request(request, params)
+    if error:
+        return error
+
+    data = await scrape_pattern_async(params['brand'], params['pattern_number'], include_image=False)
+    if 'error' in data:
+        return JSONResponse(data, status_code=502, headers=CORS_HEADERS)
+
+    return JSONResponse(data, headers=CORS_HEADERS)
+
+def import_scraped_pattern(data):
+    """Upsert scraped data through the Flask app's session (runs in a worker thread)."""
+    with flask_app.app_context():
+        try:
+            pattern, created = upsert_pattern(data, SOURCE_SCRAPE)
+            db.session.commit()
+            return pattern.to_dict(), created
+        except Exception:
+            db.session.rollback()
+            raise
+
+@log_request
+@rate_limit('scrape')
+async def scrape_and_import(request):
+    """Scrape a pattern and add it (see app.scrape_and_import)"""
+    if request.headers.get('Content-Type', '').startswith('application/json'):
+        try:
+            params = await request.json()
+        except ValueError:
+            params = None
+        # A malformed body counts as an empty one, as with get_json(silent=True)
+        if not isinstance(params, dict):
+            params = {}
+    else:
+        params = dict(await request.form())
+    error = check_scrape_request(request, params)
+    if error:
+        return error
+
+    data = await scrape_pattern_async(params['brand'], params['pattern_number'])
+    if 'error' in data:
+        return JSONResponse(data, status_code=502, headers=CORS_HEADERS)
+    data['user_id'] = int(verify_access_token(request))
+
+    try:
+        # Only the short database write leaves the event loop
+        pattern, created = await asyncio.to_thread(import_scraped_pattern, data)
+    except Exception as e:
+        logger.error("Error importing scraped pattern %s %s: %s", params['brand'], params['pattern_number'], e)
+        return error_response(str(e), 500)
+
+    return JSONResponse(pattern, status_code=201 if created else 200, headers=CORS_HEADERS)
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    yield
+    await engine.dispose()
+
+flask_app = create_app()
+
+app = Starlette(
+    routes=[
+        Route('/api/patterns/{pattern_id:int}/image', get_pattern_image, methods=['GET']),
+        Route('/api/pdfs/{pdf_id:int}', get_pdf, methods=['GET']),
+        Route('/api/scrape', scrape, methods=['GET']),
+        Route('/api/scrape', scrape_and_import, methods=['POST']),
+        # Everything else is served by the Flask app on a thread pool
+        Mount('/', app=WSGIMiddleware(flask_app)),
+    ],
+    lifespan=lifespan
+)
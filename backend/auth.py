@@ -1,44 +1,14 @@
 """
 Authentication module for the Sewing Patterns application.
-Provides user model, authentication routes, and JWT functionality.
+Provides authentication routes and JWT functionality (the User model lives in models.py).
 """
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import (
     JWTManager, create_access_token, create_refresh_token,
     jwt_required, get_jwt_identity
 )
-from werkzeug.security import generate_password_hash, check_password_hash
 from marshmallow import Schema, fields, validate, ValidationError
-from datetime import datetime
-from models import db
-
-# User model
-class User(db.Model):
-    """User model for authentication."""
-    id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(50), unique=True, nullable=False)
-    email = db.Column(db.String(100), unique=True, nullable=False)
-    password_hash = db.Column(db.String(200), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    is_admin = db.Column(db.Boolean, default=False)
-    
-    def set_password(self, password):
-        """Hash and set the user password."""
-        self.password_hash = generate_password_hash(password)
-        
-    def check_password(self, password):
-        """Check if the provided password matches the stored hash."""
-        return check_password_hash(self.password_hash, password)
-    
-    def to_dict(self):
-        """Convert user object to dictionary (excluding sensitive data)."""
-        return {
-            'id': self.id,
-            'username': self.username,
-            'email': self.email,
-            'created_at': self.created_at.isoformat(),
-            'is_admin': self.is_admin
-        }
+from models import db, User
 
 # Validation schemas
 class UserRegistrationSchema(Schema):
@@ -13,8 +13,6 @@ import logging
 
 from models import db, User
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Create a Blueprint for authentication routes
@@ -34,12 +32,12 @@ def login():
     try:
         # Get request data
         data = request.get_json()
-        logger.info(f"Login attempt for user: {data.get('username')}")
+        logger.info("Login attempt for user: %s", data.get('username'))
         
         # Validate input data
         errors = login_schema.validate(data)
         if errors:
-            logger.warning(f"Login validation failed: {errors}")
+            logger.warning("Login validation failed: %s", errors)
             return jsonify({"error": errors}), 400
         
         # Find user
@@ -47,14 +45,14 @@ def login():
         
         # Check if user exists and password is correct
         if not user or not user.check_password(data['password']):
-            logger.warning(f"Invalid username or password for: {data.get('username')}")
+            logger.warning("Invalid username or password for: %s", data.get('username'))
             return jsonify({"error": "Invalid username or password"}), 401
         
         # Create tokens
         access_token = create_access_token(identity=str(user.id))
         refresh_token = create_refresh_token(identity=str(user.id))
         
-        logger.info(f"User logged in successfully: {user.username}")
+        logger.info("User logged in successfully: %s", user.username)
         
         return jsonify({
             "message": "Login successful",
@@ -69,7 +67,7 @@ def login():
         }), 200
         
     except Exception as e:
-        logger.error(f"Login error: {str(e)}")
+        logger.error("Login error: %s", e)
         return jsonify({"error": "Login failed. Please try again."}), 500
 
 @auth_bp.route('/refresh', methods=['POST'])
@@ -80,14 +78,14 @@ def refresh():
         current_user_id = get_jwt_identity()
         new_access_token = create_access_token(identity=current_user_id)
         
-        logger.info(f"Token refreshed for user ID: {current_user_id}")
+        logger.info("Token refreshed for user ID: %s", current_user_id)
         
         return jsonify({
             "access_token": new_access_token
         }), 200
         
     except Exception as e:
-        logger.error(f"Token refresh error: {str(e)}")
+        logger.error("Token refresh error: %s", e)
         return jsonify({"error": "Token refresh failed"}), 500
 
 @auth_bp.route('/me', methods=['GET'])
@@ -99,10 +97,10 @@ def get_user_info():
         user = User.query.get(user_id)
         
         if not user:
-            logger.warning(f"User not found for ID: {user_id}")
+            logger.warning("User not found for ID: %s", user_id)
             return jsonify({"error": "User not found"}), 404
         
-        logger.info(f"User info retrieved for: {user.username}")
+        logger.info("User info retrieved for: %s", user.username)
         
         return jsonify({
             "id": user.id,
@@ -112,7 +110,7 @@ def get_user_info():
         }), 200
         
     except Exception as e:
-        logger.error(f"Get user info error: {str(e)}")
+        logger.error("Get user info error: %s", e)
         return jsonify({"error": "Failed to retrieve user information"}), 500
 
 # Admin-only route to create new users
@@ -126,12 +124,12 @@ def create_user():
         admin_user = User.query.get(current_user_id)
         
         if not admin_user or not admin_user.is_admin:
-            logger.warning(f"Non-admin user attempted to create user: {current_user_id}")
+            logger.warning("Non-admin user attempted to create user: %s", current_user_id)
             return jsonify({"error": "Admin privileges required"}), 403
         
         # Get request data
         data = request.get_json()
-        logger.info(f"Admin creating new user: {data.get('username')}")
+        logger.info("Admin creating new user: %s", data.get('username'))
         
         # Validate required fields
         if not data.get('username') or not data.get('password') or not data.get('email'):
@@ -139,11 +137,11 @@ def create_user():
         
         # Check if user already exists
         if User.query.filter_by(username=data['username']).first():
-            logger.warning(f"Username already exists: {data['username']}")
+            logger.warning("Username already exists: %s", data['username'])
             return jsonify({"error": "Username already exists"}), 409
         
         if User.query.filter_by(email=data['email']).first():
-            logger.warning(f"Email already exists: {data['email']}")
+            logger.warning("Email already exists: %s", data['email'])
             return jsonify({"error": "Email already exists"}), 409
         
         # Create new user
@@ -158,7 +156,7 @@ def create_user():
         db.session.add(new_user)
         db.session.commit()
         
-        logger.info(f"User created successfully by admin: {new_user.username}")
+        logger.info("User created successfully by admin: %s", new_user.username)
         
         return jsonify({
             "message": "User created successfully",
@@ -171,7 +169,7 @@ def create_user():
         }), 201
         
     except Exception as e:
-        logger.error(f"Create user error: {str(e)}")
+        logger.error("Create user error: %s", e)
         db.session.rollback()
         return jsonify({"error": "Failed to create user. Please try again."}), 500
 
@@ -186,13 +184,13 @@ def list_users():
         admin_user = User.query.get(current_user_id)
         
         if not admin_user or not admin_user.is_admin:
-            logger.warning(f"Non-admin user attempted to list users: {current_user_id}")
+            logger.warning("Non-admin user attempted to list users: %s", current_user_id)
             return jsonify({"error": "Admin privileges required"}), 403
         
         # Get all users
         users = User.query.all()
         
-        logger.info(f"Admin listed all users: {admin_user.username}")
+        logger.info("Admin listed all users: %s", admin_user.username)
         
         return jsonify([{
             "id": user.id,
@@ -203,7 +201,7 @@ def list_users():
         } for user in users]), 200
         
     except Exception as e:
-        logger.error(f"List users error: {str(e)}")
+        logger.error("List users error: %s", e)
         return jsonify({"error": "Failed to list users"}), 500
 
 # Function to create admin user if it doesn't exist
@@ -213,7 +211,7 @@ def create_admin_user(username, password, email):
         # Check if admin user already exists
         admin = User.query.filter_by(username=username).first()
         if admin:
-            logger.info(f"Admin user already exists: {username}")
+            logger.info("Admin user already exists: %s", username)
             return
         
         # Create admin user
@@ -228,8 +226,8 @@ def create_admin_user(username, password, email):
         db.session.add(admin)
         db.session.commit()
         
-        logger.info(f"Admin user created: {username}")
+        logger.info("Admin user created: %s", username)
         
     except Exception as e:
-        logger.error(f"Create admin user error: {str(e)}")
+        logger.error("Create admin user error: %s", e)
         db.session.rollback()
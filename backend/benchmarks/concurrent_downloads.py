@@ -0,0 +1,83 @@
+"""
+Concurrent download capacity benchmark.
+
+Keeps N clients downloading the same blob URL for a fixed time and reports
+throughput and latency. Run it once against each server, each started with
+a single process, to compare capacity per process:
+
+    RATE_LIMITS_ENABLED=false gunicorn -w 1 --threads 8 -b :5000 "app:create_app()"
+    RATE_LIMITS_ENABLED=false uvicorn asgi:app --workers 1 --port 5001
+
+Start the servers with RATE_LIMITS_ENABLED=false: with the default limits
+almost every request from the benchmark's single address gets a 429 or
+503, and the run measures rejections instead of downloads.
+
+    python benchmarks/concurrent_downloads.py http://localhost:5000/api/pdfs/1 -c 64
+    python benchmarks/concurrent_downloads.py http://localhost:5001/api/pdfs/1 -c 64
+
+Requires httpx (requirements-async.txt).
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+async def client_loop(client, url, deadline, latencies, stats):
+    """Download url repeatedly until the deadline, streaming the body."""
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            async with client.stream("GET", url) as response:
+                async for chunk in response.aiter_raw():
+                    stats["bytes"] += len(chunk)
+                if response.status_code != 200:
+                    stats["errors"] += 1
+                    continue
+        except httpx.HTTPError:
+            stats["errors"] += 1
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+
+async def run(url, concurrency, duration, headers):
+    latencies = []
+    stats = {"bytes": 0, "errors": 0}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, headers=headers, timeout=60) as client:
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*(
+            client_loop(client, url, deadline, latencies, stats)
+            for _ in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - start
+    return latencies, stats, elapsed
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("url", help="blob URL, e.g. http://localhost:5000/api/pdfs/1")
+    parser.add_argument("-c", "--concurrency", type=int, default=32)
+    parser.add_argument("-d", "--duration", type=float, default=15.0, help="seconds")
+    parser.add_argument("--token", help="JWT access token, if the URL needs one")
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    latencies, stats, elapsed = asyncio.run(
+        run(args.url, args.concurrency, args.duration, headers)
+    )
+
+    print(f"{args.url} with {args.concurrency} concurrent clients for {elapsed:.1f} s")
+    print(f"  completed: {len(latencies)} ({len(latencies) / elapsed:.1f} req/s), errors: {stats['errors']}")
+    print(f"  throughput: {stats['bytes'] / elapsed / 1e6:.1f} MB/s")
+    if latencies:
+        print(f"  latency ms: p50 {statistics.median(latencies):.1f}, "
+              f"p95 {percentile(latencies, 95):.1f}, "
+              f"p99 {percentile(latencies, 99):.1f}")
+
+if __name__ == "__main__":
+    main()
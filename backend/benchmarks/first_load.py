@@ -0,0 +1,182 @@
+"""
+Frontend first-load benchmark.
+
+Loads a page the way a browser does on a first visit: fetches the HTML,
+then every script, stylesheet and icon it references and, recursively,
+every module those scripts import (at most 6 requests at a time, like a
+browser per host). Then it reloads with a warm cache: immutable files are
+not requested again, everything else is revalidated with If-None-Match.
+Reports requests, bytes on the wire and wall time for both.
+
+Compare the Vite dev server with the built frontend served by the backend
+(FRONTEND_DIST, see frontend.py):
+
+    cd frontend && npm run dev
+    python benchmarks/first_load.py http://localhost:5173/
+
+    cd frontend && npm run build
+    FRONTEND_DIST=../frontend/dist gunicorn -w 1 --threads 8 -b :5000 "app:create_app()"
+    python benchmarks/first_load.py http://localhost:5000/
+
+Use --latency to add a simulated round trip per request, since on
+localhost the number of requests barely shows.
+
+Requires httpx (requirements-async.txt).
+"""
+import argparse
+import asyncio
+import gzip
+import re
+import time
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+
+import httpx
+
+try:
+    import brotli
+    ACCEPT_ENCODING = 'br, gzip'
+except ImportError:
+    # Without brotli installed only gzip responses can be read
+    brotli = None
+    ACCEPT_ENCODING = 'gzip'
+
+# Browsers open about this many connections per host
+MAX_CONNECTIONS = 6
+
+# Static and dynamic imports with absolute or relative specifiers, as
+# emitted by Vite (bare specifiers are rewritten to /node_modules/... paths)
+IMPORT_PATTERN = re.compile(
+    r"""(?:\bimport\s*(?:[\w*{}\s,]+\s*from\s*)?|\bfrom\s*|\bimport\s*\(\s*)["']((?:/|\./|\.\./)[^"']+)["']"""
+)
+CSS_URL_PATTERN = re.compile(r"""url\(\s*["']?((?:/|\./|\.\./)[^"')]+)["']?\s*\)""")
+
+class AssetParser(HTMLParser):
+    """Collect the URLs of scripts, stylesheets, preloads and icons in a page."""
+
+    def __init__(self):
+        super().__init__()
+        self.urls = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'script' and attrs.get('src'):
+            self.urls.append(attrs['src'])
+        elif tag == 'link' and attrs.get('href') and set((attrs.get('rel') or '').split()) & {
+                'stylesheet', 'modulepreload', 'preload', 'icon'}:
+            self.urls.append(attrs['href'])
+
+def referenced_urls(url, content_type, body):
+    """URLs a page, script or stylesheet makes the browser fetch next."""
+    text = body.decode('utf-8', errors='replace')
+    if 'html' in content_type:
+        parser = AssetParser()
+        parser.feed(text)
+        found = parser.urls
+        # Inline module scripts (the dev server's preamble) import too
+        found += IMPORT_PATTERN.findall(text)
+    elif 'javascript' in content_type:
+        found = IMPORT_PATTERN.findall(text)
+    elif 'css' in content_type:
+        found = CSS_URL_PATTERN.findall(text)
+    else:
+        found = []
+    origin = urlsplit(url).netloc
+    return [absolute for absolute in (urljoin(url, item) for item in found)
+            if urlsplit(absolute).netloc == origin]
+
+async def fetch(client, url, cache, stats, latency):
+    """Fetch url the way a browser with cache would.
+
+    Returns (content type, decoded body), or None when nothing new arrived.
+    """
+    cached = cache.get(url)
+    if cached and 'immutable' in cached['cache_control']:
+        stats['cache_hits'] += 1
+        return None
+
+    headers = {'Accept-Encoding': ACCEPT_ENCODING}
+    if cached and cached['etag']:
+        headers['If-None-Match'] = cached['etag']
+
+    await asyncio.sleep(latency)
+    async with client.stream('GET', url, headers=headers) as response:
+        raw = b''.join([chunk async for chunk in response.aiter_raw()])
+    stats['requests'] += 1
+    stats['bytes'] += len(raw)
+    if response.status_code == 304:
+        stats['not_modified'] += 1
+        return None
+    if response.status_code != 200:
+        stats['errors'] += 1
+        return None
+
+    cache[url] = {
+        'etag': response.headers.get('ETag'),
+        'cache_control': response.headers.get('Cache-Control', ''),
+    }
+    body = decode(raw, response.headers.get('Content-Encoding'))
+    return response.headers.get('Content-Type', ''), body
+
+def decode(raw, encoding):
+    """Undo the Content-Encoding of a response body."""
+    if encoding == 'br':
+        return brotli.decompress(raw)
+    if encoding == 'gzip':
+        return gzip.decompress(raw)
+    return raw
+
+async def load_page(client, url, cache, latency):
+    """Load url and everything it pulls in; returns (stats, seconds)."""
+    stats = {'requests': 0, 'bytes': 0, 'cache_hits': 0, 'not_modified': 0, 'errors': 0}
+    seen = {url}
+    limit = asyncio.Semaphore(MAX_CONNECTIONS)
+
+    async def visit(target):
+        async with limit:
+            result = await fetch(client, target, cache, stats, latency)
+        if result is None:
+            # Served from cache: follow what it referenced last time
+            children = cache.get(target, {}).get('references', [])
+        else:
+            children = referenced_urls(target, *result)
+            cache[target]['references'] = children
+        new = [child for child in children if child not in seen]
+        seen.update(new)
+        await asyncio.gather(*(visit(child) for child in new))
+
+    start = time.perf_counter()
+    await visit(url)
+    return stats, time.perf_counter() - start
+
+def report(label, stats, seconds):
+    print(f"{label}: {seconds * 1000:.0f} ms, {stats['requests']} requests, "
+          f"{stats['bytes'] / 1024:.1f} KiB on the wire, {stats['not_modified']} not modified, "
+          f"{stats['cache_hits']} from cache, {stats['errors']} errors")
+
+async def run(url, runs, latency):
+    limits = httpx.Limits(max_connections=MAX_CONNECTIONS)
+    cold, warm = [], []
+    for _ in range(runs):
+        # A fresh client per run, so connections are opened as on a first visit
+        async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+            cache = {}
+            cold.append(await load_page(client, url, cache, latency))
+            warm.append(await load_page(client, url, cache, latency))
+    return cold, warm
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("url", help="page URL, e.g. http://localhost:5000/")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0,
+                        help="simulated round trip per request, in ms")
+    args = parser.parse_args()
+
+    cold, warm = asyncio.run(run(args.url, args.runs, args.latency / 1000))
+    for label, results in (("first load", cold), ("reload", warm)):
+        stats, seconds = min(results, key=lambda result: result[1])
+        report(f"{label} (best of {args.runs})", stats, seconds)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Helpers for streaming binary data (images, PDFs) out of the database
+without holding whole blobs in memory.
+"""
+import zipfile
+from collections import namedtuple
+from sqlalchemy import select, func
+from werkzeug.http import parse_range_header, parse_if_range_header, parse_etags
+from models import db
+from replicas import read_engine
+
+# Bytes fetched from the database per query while streaming a blob
+BLOB_CHUNK_SIZE = 256 * 1024
+
+ByteRange = namedtuple('ByteRange', ['status', 'start', 'stop', 'headers'])
+
+def blob_etag(key, updated_at):
+    """ETag for a stored blob, changing whenever its row is updated."""
+    stamp = int(updated_at.timestamp() * 1e6) if updated_at else 0
+    return f"{key}-{stamp}"
+
+def resolve_range(length, etag, range_header=None, if_range_header=None, if_none_match_header=None):
+    """
+    Work out which part of a blob to send from the request's conditional
+    and Range headers.
+
+    Only single ranges are served; multi-range requests, and Range with an
+    If-Range that does not match etag, get the whole blob.
+
+    Returns:
+        ByteRange: status (200, 206, 304 or 416), the [start, stop) byte
+            span to send and the extra response headers
+    """
+    headers = {'Accept-Ranges': 'bytes', 'ETag': f'"{etag}"'}
+    if if_none_match_header and parse_etags(if_none_match_header).contains(etag):
+        return ByteRange(304, 0, 0, headers)
+
+    byte_range = parse_range_header(range_header) if range_header else None
+    if byte_range is None or len(byte_range.ranges) != 1:
+        return ByteRange(200, 0, length, headers)
+    if if_range_header:
+        if_range = parse_if_range_header(if_range_header)
+        if if_range.etag != etag:
+            return ByteRange(200, 0, length, headers)
+
+    span = byte_range.range_for_length(length)
+    if span is None:
+        return ByteRange(416, 0, 0, dict(headers, **{'Content-Range': f"bytes */{length}"}))
+    start, stop = span
+    return ByteRange(206, start, stop, dict(headers, **{'Content-Range': f"bytes {start}-{stop - 1}/{length}"}))
+
+def iter_blob(column, key_column, key, length, chunk_size=BLOB_CHUNK_SIZE, start=0):
+    """
+    Yield bytes [start, length) of a blob column in chunks using substr()
+    on the database side.
+
+    A connection is checked out per chunk, so a slow client holds no
+    database connection while its socket drains, provided the caller
+    closes the request's session (db.session.close()) before streaming;
+    otherwise the session keeps its connection until teardown. Reads go
+    to a replica when the request is routed to one. Must run inside an
+    app context (wrap generators with flask.stream_with_context).
+
+    Args:
+        column: Blob column, e.g. PatternPDF.pdf_data
+        key_column: Primary key column of the same table
+        key: Primary key value of the row
+        length (int): Offset to stop at, normally the blob size in bytes
+        chunk_size (int): Bytes per database round trip
+        start (int): Offset of the first byte to yield
+    """
+    offset = start
+    while offset < length:
+        with read_engine(db).connect() as conn:
+            chunk = conn.execute(
+                select(func.substr(column, offset + 1, min(chunk_size, length - offset))).where(key_column == key)
+            ).scalar()
+        if not chunk:
+            break
+        offset += len(chunk)
+        yield bytes(chunk)
+
+class _ChunkSink:
+    """Write-only file object that collects what zipfile writes to it."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        """Return and forget everything written so far."""
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def stream_zip(entries):
+    """
+    Generate a ZIP archive on the fly.
+
+    Entries are stored without compression (PDFs and images are already
+    compressed), and each chunk is passed through as soon as it is read, so
+    memory use stays at about one chunk regardless of archive size.
+
+    Args:
+        entries: Iterable of (name, date_time, size, chunks) tuples, where
+            chunks is an iterable of bytes adding up to size
+
+    Yields:
+        bytes: Consecutive pieces of the archive
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        for name, date_time, size, chunks in entries:
+            info = zipfile.ZipInfo(name, date_time=date_time)
+            info.compress_type = zipfile.ZIP_STORED
+            info.file_size = size
+            with archive.open(info, mode='w') as entry:
+                for chunk in chunks:
+                    entry.write(chunk)
+                    yield sink.drain()
+            yield sink.drain()
+    yield sink.drain()
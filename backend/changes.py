@@ -0,0 +1,128 @@
+"""
+Delta sync feed, so clients can keep a local copy of the catalogue and
+only fetch what changed since their last sync.
+
+    GET /api/patterns/changes              start a full sync
+    GET /api/patterns/changes?since=<cursor>
+
+Each response holds patterns created or updated after the cursor (with
+their PDFs), tombstones for deleted patterns and PDFs, the cursor to send
+next time and whether more pages are waiting. Pattern changes are read in
+(updated_at, id) order off ix_pattern_user_id_updated_at_id (or
+ix_pattern_updated_at_id for ?owner=all); tombstones in id order. Like
+the other collection endpoints the feed covers the user's own patterns.
+
+A pattern moved to another collection leaves a tombstone for its previous
+owner, and a pattern can come back into a collection after its tombstone;
+clients apply 'deleted' before 'changes'. Timestamps are compared on the
+database's clock (models.utc_now), never an app server's, and the feed
+always reads from the primary: a replica's lag can exceed the settle
+window, and rows it received late would land behind a cursor.
+"""
+import base64
+import json
+import logging
+from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required
+from sqlalchemy import tuple_
+from models import db, Pattern, Tombstone, database_now
+from ownership import ALL_OWNERS, owner_scoped, pattern_owner, scope_to_owner
+from ratelimit import rate_limit
+from replicas import read_from_primary
+
+logger = logging.getLogger(__name__)
+
+changes_bp = Blueprint('changes', __name__)
+
+class InvalidCursor(ValueError):
+    """Raised for a cursor this server did not issue."""
+
+def encode_cursor(updated_at, pattern_id, tombstone_id):
+    """Pack the feed position into an opaque, URL safe string."""
+    position = {
+        'u': updated_at.isoformat() if updated_at else None,
+        'i': pattern_id,
+        't': tombstone_id
+    }
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor(); returns (updated_at, pattern_id, tombstone_id)."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        updated_at = datetime.fromisoformat(position['u']) if position['u'] else None
+        return updated_at, int(position['i']), int(position['t'])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(str(e))
+
+@changes_bp.route('/api/patterns/changes', methods=['GET'])
+@read_from_primary
+@jwt_required()
+@rate_limit('list')
+@owner_scoped
+def get_changes():
+    """Get the user's patterns changed and deleted since a cursor"""
+    limit = min(
+        request.args.get('limit', current_app.config['CHANGES_PAGE_SIZE'], type=int),
+        current_app.config['CHANGES_MAX_PAGE_SIZE']
+    )
+    if limit < 1:
+        return jsonify({"error": "limit must be positive"}), 400
+
+    try:
+        # Rows written by transactions that may still be in flight stay out
+        # of this page, so a commit landing behind the cursor is not missed
+        horizon = database_now() - timedelta(seconds=current_app.config['CHANGES_SETTLE_SECONDS'])
+
+        since = request.args.get('since')
+        if since:
+            updated_at, last_id, last_tombstone_id = decode_cursor(since)
+        else:
+            # A full sync starts from the first pattern; older deletions don't matter
+            updated_at, last_id = None, 0
+            last_tombstone_id = scope_to_owner(db.session.query(
+                db.func.coalesce(db.func.max(Tombstone.id), 0)
+            ), Tombstone.user_id).filter(Tombstone.deleted_at < horizon).scalar()
+
+        query = scope_to_owner(Pattern.query).options(db.selectinload(Pattern.pdf_files)).filter(
+            Pattern.updated_at < horizon
+        )
+        if updated_at is not None:
+            query = query.filter(
+                tuple_(Pattern.updated_at, Pattern.id) > tuple_(updated_at, last_id)
+            )
+        patterns = query.order_by(Pattern.updated_at, Pattern.id).limit(limit + 1).all()
+
+        tombstones = scope_to_owner(Tombstone.query, Tombstone.user_id).filter(
+            Tombstone.id > last_tombstone_id,
+            Tombstone.deleted_at < horizon
+        )
+        if pattern_owner() == ALL_OWNERS:
+            # Across all collections a pattern that only changed owner is still there
+            tombstones = tombstones.filter(db.not_(db.and_(
+                Tombstone.entity == 'pattern',
+                db.exists().where(Pattern.id == Tombstone.entity_id)
+            )))
+        tombstones = tombstones.order_by(Tombstone.id).limit(limit + 1).all()
+
+        has_more = len(patterns) > limit or len(tombstones) > limit
+        patterns, tombstones = patterns[:limit], tombstones[:limit]
+
+        if patterns:
+            updated_at, last_id = patterns[-1].updated_at, patterns[-1].id
+        if tombstones:
+            last_tombstone_id = tombstones[-1].id
+
+        return jsonify({
+            'changes': [pattern.to_dict() for pattern in patterns],
+            'deleted': [tombstone.to_dict() for tombstone in tombstones],
+            'cursor': encode_cursor(updated_at, last_id, last_tombstone_id),
+            'has_more': has_more
+        }), 200
+    except InvalidCursor:
+        return jsonify({"error": "Invalid cursor"}), 400
+    except Exception as e:
+        logger.error("Error fetching changes: %s", e)
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,190 @@
+"""
+Maintenance commands for the `flask` CLI (FLASK_APP=app).
+"""
+import click
+from sqlalchemy import literal, exists, update
+from sqlalchemy.orm import aliased
+from flask import current_app
+from models import db, User, Pattern, PatternPDF, PatternFacetCount, PatternThumbnail, sync_measurements, utc_now
+from facets import FACETS, facet_key
+from pattern_store import is_unset
+from pdf_ingest import ingest_pdf
+from thumbnails import refresh_thumbnail
+
+# Columns not merged between duplicates
+IDENTITY_COLUMNS = ('id', 'brand', 'pattern_number', 'created_at', 'updated_at', 'inventory_qty', 'user_id')
+
+def merge_duplicate_patterns(keeper, duplicates):
+    """
+    Merge duplicates into keeper and delete them.
+
+    Fields the keeper is missing are filled from the most recently updated
+    duplicate that has them, inventory_qty becomes the largest quantity
+    recorded, and all PDFs are moved over to the keeper.
+    """
+    columns = [column.key for column in Pattern.__table__.columns if column.key not in IDENTITY_COLUMNS]
+    newest_first = sorted(duplicates, key=lambda p: (p.updated_at is not None, p.updated_at), reverse=True)
+
+    for duplicate in newest_first:
+        for column in columns:
+            if is_unset(getattr(keeper, column)) and not is_unset(getattr(duplicate, column)):
+                setattr(keeper, column, getattr(duplicate, column))
+
+    quantities = [p.inventory_qty for p in [keeper] + duplicates if p.inventory_qty is not None]
+    if quantities:
+        keeper.inventory_qty = max(quantities)
+
+    for duplicate in duplicates:
+        for pdf in list(duplicate.pdf_files):
+            pdf.pattern = keeper
+        db.session.delete(duplicate)
+
+@click.command('rebuild-facets')
+def rebuild_facets_command():
+    """Recount pattern_facet_count from the pattern table.
+
+    The triggers keep the counts current; this is only needed to repair
+    them, e.g. after loading data with triggers disabled.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        # Hold off pattern writes so no trigger update lands mid-rebuild
+        db.session.execute(db.text("LOCK TABLE pattern IN SHARE MODE"))
+    db.session.query(PatternFacetCount).delete()
+    owner = db.func.coalesce(Pattern.user_id, 0)
+    for facet in FACETS:
+        key = facet_key(getattr(Pattern, facet))
+        db.session.execute(
+            db.insert(PatternFacetCount).from_select(
+                ['user_id', 'facet', 'value', 'count'],
+                db.select(owner, literal(facet), key, db.func.count()).group_by(owner, key)
+            )
+        )
+    db.session.commit()
+    click.echo('Facet counts rebuilt.')
+
+@click.command('optimize-pdfs')
+@click.option('--hash-only', is_flag=True, help='Record hashes and sizes without optimizing.')
+def optimize_pdfs_command(hash_only):
+    """Run the upload ingest step on PDFs stored before it existed.
+
+    PDFs are processed one at a time, committing after each.
+    """
+    pdf_ids = [row.id for row in db.session.query(PatternPDF.id).filter(
+        PatternPDF.stored_size.is_(None), PatternPDF.pdf_data.isnot(None)
+    ).order_by(PatternPDF.id)]
+
+    original_total, stored_total = 0, 0
+    for pdf_id in pdf_ids:
+        pdf = PatternPDF.query.options(db.undefer(PatternPDF.pdf_data)).get(pdf_id)
+        stored = ingest_pdf(
+            pdf.pdf_data,
+            optimize=not hash_only and current_app.config['PDF_OPTIMIZE'],
+            recompress=current_app.config['PDF_RECOMPRESS']
+        )
+        if stored.data is not pdf.pdf_data:
+            pdf.pdf_data = stored.data
+        pdf.upload_sha256 = stored.upload_sha256
+        pdf.original_size = stored.original_size
+        pdf.stored_size = stored.stored_size
+        db.session.commit()
+        db.session.expunge_all()
+        original_total += stored.original_size
+        stored_total += stored.stored_size
+
+    click.echo(f"Processed {len(pdf_ids)} PDFs: {original_total} bytes before, {stored_total} after.")
+
+@click.command('backfill-measurements')
+@click.option('--batch-size', default=500, show_default=True, help='Patterns per transaction.')
+def backfill_measurements_command(batch_size):
+    """Parse size and yardage text into the structured tables for all patterns."""
+    last_id, processed = 0, 0
+    while True:
+        patterns = Pattern.query.options(
+            db.selectinload(Pattern.size_ranges), db.selectinload(Pattern.yardages)
+        ).filter(Pattern.id > last_id).order_by(Pattern.id).limit(batch_size).all()
+        if not patterns:
+            break
+        for pattern in patterns:
+            sync_measurements(pattern)
+        last_id = patterns[-1].id
+        processed += len(patterns)
+        db.session.commit()
+        db.session.expunge_all()
+
+    click.echo(f"Parsed measurements for {processed} patterns.")
+
+@click.command('backfill-thumbnails')
+@click.option('--all', 'remake_all', is_flag=True, help='Remake existing thumbnails too (after changing THUMBNAIL_SIZE).')
+@click.option('--batch-size', default=20, show_default=True, help='Patterns per transaction.')
+def backfill_thumbnails_command(remake_all, batch_size):
+    """Make gallery thumbnails for patterns with a stored image."""
+    query = Pattern.query.options(db.undefer(Pattern.image_data)).filter(Pattern.image_data.isnot(None))
+    if not remake_all:
+        query = query.filter(~exists().where(PatternThumbnail.pattern_id == Pattern.id))
+
+    last_id, processed, made = 0, 0, 0
+    while True:
+        patterns = query.filter(Pattern.id > last_id).order_by(Pattern.id).limit(batch_size).all()
+        if not patterns:
+            break
+        for pattern in patterns:
+            refresh_thumbnail(pattern)
+            made += pattern.thumbnail is not None
+        last_id = patterns[-1].id
+        processed += len(patterns)
+        db.session.commit()
+        db.session.expunge_all()
+
+    click.echo(f"Made thumbnails for {made} of {processed} patterns with images.")
+
+@click.command('assign-patterns')
+@click.argument('username')
+@click.option('--dry-run', is_flag=True, help='Only report what would change.')
+def assign_patterns_command(username, dry_run):
+    """Give the patterns that have no owner to USERNAME.
+
+    Patterns USERNAME already has (same brand and pattern number) are merged
+    into the user's copy (see merge_duplicate_patterns).
+    """
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.ClickException(f"No user named '{username}'")
+
+    owned = aliased(Pattern)
+    already_owned = exists().where(
+        owned.user_id == user.id,
+        owned.brand == Pattern.brand,
+        owned.pattern_number == Pattern.pattern_number
+    )
+    duplicates = Pattern.query.options(db.undefer(Pattern.image_data)).filter(
+        Pattern.user_id.is_(None), already_owned
+    ).order_by(Pattern.id).all()
+    unowned = Pattern.query.filter(Pattern.user_id.is_(None)).count()
+
+    if dry_run:
+        click.echo(f"{unowned - len(duplicates)} patterns would be assigned to {username} and "
+                   f"{len(duplicates)} merged into their copies (dry run, nothing changed).")
+        return
+
+    for duplicate in duplicates:
+        keeper = Pattern.query.options(db.undefer(Pattern.image_data)).filter_by(
+            user_id=user.id, brand=duplicate.brand, pattern_number=duplicate.pattern_number
+        ).one()
+        merge_duplicate_patterns(keeper, [duplicate])
+    db.session.flush()
+
+    # Bumping updated_at puts the patterns in the owner's changes feed
+    db.session.execute(
+        update(Pattern).where(Pattern.user_id.is_(None)).values(user_id=user.id, updated_at=utc_now())
+    )
+    db.session.commit()
+    click.echo(f"Assigned {unowned - len(duplicates)} patterns to {username} and "
+               f"merged {len(duplicates)} into their copies.")
+
+def register_commands(app):
+    """Add the maintenance commands to the app's CLI."""
+    app.cli.add_command(rebuild_facets_command)
+    app.cli.add_command(optimize_pdfs_command)
+    app.cli.add_command(backfill_measurements_command)
+    app.cli.add_command(assign_patterns_command)
+    app.cli.add_command(backfill_thumbnails_command)
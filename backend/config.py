@@ -11,13 +11,103 @@ class Config:
     SECRET_KEY = os.environ.get('FLASK_SECRET_KEY') or 'dev-secret-key'
     DEBUG = os.environ.get('FLASK_ENV') == 'development'
     
-    # Database configuration
-    SQLALCHEMY_DATABASE_URI = (
+    # Database configuration (DATABASE_URL, as set in docker-compose.yml, wins)
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or (
         f"postgresql://{os.environ.get('DB_USER')}:{os.environ.get('DB_PASSWORD')}"
         f"@{os.environ.get('DB_HOST')}:{os.environ.get('DB_PORT')}/{os.environ.get('DB_NAME')}"
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Optional read replicas, comma separated (add ?connect_timeout=2 to
+    # Postgres URLs so a dead replica is detected quickly); see replicas.py
+    SQLALCHEMY_REPLICA_URIS = [
+        uri.strip() for uri in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if uri.strip()
+    ]
+    SQLALCHEMY_BINDS = {f'replica_{i}': uri for i, uri in enumerate(SQLALCHEMY_REPLICA_URIS)}
+    REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 2))
+    REPLICA_CHECK_SECONDS = float(os.environ.get('REPLICA_CHECK_SECONDS', 5))
+    # Keep longer than REPLICA_MAX_LAG_SECONDS so clients see their own writes
+    REPLICA_STICKY_SECONDS = float(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+    
+    # Maximum number of ids accepted by the batch pattern endpoint
+    BATCH_MAX_IDS = int(os.environ.get('BATCH_MAX_IDS', 300))
+    
+    # Changes feed (/api/patterns/changes) page sizes, and how long recent
+    # writes are held back so slow transactions can't commit behind a cursor
+    CHANGES_PAGE_SIZE = int(os.environ.get('CHANGES_PAGE_SIZE', 200))
+    CHANGES_MAX_PAGE_SIZE = int(os.environ.get('CHANGES_MAX_PAGE_SIZE', 1000))
+    CHANGES_SETTLE_SECONDS = float(os.environ.get('CHANGES_SETTLE_SECONDS', 2))
+    
+    # Fabric widths within this many inches of the requested one count as a
+    # match in /api/patterns/stash-match (e.g. 58" fabric for 60")
+    STASH_WIDTH_TOLERANCE = float(os.environ.get('STASH_WIDTH_TOLERANCE', 2))
+    
+    # Rate limits per client (user, or IP when anonymous) and endpoint class,
+    # as '<requests>/<second|minute|hour>'; see ratelimit.py
+    RATE_LIMITS_ENABLED = os.environ.get('RATE_LIMITS_ENABLED', 'true').lower() != 'false'
+    RATE_LIMITS = {
+        'auth': os.environ.get('RATE_LIMIT_AUTH', '10/minute'),
+        'list': os.environ.get('RATE_LIMIT_LIST', '120/minute'),
+        'blob': os.environ.get('RATE_LIMIT_BLOB', '60/minute'),
+        # Pattern images; a gallery page requests one per pattern
+        'image': os.environ.get('RATE_LIMIT_IMAGE', '1200/minute'),
+        'scrape': os.environ.get('RATE_LIMIT_SCRAPE', '10/minute'),
+    }
+    RATE_LIMIT_MAX_CLIENTS = int(os.environ.get('RATE_LIMIT_MAX_CLIENTS', 10000))
+    
+    # Load shedding (ratelimit.py): blob downloads streamed at once, and
+    # list/blob/image/scrape requests get 503 beyond SHED_MAX_BACKLOG
+    # connections waiting on the listening socket (shared by all workers;
+    # Linux only, SHED_LISTEN_PORT=0 turns it off) or SHED_MAX_IN_FLIGHT
+    # requests in progress in one worker (threaded and async workers only)
+    BLOB_MAX_CONCURRENT = int(os.environ.get('BLOB_MAX_CONCURRENT', 16))
+    SHED_LISTEN_PORT = int(os.environ.get('SHED_LISTEN_PORT', 5000))
+    SHED_MAX_BACKLOG = int(os.environ.get('SHED_MAX_BACKLOG', 32))
+    SHED_MAX_IN_FLIGHT = int(os.environ.get('SHED_MAX_IN_FLIGHT', 64))
+    SHED_RETRY_AFTER = int(os.environ.get('SHED_RETRY_AFTER', 1))
+    
+    # Uploaded PDFs are linearized, and with PDF_RECOMPRESS their streams
+    # losslessly recompressed, when pikepdf is installed (pdf_ingest.py)
+    PDF_OPTIMIZE = os.environ.get('PDF_OPTIMIZE', 'true').lower() != 'false'
+    PDF_RECOMPRESS = os.environ.get('PDF_RECOMPRESS', 'true').lower() != 'false'
+
+    # Gallery thumbnails (thumbnails.py), made with Pillow when a pattern's
+    # image is stored: longest side in pixels, JPEG quality, and the most
+    # served by one /api/patterns/thumbnails request
+    THUMBNAIL_SIZE = int(os.environ.get('THUMBNAIL_SIZE', 320))
+    THUMBNAIL_QUALITY = int(os.environ.get('THUMBNAIL_QUALITY', 80))
+    THUMBNAIL_MAX_IDS = int(os.environ.get('THUMBNAIL_MAX_IDS', 100))
+
+    # Lifetime window of the signed image and PDF URLs in pattern responses
+    # (signed_urls.py); each URL is valid for one to two windows
+    BLOB_URL_MAX_AGE = int(os.environ.get('BLOB_URL_MAX_AGE', 4 * 60 * 60))
+
+    # Largest request bodies accepted by the PDF and image upload endpoints;
+    # uploads are read into memory, so these bound a request's footprint.
+    # MAX_CONTENT_LENGTH backstops every other route (and chunked bodies).
+    PDF_UPLOAD_MAX_BYTES = int(os.environ.get('PDF_UPLOAD_MAX_BYTES', 50 * 1024 * 1024))
+    IMAGE_UPLOAD_MAX_BYTES = int(os.environ.get('IMAGE_UPLOAD_MAX_BYTES', 10 * 1024 * 1024))
+    MAX_CONTENT_LENGTH = max(PDF_UPLOAD_MAX_BYTES, IMAGE_UPLOAD_MAX_BYTES)
+
+    # Per-request memory accounting (memory.py): 'rss' records RSS deltas,
+    # 'sample' also traces MEMORY_SAMPLE_RATE of requests with tracemalloc,
+    # 'off' disables it. Requests growing by more than MEMORY_OUTLIER_BYTES
+    # are logged.
+    MEMORY_TRACKING = os.environ.get('MEMORY_TRACKING', 'rss').lower()
+    MEMORY_SAMPLE_RATE = float(os.environ.get('MEMORY_SAMPLE_RATE', 0.01))
+    MEMORY_OUTLIER_BYTES = int(os.environ.get('MEMORY_OUTLIER_BYTES', 50 * 1024 * 1024))
+
+    # Built frontend (frontend/dist) to serve from this app, with
+    # precompressed variants and long-lived caching; see frontend.py
+    FRONTEND_DIST = os.environ.get('FRONTEND_DIST')
+    
+    # Logging (logs.py): LOG_FORMAT is 'json' or 'text'; LOG_SAMPLE_RATE
+    # keeps that fraction of INFO/DEBUG records, including the access log
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json').lower()
+    LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 1.0))
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+    
     # JWT configuration
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-dev-secret-key'
     JWT_ACCESS_TOKEN_EXPIRES = 60 * 60  # 1 hour
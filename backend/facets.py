@@ -0,0 +1,89 @@
+"""
+Facet counts for the pattern filter sidebar.
+
+    GET /api/patterns/facets[?<list filters>]
+
+Counts cover the user's own patterns (see ownership.py). Without filters
+they come straight from the user's rows of pattern_facet_count, which
+database triggers keep current on every pattern write. With filters the
+counts are computed over the matching patterns in a single query.
+"""
+import logging
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from marshmallow import ValidationError
+from sqlalchemy import case, literal, union_all, cast
+from filters import load_pattern_filters, apply_pattern_filters
+from models import db, Pattern, PatternFacetCount
+from ownership import ALL_OWNERS, owner_scoped, pattern_owner, scope_to_owner
+from ratelimit import rate_limit
+
+logger = logging.getLogger(__name__)
+
+facets_bp = Blueprint('facets', __name__)
+
+FACETS = ('brand', 'difficulty', 'item_type', 'format', 'cut_status', 'cosplay_hackable')
+
+def facet_key(column):
+    """Text key of a facet value, as stored by the triggers ('' = not set)."""
+    if column.key == 'cosplay_hackable':
+        return case((column.is_(True), 'true'), (column.is_(False), 'false'), else_='')
+    return db.func.coalesce(column, '')
+
+def decode_value(facet, value):
+    """Turn a stored facet key back into the API value."""
+    if value == '':
+        return None
+    if facet == 'cosplay_hackable':
+        return value == 'true'
+    return value
+
+def summary_counts(owner):
+    """Read an owner's facet counts (summed over owners for ALL_OWNERS) from
+    the trigger-maintained summary table."""
+    if owner == ALL_OWNERS:
+        total = cast(db.func.sum(PatternFacetCount.count), db.Integer)
+        return db.session.query(PatternFacetCount.facet, PatternFacetCount.value, total).group_by(
+            PatternFacetCount.facet, PatternFacetCount.value
+        ).having(total > 0).all()
+    return db.session.query(PatternFacetCount.facet, PatternFacetCount.value, PatternFacetCount.count).filter(
+        PatternFacetCount.user_id == owner, PatternFacetCount.count > 0
+    ).all()
+
+def filtered_counts(filters):
+    """Count facet values over the patterns matching filters."""
+    matching = scope_to_owner(apply_pattern_filters(Pattern.query, filters)).subquery()
+    selects = []
+    for facet in FACETS:
+        key = facet_key(matching.c[facet])
+        selects.append(
+            db.select(literal(facet), cast(key, db.String), db.func.count())
+            .select_from(matching)
+            .group_by(key)
+        )
+    return db.session.execute(union_all(*selects)).all()
+
+@facets_bp.route('/api/patterns/facets', methods=['GET'])
+@jwt_required()
+@rate_limit('list')
+@owner_scoped
+def get_facets():
+    """Get pattern counts per brand, difficulty, item type, format, cut status and cosplay flag"""
+    try:
+        filters = load_pattern_filters(request.args)
+    except ValidationError as err:
+        return jsonify({"error": "Validation error", "details": err.messages}), 400
+
+    try:
+        rows = filtered_counts(filters) if filters else summary_counts(pattern_owner())
+
+        result = {facet: [] for facet in FACETS}
+        for facet, value, count in rows:
+            result[facet].append({'value': decode_value(facet, value), 'count': count})
+        for counts in result.values():
+            counts.sort(key=lambda item: (-item['count'], str(item['value'])))
+
+        return jsonify(result), 200
+    except Exception as e:
+        logger.error("Error fetching facets: %s", e)
+        return jsonify({"error": str(e)}), 500
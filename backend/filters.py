@@ -0,0 +1,38 @@
+"""
+Pattern list filters shared by the list and facet endpoints.
+"""
+from marshmallow import EXCLUDE
+from models import Pattern
+from validation import PatternQuerySchema
+
+# Filters matched exactly
+EXACT_FILTERS = ('brand', 'difficulty', 'item_type', 'format', 'cut_status', 'cosplay_hackable')
+
+query_schema = PatternQuerySchema(unknown=EXCLUDE)
+
+def load_pattern_filters(args):
+    """
+    Validate filter query arguments.
+
+    Args:
+        args: Request query arguments; unrelated ones (page, ...) are ignored
+
+    Returns:
+        dict: Filters that were given a value
+
+    Raises:
+        marshmallow.ValidationError: If a value has the wrong type
+    """
+    given = {key: value for key, value in args.items() if value != ''}
+    return query_schema.load(given)
+
+def apply_pattern_filters(query, filters):
+    """Narrow a Pattern query with filters from load_pattern_filters()."""
+    for key in EXACT_FILTERS:
+        if filters.get(key) is not None:
+            query = query.filter(getattr(Pattern, key) == filters[key])
+    if filters.get('pattern_number'):
+        query = query.filter(Pattern.pattern_number.ilike(f"{filters['pattern_number']}%"))
+    if filters.get('title'):
+        query = query.filter(Pattern.title.ilike(f"%{filters['title']}%"))
+    return query
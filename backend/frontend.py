@@ -0,0 +1,98 @@
+"""
+Optional serving of the built frontend (frontend/dist).
+
+Enabled by setting FRONTEND_DIST to the dist directory. Then:
+
+- Files are served with a precompressed variant (`<file>.br`, `<file>.gz`,
+  written by `npm run build`) when the client accepts it, brotli first.
+  The variants themselves are not served by name.
+- Vite's content-hashed files under assets/ are cached for a year as
+  immutable; everything else (index.html, ...) is revalidated by ETag.
+- Paths that are not files and don't look like one get index.html, so
+  client-side routes load the app.
+
+API routes are matched first; unknown /api/ paths still get a JSON 404.
+"""
+import mimetypes
+import os
+from flask import Blueprint, current_app, request, jsonify, send_file
+from werkzeug.security import safe_join
+
+frontend_bp = Blueprint('frontend', __name__)
+
+# Precompressed variants in order of preference: (Content-Encoding, suffix)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Vite puts content-hashed build output here
+HASHED_PREFIX = 'assets/'
+
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE = 'no-cache'
+
+INDEX_FILE = 'index.html'
+
+def choose_variant(path, accept_encodings):
+    """
+    Pick the file to send for path.
+
+    Args:
+        path (str): Absolute path of the uncompressed file
+        accept_encodings: The request's parsed Accept-Encoding
+
+    Returns:
+        tuple: (file to send, Content-Encoding or None)
+    """
+    for encoding, suffix in ENCODINGS:
+        if accept_encodings.quality(encoding) > 0 and os.path.isfile(path + suffix):
+            return path + suffix, encoding
+    return path, None
+
+def send_static(dist, name):
+    """Send a file of the build with its cache policy and best encoding."""
+    path = safe_join(dist, name)
+    variant, encoding = choose_variant(path, request.accept_encodings)
+    mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+    response = send_file(variant, mimetype=mimetype, conditional=True, max_age=None)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    # Variants of one file differ by encoding, so caches must key on it
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = (
+        IMMUTABLE_CACHE if name.startswith(HASHED_PREFIX) else REVALIDATE_CACHE
+    )
+    return response
+
+@frontend_bp.route('/', defaults={'name': INDEX_FILE}, methods=['GET'])
+@frontend_bp.route('/<path:name>', methods=['GET'])
+def serve_frontend(name):
+    """Serve a file of the built frontend, or index.html for client-side routes"""
+    if name == 'api' or name.startswith('api/'):
+        return jsonify({"error": "Not found"}), 404
+
+    # Sent as-is a variant would carry its uncompressed file's Content-Type
+    # and no Content-Encoding
+    if name.endswith(tuple(suffix for _, suffix in ENCODINGS)):
+        return jsonify({"error": "Not found"}), 404
+
+    dist = current_app.config['FRONTEND_DIST']
+    path = safe_join(dist, name)
+    if path is not None and os.path.isfile(path):
+        return send_static(dist, name)
+
+    # A missing asset is a 404, not the app: a stale hashed file served as
+    # HTML would only fail in the browser
+    last_segment = name.rsplit('/', 1)[-1]
+    if name.startswith(HASHED_PREFIX) or '.' in last_segment:
+        return jsonify({"error": "Not found"}), 404
+    return send_static(dist, INDEX_FILE)
+
+def init_frontend(app):
+    """Serve FRONTEND_DIST from app if it is set."""
+    dist = app.config.get('FRONTEND_DIST')
+    if not dist:
+        return
+    if not os.path.isfile(os.path.join(dist, INDEX_FILE)):
+        raise RuntimeError(f"FRONTEND_DIST={dist} has no {INDEX_FILE}; run `npm run build` in frontend/")
+    app.config['FRONTEND_DIST'] = os.path.abspath(dist)
+    app.register_blueprint(frontend_bp)
@@ -0,0 +1,189 @@
+"""
+Central logging setup.
+
+Records are put on a bounded in-memory queue by the thread that logs them
+and written by a background listener thread, so request threads never
+wait on log I/O. On the request thread a record only gets its request id
+and passes the sampling filter; message formatting (modules log with lazy
+%-style arguments) and JSON encoding happen on the listener. Records are
+dropped, and counted, when the queue is full.
+
+Every request gets an id (the incoming X-Request-ID if it looks like one,
+otherwise a new one), returned in X-Request-ID and attached to everything
+logged while serving it. Each request is logged once on the 'access'
+logger with its status and duration.
+
+LOG_SAMPLE_RATE keeps that fraction of INFO and DEBUG records (access log
+included); warnings and errors are always kept.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from flask import request, g
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+VALID_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+LOG_FORMATS = ('json', 'text')
+TEXT_FORMAT = '%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s'
+
+access_logger = logging.getLogger('access')
+
+# (request id, start time) of the request being served; a context variable
+# so it follows both worker threads and asyncio tasks
+current_request = contextvars.ContextVar('current_request', default=None)
+
+# Attributes every LogRecord has; anything else was passed in extra=
+RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {
+    'message', 'asctime', 'request_id'
+}
+
+_listener = None
+
+def new_request_id(header_value=None):
+    """The client's request id when it is usable, otherwise a fresh one."""
+    if header_value and VALID_REQUEST_ID.match(header_value):
+        return header_value
+    return uuid.uuid4().hex
+
+def start_request(request_id):
+    """Mark the start of a request; returns a token for end_request."""
+    return current_request.set((request_id, time.perf_counter()))
+
+def end_request(token, method, path, status):
+    """Log the request on the access logger and forget it."""
+    request_id, started = current_request.get()
+    duration_ms = round((time.perf_counter() - started) * 1000, 1)
+    access_logger.log(
+        logging.WARNING if status >= 500 else logging.INFO,
+        "%s %s %s %.1fms", method, path, status, duration_ms,
+        extra={'method': method, 'path': path, 'status': status, 'duration_ms': duration_ms}
+    )
+    current_request.reset(token)
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the id of the request being served ('-' outside one)."""
+
+    def filter(self, record):
+        context = current_request.get()
+        record.request_id = context[0] if context else '-'
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of INFO and DEBUG records; always keep the rest."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.INFO or self.rate >= 1 or random.random() < self.rate
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any extra= fields."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', '-'),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never waits and leaves formatting to the listener."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The listener runs in this process, so the record can cross as it
+        # is; QueueHandler would otherwise format it here
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            warning = logging.LogRecord('logs', logging.WARNING, __file__, 0,
+                                        "Dropped %s log records, the log queue was full", (dropped,), None)
+            warning.request_id = '-'
+            try:
+                self.queue.put_nowait(warning)
+            except queue.Full:
+                self.dropped += dropped
+
+def configure_logging(config):
+    """Route the root logger through a queue to a background writer (once per process)."""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    log_format = config['LOG_FORMAT']
+    if log_format not in LOG_FORMATS:
+        raise ValueError(f"LOG_FORMAT must be one of {', '.join(LOG_FORMATS)}")
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if log_format == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.Queue(maxsize=config['LOG_QUEUE_SIZE'])
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(config['LOG_SAMPLE_RATE']))
+    handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(config['LOG_LEVEL'])
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    # Write out whatever is still queued when the process exits
+    atexit.register(_listener.stop)
+    return _listener
+
+def init_logging(app):
+    """Set up logging and give each of app's requests an id and an access log line."""
+    configure_logging(app.config)
+
+    @app.before_request
+    def start_request_log():
+        request_id = new_request_id(request.headers.get(REQUEST_ID_HEADER))
+        g.request_log_token = start_request(request_id)
+
+    @app.after_request
+    def add_request_id(response):
+        if 'request_log_token' in g:
+            response.headers[REQUEST_ID_HEADER] = current_request.get()[0]
+            g.response_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def end_request_log(exc):
+        # Runs once the response has been sent, streamed bodies included
+        token = g.pop('request_log_token', None)
+        if token is not None:
+            status = 500 if exc is not None else g.get('response_status', 500)
+            end_request(token, request.method, request.path, status)
+
+    return _listener
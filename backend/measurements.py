@@ -0,0 +1,180 @@
+"""
+Parsers turning the free-text size and yardage fields into numbers.
+
+Sizes become ranges per sizing system:
+    "6-8-10-12-14"         -> [('numeric', 6, 14)]
+    "XS-M, 18W-24W"        -> [('letter', 1, 3), ('numeric', 18, 24)]
+Letter sizes are stored as positions in LETTER_SIZES, so "S-L" is 2-4.
+
+Yardage becomes one entry per amount, with the fabric width it is for:
+    "View A: 2 1/4 yds 45\"; 1 3/4 yds 60\"" -> [('A', 2.25, 45), ('A', 1.75, 60)]
+    "45\": 3 yds, 60\": 2 yds"              -> [(None, 3, 45), (None, 2, 60)]
+Metres and centimetres are converted to yards and inches.
+
+Anything that can't be read (including the scraper's "Not specified")
+yields no entries; the text fields are left as they are.
+"""
+import re
+
+SIZE_NUMERIC = 'numeric'
+SIZE_LETTER = 'letter'
+
+# Letter sizes in order; aliases map onto the same position
+LETTER_SIZES = {
+    'XXS': 0, 'XS': 1, 'S': 2, 'SMALL': 2, 'M': 3, 'MEDIUM': 3, 'L': 4, 'LARGE': 4,
+    'XL': 5, '1X': 5, '1XL': 5, 'XXL': 6, '2X': 6, '2XL': 6, 'XXXL': 7, '3X': 7, '3XL': 7,
+    '4X': 8, '4XL': 8, '5X': 9, '5XL': 9,
+}
+
+# Sizes this far apart or closer belong to one range ("8, 10, 12" is 8-12)
+SIZE_GAPS = {SIZE_NUMERIC: 2, SIZE_LETTER: 1}
+
+# Larger numbers are body measurements, not sizes
+MAX_NUMERIC_SIZE = 40
+
+SIZE_SEPARATORS = re.compile(r"[,;/&|\n]|\bAND\b")
+SIZE_TOKEN = re.compile(
+    r"(?<!['’])\b(?:(?P<letter>XXXL|XXL|XXS|XL|XS|[1-5]XL?|SMALL|MEDIUM|LARGE|S|M|L)"
+    r"|(?P<number>\d{1,2}(?:\.5)?)W?)\b"
+)
+MEASUREMENT_WORDS = re.compile(r"BUST|WAIST|HIP|CHEST|\bCM\b|\bIN\b|INCH|\"")
+
+FRACTIONS = {'½': 0.5, '¼': 0.25, '¾': 0.75, '⅛': 0.125, '⅜': 0.375, '⅝': 0.625,
+             '⅞': 0.875, '⅓': 1 / 3, '⅔': 2 / 3}
+_FRACTION_CHARS = ''.join(FRACTIONS)
+
+# 2 1/4 | 1/4 | 2.25 | 2¼ | ¼
+AMOUNT = (rf"(?:(?P<whole>\d+)\s+(?P<num>\d+)/(?P<den>\d+)|(?P<num2>\d+)/(?P<den2>\d+)"
+          rf"|(?P<decimal>\d+(?:[.,]\d+)?)\s*(?P<frac>[{_FRACTION_CHARS}])?|(?P<frac2>[{_FRACTION_CHARS}]))")
+YARDAGE_TOKEN = re.compile(
+    rf"(?P<width>(?P<width_value>\d+(?:\.\d+)?)(?:\s*[/-]\s*\d+(?:\.\d+)?)?"
+    r"\s*(?P<width_unit>\"|”|''|-?\s*INCH(?:ES)?\b|\s*IN\b\.?|\s*CM\b))"
+    rf"|(?P<amount>{AMOUNT}\s*(?P<unit>YARDS?|YDS?|METRES?|METERS?|MTRS?|M)\b\.?)"
+    r"|(?P<view>\bVIEWS?\s+(?P<view_label>[A-Z0-9](?:\s*(?:,|&|AND)\s*[A-Z0-9]\b)*))"
+)
+YARDAGE_SEPARATORS = re.compile(r"[;\n]")
+
+METRES_PER_YARD = 0.9144
+CM_PER_INCH = 2.54
+
+# Narrower "widths" are trims and elastic, not fabric
+MIN_FABRIC_WIDTH = 20
+
+def _merge_spans(values, gap):
+    """Merge (min, max) spans that overlap or are at most gap apart."""
+    merged = []
+    for low, high in sorted(values):
+        if merged and low - merged[-1][1] <= gap:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], high))
+        else:
+            merged.append((low, high))
+    return merged
+
+def parse_sizes(text):
+    """
+    Parse a size field into ranges.
+
+    Returns:
+        list: (system, min_value, max_value) tuples, sorted
+    """
+    if not text:
+        return []
+    spans = {SIZE_NUMERIC: [], SIZE_LETTER: []}
+    for segment in SIZE_SEPARATORS.split(text.upper()):
+        if MEASUREMENT_WORDS.search(segment):
+            continue
+        values = {SIZE_NUMERIC: [], SIZE_LETTER: []}
+        for match in SIZE_TOKEN.finditer(segment):
+            if match.group('letter'):
+                values[SIZE_LETTER].append(LETTER_SIZES[match.group('letter')])
+            else:
+                values[SIZE_NUMERIC].append(float(match.group('number')))
+        if any(value > MAX_NUMERIC_SIZE for value in values[SIZE_NUMERIC]):
+            values[SIZE_NUMERIC] = []
+        for system, found in values.items():
+            if found:
+                spans[system].append((min(found), max(found)))
+
+    return [
+        (system, float(low), float(high))
+        for system in sorted(spans)
+        for low, high in _merge_spans(spans[system], SIZE_GAPS[system])
+    ]
+
+def parse_size_value(text):
+    """
+    Parse a single size to look up, e.g. '14', '18W' or 'M'.
+
+    Returns:
+        tuple: (system, value)
+
+    Raises:
+        ValueError: If text is not a size
+    """
+    match = SIZE_TOKEN.fullmatch(text.strip().upper())
+    if not match:
+        raise ValueError(f"'{text}' is not a size")
+    if match.group('letter'):
+        return SIZE_LETTER, float(LETTER_SIZES[match.group('letter')])
+    return SIZE_NUMERIC, float(match.group('number'))
+
+def _amount(match):
+    """Numeric value of an AMOUNT match."""
+    if match.group('whole'):
+        return int(match.group('whole')) + int(match.group('num')) / int(match.group('den'))
+    if match.group('num2'):
+        return int(match.group('num2')) / int(match.group('den2'))
+    if match.group('decimal'):
+        value = float(match.group('decimal').replace(',', '.'))
+        return value + FRACTIONS.get(match.group('frac'), 0)
+    return FRACTIONS[match.group('frac2')]
+
+def parse_yardage(text):
+    """
+    Parse a yardage field into amounts of fabric.
+
+    In each part of the text (split at ';' and line breaks) amounts are
+    paired with the width next to them: the width after an amount, or,
+    when the part starts with a width, the width before it. A "View X"
+    label applies to the amounts after it.
+
+    Returns:
+        list: (view, yards, width_inches) tuples; view and width may be None
+    """
+    if not text:
+        return []
+    entries = []
+    view = None
+    for segment in YARDAGE_SEPARATORS.split(text.upper()):
+        tokens = []
+        for match in YARDAGE_TOKEN.finditer(segment):
+            if match.group('view'):
+                tokens.append(('view', re.sub(r'\s+', ' ', match.group('view_label'))))
+            elif match.group('width'):
+                width = float(match.group('width_value'))
+                if 'CM' in match.group('width_unit'):
+                    width /= CM_PER_INCH
+                if width >= MIN_FABRIC_WIDTH:
+                    tokens.append(('width', round(width, 1)))
+            else:
+                yards = _amount(match)
+                if match.group('unit').startswith('M'):
+                    yards /= METRES_PER_YARD
+                if yards > 0:
+                    tokens.append(('amount', round(yards, 3)))
+
+        kinds = [kind for kind, _ in tokens if kind != 'view']
+        width_first = bool(kinds) and kinds[0] == 'width'
+        current_width = None
+        for i, (kind, value) in enumerate(tokens):
+            if kind == 'view':
+                view = value
+            elif kind == 'width':
+                current_width = value
+            elif width_first:
+                entries.append((view, value, current_width))
+            else:
+                following = tokens[i + 1] if i + 1 < len(tokens) else None
+                width = following[1] if following and following[0] == 'width' else None
+                entries.append((view, value, width))
+    return entries
@@ -0,0 +1,190 @@
+"""
+Per-request memory accounting and byte budgets.
+
+Every request records the change in the worker's resident set size (one
+read of /proc/self/statm at each end, so it's cheap enough to leave on).
+With MEMORY_TRACKING = 'sample', a fraction of requests (one at a time)
+also run under tracemalloc to record the peak Python allocation while
+they were served. tracemalloc sees the whole process, so concurrent
+requests inflate a sample: treat it as an upper bound.
+
+Requests whose RSS growth or peak exceeds MEMORY_OUTLIER_BYTES are logged
+and kept per endpoint; GET /api/metrics/memory (admins only) returns the
+per-endpoint figures.
+
+Blob endpoints declare how many request bytes they may take with
+@byte_budget('<config key>'); larger requests get 413 before their body
+is read.
+"""
+import logging
+import os
+import random
+import threading
+import time
+import tracemalloc
+from collections import deque
+from functools import wraps
+from flask import Blueprint, current_app, request, jsonify, g
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models import db, User
+
+logger = logging.getLogger(__name__)
+
+memory_bp = Blueprint('memory', __name__)
+
+TRACKING_MODES = ('off', 'rss', 'sample')
+
+# Outliers kept per endpoint
+MAX_OUTLIERS = 20
+
+try:
+    PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    PAGE_SIZE = 4096
+
+def current_rss():
+    """Resident set size of this process in bytes, or None where unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+class EndpointStats:
+    """Memory figures for one endpoint."""
+
+    def __init__(self):
+        self.requests = 0
+        self.rss_delta_max = 0
+        self.rss_delta_total = 0
+        self.samples = 0
+        self.peak_max = 0
+        self.outliers = deque(maxlen=MAX_OUTLIERS)
+
+    def to_dict(self):
+        return {
+            'requests': self.requests,
+            'rss_delta_max': self.rss_delta_max,
+            'rss_delta_avg': self.rss_delta_total // self.requests if self.requests else 0,
+            'samples': self.samples,
+            'peak_max': self.peak_max,
+            'outliers': list(self.outliers),
+        }
+
+class MemoryTracker:
+    """Collects per-endpoint memory figures for one app."""
+
+    def __init__(self, config):
+        self.mode = config['MEMORY_TRACKING']
+        if self.mode not in TRACKING_MODES:
+            raise ValueError(f"MEMORY_TRACKING must be one of {', '.join(TRACKING_MODES)}")
+        self.sample_rate = config['MEMORY_SAMPLE_RATE']
+        self.outlier_bytes = config['MEMORY_OUTLIER_BYTES']
+        self.endpoints = {}
+        self._lock = threading.Lock()
+        self._sampling = threading.Lock()
+
+    def start(self):
+        """Begin measuring a request; returns the state finish() needs."""
+        sampled = (
+            self.mode == 'sample'
+            and random.random() < self.sample_rate
+            and not tracemalloc.is_tracing()
+            and self._sampling.acquire(blocking=False)
+        )
+        if sampled:
+            tracemalloc.start()
+        return {'rss': current_rss(), 'sampled': sampled, 'started': time.monotonic()}
+
+    def finish(self, endpoint, method, status, state):
+        """Record a finished request measured since start()."""
+        peak = None
+        if state['sampled']:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self._sampling.release()
+
+        rss = current_rss()
+        rss_delta = rss - state['rss'] if rss is not None and state['rss'] is not None else 0
+
+        with self._lock:
+            stats = self.endpoints.setdefault(endpoint, EndpointStats())
+            stats.requests += 1
+            stats.rss_delta_total += rss_delta
+            stats.rss_delta_max = max(stats.rss_delta_max, rss_delta)
+            if peak is not None:
+                stats.samples += 1
+                stats.peak_max = max(stats.peak_max, peak)
+
+            if max(rss_delta, peak or 0) > self.outlier_bytes:
+                outlier = {
+                    'at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    'method': method,
+                    'status': status,
+                    'rss_delta': rss_delta,
+                    'peak': peak,
+                    'seconds': round(time.monotonic() - state['started'], 3),
+                }
+                stats.outliers.append(outlier)
+                logger.warning("Memory outlier on %s %s: RSS +%s bytes, peak %s bytes traced",
+                               method, endpoint, rss_delta, peak if peak is not None else '-')
+
+    def to_dict(self):
+        with self._lock:
+            return {endpoint: stats.to_dict() for endpoint, stats in sorted(self.endpoints.items())}
+
+def byte_budget(config_key):
+    """Refuse requests whose body is larger than app.config[config_key] with 413."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            budget = current_app.config[config_key]
+            if request.content_length is not None and request.content_length > budget:
+                return jsonify({
+                    "error": f"Request body is {request.content_length} bytes; the limit is {budget}"
+                }), 413
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+@memory_bp.route('/api/metrics/memory', methods=['GET'])
+@jwt_required()
+def get_memory_metrics():
+    """Per-endpoint memory figures (admins only)"""
+    user = db.session.get(User, int(get_jwt_identity()))
+    if not user or not user.is_admin:
+        return jsonify({"error": "Admin access required"}), 403
+
+    tracker = current_app.extensions['memory']
+    return jsonify({
+        'mode': tracker.mode,
+        'rss': current_rss(),
+        'endpoints': tracker.to_dict()
+    }), 200
+
+def init_memory_tracking(app):
+    """Measure every request of app according to MEMORY_TRACKING."""
+    tracker = app.extensions['memory'] = MemoryTracker(app.config)
+    if tracker.mode == 'off':
+        return tracker
+
+    @app.before_request
+    def start_measuring():
+        g.memory_state = tracker.start()
+
+    @app.after_request
+    def finish_measuring(response):
+        state = g.pop('memory_state', None)
+        if state is not None:
+            endpoint, method, status = request.endpoint or 'unknown', request.method, response.status_code
+            # Streamed bodies are produced after this point; measure until sent
+            response.call_on_close(lambda: tracker.finish(endpoint, method, status, state))
+        return response
+
+    @app.teardown_request
+    def finish_failed_request(exc):
+        state = g.pop('memory_state', None)
+        if state is not None:
+            tracker.finish(request.endpoint or 'unknown', request.method, 500, state)
+
+    return tracker
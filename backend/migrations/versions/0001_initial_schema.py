@@ -0,0 +1,81 @@
+"""initial schema
+
+Matches the tables previously created by db.create_all() at startup.
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'user',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=50), nullable=False),
+        sa.Column('email', sa.String(length=100), nullable=False),
+        sa.Column('password_hash', sa.String(length=200), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('is_admin', sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email'),
+        sa.UniqueConstraint('username')
+    )
+    op.create_table(
+        'pattern',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('brand', sa.String(length=50), nullable=False),
+        sa.Column('pattern_number', sa.String(length=50), nullable=False),
+        sa.Column('title', sa.String(length=200), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('image', sa.String(length=500), nullable=True),
+        sa.Column('image_data', sa.LargeBinary(), nullable=True),
+        sa.Column('difficulty', sa.String(length=50), nullable=True),
+        sa.Column('size', sa.String(length=50), nullable=True),
+        sa.Column('sex', sa.String(length=50), nullable=True),
+        sa.Column('item_type', sa.String(length=100), nullable=True),
+        sa.Column('format', sa.String(length=50), nullable=True),
+        sa.Column('inventory_qty', sa.Integer(), nullable=True),
+        sa.Column('cut_status', sa.String(length=50), nullable=True),
+        sa.Column('cut_size', sa.String(length=50), nullable=True),
+        sa.Column('cosplay_hackable', sa.Boolean(), nullable=True),
+        sa.Column('cosplay_notes', sa.Text(), nullable=True),
+        sa.Column('material_recommendations', sa.Text(), nullable=True),
+        sa.Column('yardage', sa.Text(), nullable=True),
+        sa.Column('notions', sa.Text(), nullable=True),
+        sa.Column('notes', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'pattern_pdf',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('pattern_id', sa.Integer(), nullable=False),
+        sa.Column('category', sa.String(length=20), nullable=False),
+        sa.Column('file_order', sa.Integer(), nullable=True),
+        sa.Column('pdf_url', sa.String(length=500), nullable=True),
+        sa.Column('pdf_data', sa.LargeBinary(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['pattern_id'], ['pattern.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('pattern_pdf')
+    op.drop_table('pattern')
+    op.drop_table('user')
@@ -0,0 +1,30 @@
+"""index foreign keys
+
+Postgres does not index foreign key columns on its own. Loading a
+pattern's PDFs, cascading pattern deletes and looking up a user's
+patterns all filter on these columns.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 09:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_pattern_pdf_pattern_id', 'pattern_pdf', ['pattern_id'])
+    op.create_index('ix_pattern_user_id', 'pattern', ['user_id'])
+
+
+def downgrade():
+    op.drop_index('ix_pattern_user_id', table_name='pattern')
+    op.drop_index('ix_pattern_pdf_pattern_id', table_name='pattern_pdf')
@@ -0,0 +1,87 @@
+"""unique brand + pattern_number
+
+Existing duplicates are merged into the oldest pattern of each pair
+first: fields it is missing are filled from the most recently updated
+duplicate that has them, inventory_qty becomes the largest quantity
+recorded, and the duplicates' PDFs are moved over to it.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+# Values that don't count as data when merging (scraper placeholders as of
+# this revision)
+PLACEHOLDERS = {'Unknown', 'Not specified', 'No description available', 'https://via.placeholder.com/150'}
+
+# Columns not merged between duplicates
+IDENTITY_COLUMNS = ('id', 'brand', 'pattern_number', 'created_at', 'updated_at', 'inventory_qty', 'user_id')
+
+
+def is_unset(value):
+    if isinstance(value, str):
+        return value.strip() == '' or value in PLACEHOLDERS
+    return value is None
+
+
+def merge_duplicates(bind):
+    """Merge patterns sharing a brand and pattern number, using this revision's tables."""
+    metadata = sa.MetaData()
+    pattern = sa.Table('pattern', metadata, autoload_with=bind)
+    pattern_pdf = sa.Table('pattern_pdf', metadata, autoload_with=bind)
+    columns = [column.name for column in pattern.c if column.name not in IDENTITY_COLUMNS]
+
+    groups = bind.execute(
+        sa.select(pattern.c.brand, pattern.c.pattern_number)
+        .group_by(pattern.c.brand, pattern.c.pattern_number)
+        .having(sa.func.count() > 1)
+    ).all()
+    for brand, pattern_number in groups:
+        rows = bind.execute(
+            sa.select(pattern).where(pattern.c.brand == brand, pattern.c.pattern_number == pattern_number)
+            .order_by(pattern.c.id)
+        ).mappings().all()
+        keeper, duplicates = rows[0], rows[1:]
+        newest_first = sorted(duplicates, key=lambda row: (row['updated_at'] is not None, row['updated_at']),
+                              reverse=True)
+
+        values = {}
+        for duplicate in newest_first:
+            for column in columns:
+                if is_unset(values.get(column, keeper[column])) and not is_unset(duplicate[column]):
+                    values[column] = duplicate[column]
+        quantities = [row['inventory_qty'] for row in rows if row['inventory_qty'] is not None]
+        if quantities:
+            values['inventory_qty'] = max(quantities)
+
+        duplicate_ids = [row['id'] for row in duplicates]
+        if values:
+            bind.execute(pattern.update().where(pattern.c.id == keeper['id']).values(**values))
+        bind.execute(
+            pattern_pdf.update().where(pattern_pdf.c.pattern_id.in_(duplicate_ids))
+            .values(pattern_id=keeper['id'])
+        )
+        bind.execute(pattern.delete().where(pattern.c.id.in_(duplicate_ids)))
+
+
+def upgrade():
+    merge_duplicates(op.get_bind())
+    op.create_index(
+        'uq_pattern_brand_pattern_number', 'pattern',
+        ['brand', 'pattern_number'], unique=True
+    )
+
+
+def downgrade():
+    op.drop_index('uq_pattern_brand_pattern_number', table_name='pattern')
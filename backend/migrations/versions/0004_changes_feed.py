@@ -0,0 +1,34 @@
+"""changes feed: tombstones and updated_at index
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'tombstone',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('entity', sa.String(length=20), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('pattern_id', sa.Integer(), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_pattern_updated_at_id', 'pattern', ['updated_at', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_pattern_updated_at_id', table_name='pattern')
+    op.drop_table('tombstone')
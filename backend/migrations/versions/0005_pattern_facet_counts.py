@@ -0,0 +1,133 @@
+"""pattern facet counts maintained by triggers
+
+Adds pattern_facet_count with one row per (facet, value), seeded from the
+existing patterns and kept current by row triggers on pattern, so every
+write path (ORM, upserts, manual SQL) updates the counts. Postgres gets
+plpgsql triggers; SQLite, used for local development, gets equivalents.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+FACETS = ('brand', 'difficulty', 'item_type', 'format', 'cut_status', 'cosplay_hackable')
+
+
+def facet_value(row, facet):
+    """SQL for the text key of a facet value; '' means not set."""
+    if facet == 'cosplay_hackable':
+        return (f"CASE WHEN {row}.{facet} THEN 'true' "
+                f"WHEN NOT {row}.{facet} THEN 'false' ELSE '' END")
+    return f"COALESCE({row}.{facet}, '')"
+
+
+def seed_counts():
+    op.execute("DELETE FROM pattern_facet_count")
+    for facet in FACETS:
+        op.execute(
+            f"INSERT INTO pattern_facet_count (facet, value, count) "
+            f"SELECT '{facet}', {facet_value('pattern', facet)}, count(*) "
+            f"FROM pattern GROUP BY 2"
+        )
+
+
+def create_postgresql_triggers():
+    op.execute("""
+        CREATE FUNCTION pattern_facet_count_add(p_facet text, p_value text, p_delta integer)
+        RETURNS void AS $$
+        BEGIN
+            INSERT INTO pattern_facet_count (facet, value, count)
+            VALUES (p_facet, p_value, p_delta)
+            ON CONFLICT (facet, value)
+            DO UPDATE SET count = pattern_facet_count.count + EXCLUDED.count;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+
+    def add(row, delta):
+        return " ".join(
+            f"PERFORM pattern_facet_count_add('{f}', {facet_value(row, f)}, {delta});"
+            for f in FACETS
+        )
+    changes = " ".join(
+        f"IF {facet_value('OLD', f)} IS DISTINCT FROM {facet_value('NEW', f)} THEN "
+        f"PERFORM pattern_facet_count_add('{f}', {facet_value('OLD', f)}, -1); "
+        f"PERFORM pattern_facet_count_add('{f}', {facet_value('NEW', f)}, 1); "
+        f"END IF;"
+        for f in FACETS
+    )
+    op.execute(f"""
+        CREATE FUNCTION pattern_facet_count_trigger() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                {add('NEW', 1)}
+            ELSIF TG_OP = 'DELETE' THEN
+                {add('OLD', -1)}
+            ELSE
+                {changes}
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute(f"""
+        CREATE TRIGGER pattern_facet_count
+        AFTER INSERT OR DELETE OR UPDATE OF {', '.join(FACETS)} ON pattern
+        FOR EACH ROW EXECUTE FUNCTION pattern_facet_count_trigger()
+    """)
+
+
+def create_sqlite_triggers():
+    def add(row, delta):
+        return "\n".join(
+            f"INSERT INTO pattern_facet_count (facet, value, count) "
+            f"VALUES ('{f}', {facet_value(row, f)}, {delta}) "
+            f"ON CONFLICT (facet, value) DO UPDATE SET count = count + ({delta});"
+            for f in FACETS
+        )
+    op.execute(f"CREATE TRIGGER pattern_facet_count_insert AFTER INSERT ON pattern BEGIN {add('NEW', 1)} END")
+    op.execute(f"CREATE TRIGGER pattern_facet_count_delete AFTER DELETE ON pattern BEGIN {add('OLD', -1)} END")
+    op.execute(
+        f"CREATE TRIGGER pattern_facet_count_update AFTER UPDATE OF {', '.join(FACETS)} ON pattern "
+        f"BEGIN {add('OLD', -1)} {add('NEW', 1)} END"
+    )
+
+
+def upgrade():
+    op.create_table(
+        'pattern_facet_count',
+        sa.Column('facet', sa.String(length=30), nullable=False),
+        sa.Column('value', sa.String(length=100), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('facet', 'value')
+    )
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        create_postgresql_triggers()
+    elif dialect == 'sqlite':
+        create_sqlite_triggers()
+    else:
+        raise RuntimeError(f"No facet count triggers for '{dialect}'")
+    seed_counts()
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("DROP TRIGGER IF EXISTS pattern_facet_count ON pattern")
+        op.execute("DROP FUNCTION IF EXISTS pattern_facet_count_trigger()")
+        op.execute("DROP FUNCTION IF EXISTS pattern_facet_count_add(text, text, integer)")
+    elif dialect == 'sqlite':
+        for event in ('insert', 'delete', 'update'):
+            op.execute(f"DROP TRIGGER IF EXISTS pattern_facet_count_{event}")
+    op.drop_table('pattern_facet_count')
@@ -0,0 +1,36 @@
+"""pdf ingest metadata: upload hash and sizes
+
+Records the SHA-256 of each PDF as uploaded (to spot duplicate uploads)
+and its size before and after the ingest step. Existing rows are left
+NULL, marking them as not ingested; `flask optimize-pdfs` processes them.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('pattern_pdf') as batch_op:
+        batch_op.add_column(sa.Column('upload_sha256', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('original_size', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('stored_size', sa.Integer(), nullable=True))
+    op.create_index('ix_pattern_pdf_upload_sha256', 'pattern_pdf', ['upload_sha256'])
+
+
+def downgrade():
+    op.drop_index('ix_pattern_pdf_upload_sha256', table_name='pattern_pdf')
+    with op.batch_alter_table('pattern_pdf') as batch_op:
+        batch_op.drop_column('stored_size')
+        batch_op.drop_column('original_size')
+        batch_op.drop_column('upload_sha256')
@@ -0,0 +1,58 @@
+"""structured size and yardage tables
+
+Sizes and yardages parsed from the free-text fields (see measurements.py),
+indexed for range queries. Run `flask backfill-measurements` to fill them
+for existing patterns.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'pattern_size_range',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('pattern_id', sa.Integer(), nullable=False),
+        sa.Column('field', sa.String(length=20), nullable=False),
+        sa.Column('system', sa.String(length=10), nullable=False),
+        sa.Column('min_value', sa.Float(), nullable=False),
+        sa.Column('max_value', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['pattern_id'], ['pattern.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_pattern_size_range_pattern_id', 'pattern_size_range', ['pattern_id'])
+    op.create_index('ix_pattern_size_range_lookup', 'pattern_size_range', ['system', 'min_value', 'max_value'])
+
+    op.create_table(
+        'pattern_yardage',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('pattern_id', sa.Integer(), nullable=False),
+        sa.Column('view', sa.String(length=50), nullable=True),
+        sa.Column('yards', sa.Float(), nullable=False),
+        sa.Column('width_inches', sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(['pattern_id'], ['pattern.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_pattern_yardage_pattern_id', 'pattern_yardage', ['pattern_id'])
+    op.create_index('ix_pattern_yardage_width_yards', 'pattern_yardage', ['width_inches', 'yards'])
+
+
+def downgrade():
+    op.drop_index('ix_pattern_yardage_width_yards', table_name='pattern_yardage')
+    op.drop_index('ix_pattern_yardage_pattern_id', table_name='pattern_yardage')
+    op.drop_table('pattern_yardage')
+    op.drop_index('ix_pattern_size_range_lookup', table_name='pattern_size_range')
+    op.drop_index('ix_pattern_size_range_pattern_id', table_name='pattern_size_range')
+    op.drop_table('pattern_size_range')
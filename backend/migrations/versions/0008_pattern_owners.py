@@ -0,0 +1,244 @@
+"""pattern owners: per-user uniqueness, indexes and facet counts
+
+Brand + pattern_number becomes unique per owner (partial unique indexes:
+one over (user_id, brand, pattern_number) for owned patterns, one over
+(brand, pattern_number) for patterns without an owner). Indexes used by
+owner-scoped queries lead on user_id, tombstones record the owner of what
+was deleted, and pattern_facet_count is kept per owner (user_id 0 for
+patterns without one) by triggers that also follow changes of user_id.
+
+Run `flask assign-patterns <username>` afterwards to give existing
+patterns an owner.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+FACETS = ('brand', 'difficulty', 'item_type', 'format', 'cut_status', 'cosplay_hackable')
+
+
+def facet_value(row, facet):
+    """SQL for the text key of a facet value; '' means not set."""
+    if facet == 'cosplay_hackable':
+        return (f"CASE WHEN {row}.{facet} THEN 'true' "
+                f"WHEN NOT {row}.{facet} THEN 'false' ELSE '' END")
+    return f"COALESCE({row}.{facet}, '')"
+
+
+def owner_key(row):
+    """SQL for the owner key of a row; 0 means no owner."""
+    return f"COALESCE({row}.user_id, 0)"
+
+
+def create_facet_table(per_user):
+    columns = [sa.Column('user_id', sa.Integer(), nullable=False)] if per_user else []
+    op.create_table(
+        'pattern_facet_count',
+        *columns,
+        sa.Column('facet', sa.String(length=30), nullable=False),
+        sa.Column('value', sa.String(length=100), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint(*(['user_id'] if per_user else []), 'facet', 'value')
+    )
+
+
+def seed_counts(per_user):
+    for facet in FACETS:
+        if per_user:
+            op.execute(
+                f"INSERT INTO pattern_facet_count (user_id, facet, value, count) "
+                f"SELECT {owner_key('pattern')}, '{facet}', {facet_value('pattern', facet)}, count(*) "
+                f"FROM pattern GROUP BY 1, 3"
+            )
+        else:
+            op.execute(
+                f"INSERT INTO pattern_facet_count (facet, value, count) "
+                f"SELECT '{facet}', {facet_value('pattern', facet)}, count(*) "
+                f"FROM pattern GROUP BY 2"
+            )
+
+
+def create_postgresql_triggers(per_user):
+    if per_user:
+        op.execute("""
+            CREATE FUNCTION pattern_facet_count_add(p_user integer, p_facet text, p_value text, p_delta integer)
+            RETURNS void AS $$
+            BEGIN
+                INSERT INTO pattern_facet_count (user_id, facet, value, count)
+                VALUES (p_user, p_facet, p_value, p_delta)
+                ON CONFLICT (user_id, facet, value)
+                DO UPDATE SET count = pattern_facet_count.count + EXCLUDED.count;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+    else:
+        op.execute("""
+            CREATE FUNCTION pattern_facet_count_add(p_facet text, p_value text, p_delta integer)
+            RETURNS void AS $$
+            BEGIN
+                INSERT INTO pattern_facet_count (facet, value, count)
+                VALUES (p_facet, p_value, p_delta)
+                ON CONFLICT (facet, value)
+                DO UPDATE SET count = pattern_facet_count.count + EXCLUDED.count;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+
+    def key(row, facet):
+        if per_user:
+            return f"{owner_key(row)}, '{facet}', {facet_value(row, facet)}"
+        return f"'{facet}', {facet_value(row, facet)}"
+
+    def add(row, delta):
+        return " ".join(f"PERFORM pattern_facet_count_add({key(row, f)}, {delta});" for f in FACETS)
+
+    def changed(facet):
+        if per_user:
+            return (f"({owner_key('OLD')}, {facet_value('OLD', facet)}) IS DISTINCT FROM "
+                    f"({owner_key('NEW')}, {facet_value('NEW', facet)})")
+        return f"{facet_value('OLD', facet)} IS DISTINCT FROM {facet_value('NEW', facet)}"
+
+    changes = " ".join(
+        f"IF {changed(f)} THEN "
+        f"PERFORM pattern_facet_count_add({key('OLD', f)}, -1); "
+        f"PERFORM pattern_facet_count_add({key('NEW', f)}, 1); "
+        f"END IF;"
+        for f in FACETS
+    )
+    op.execute(f"""
+        CREATE FUNCTION pattern_facet_count_trigger() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                {add('NEW', 1)}
+            ELSIF TG_OP = 'DELETE' THEN
+                {add('OLD', -1)}
+            ELSE
+                {changes}
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    watched = FACETS + (('user_id',) if per_user else ())
+    op.execute(f"""
+        CREATE TRIGGER pattern_facet_count
+        AFTER INSERT OR DELETE OR UPDATE OF {', '.join(watched)} ON pattern
+        FOR EACH ROW EXECUTE FUNCTION pattern_facet_count_trigger()
+    """)
+
+
+def create_sqlite_triggers(per_user):
+    def add(row, delta):
+        if per_user:
+            return "\n".join(
+                f"INSERT INTO pattern_facet_count (user_id, facet, value, count) "
+                f"VALUES ({owner_key(row)}, '{f}', {facet_value(row, f)}, {delta}) "
+                f"ON CONFLICT (user_id, facet, value) DO UPDATE SET count = count + ({delta});"
+                for f in FACETS
+            )
+        return "\n".join(
+            f"INSERT INTO pattern_facet_count (facet, value, count) "
+            f"VALUES ('{f}', {facet_value(row, f)}, {delta}) "
+            f"ON CONFLICT (facet, value) DO UPDATE SET count = count + ({delta});"
+            for f in FACETS
+        )
+    watched = FACETS + (('user_id',) if per_user else ())
+    op.execute(f"CREATE TRIGGER pattern_facet_count_insert AFTER INSERT ON pattern BEGIN {add('NEW', 1)} END")
+    op.execute(f"CREATE TRIGGER pattern_facet_count_delete AFTER DELETE ON pattern BEGIN {add('OLD', -1)} END")
+    op.execute(
+        f"CREATE TRIGGER pattern_facet_count_update AFTER UPDATE OF {', '.join(watched)} ON pattern "
+        f"BEGIN {add('OLD', -1)} {add('NEW', 1)} END"
+    )
+
+
+def drop_facet_counts(dialect):
+    if dialect == 'postgresql':
+        op.execute("DROP TRIGGER IF EXISTS pattern_facet_count ON pattern")
+        op.execute("DROP FUNCTION IF EXISTS pattern_facet_count_trigger()")
+        op.execute("DROP FUNCTION IF EXISTS pattern_facet_count_add(text, text, integer)")
+        op.execute("DROP FUNCTION IF EXISTS pattern_facet_count_add(integer, text, text, integer)")
+    elif dialect == 'sqlite':
+        for event in ('insert', 'delete', 'update'):
+            op.execute(f"DROP TRIGGER IF EXISTS pattern_facet_count_{event}")
+    op.drop_table('pattern_facet_count')
+
+
+def create_facet_counts(dialect, per_user):
+    create_facet_table(per_user)
+    if dialect == 'postgresql':
+        create_postgresql_triggers(per_user)
+    elif dialect == 'sqlite':
+        create_sqlite_triggers(per_user)
+    else:
+        raise RuntimeError(f"No facet count triggers for '{dialect}'")
+    seed_counts(per_user)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    op.drop_index('uq_pattern_brand_pattern_number', table_name='pattern')
+    op.create_index(
+        'uq_pattern_user_id_brand_pattern_number', 'pattern',
+        ['user_id', 'brand', 'pattern_number'], unique=True,
+        postgresql_where=sa.text('user_id IS NOT NULL'), sqlite_where=sa.text('user_id IS NOT NULL')
+    )
+    op.create_index(
+        'uq_pattern_unowned_brand_pattern_number', 'pattern',
+        ['brand', 'pattern_number'], unique=True,
+        postgresql_where=sa.text('user_id IS NULL'), sqlite_where=sa.text('user_id IS NULL')
+    )
+    # (user_id, id) also serves the foreign key, replacing ix_pattern_user_id
+    op.drop_index('ix_pattern_user_id', table_name='pattern')
+    op.create_index('ix_pattern_user_id_id', 'pattern', ['user_id', 'id'])
+    op.create_index('ix_pattern_user_id_updated_at_id', 'pattern', ['user_id', 'updated_at', 'id'])
+
+    with op.batch_alter_table('tombstone') as batch_op:
+        batch_op.add_column(sa.Column('user_id', sa.Integer(), nullable=True))
+    op.create_index('ix_tombstone_user_id_id', 'tombstone', ['user_id', 'id'])
+
+    drop_facet_counts(dialect)
+    create_facet_counts(dialect, per_user=True)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT count(*) FROM ("
+        " SELECT brand, pattern_number FROM pattern"
+        " GROUP BY brand, pattern_number HAVING count(*) > 1"
+        ") AS duplicates"
+    )).scalar()
+    if duplicates:
+        raise RuntimeError(
+            f"{duplicates} brand/pattern_number combinations are in more than one "
+            "collection; merge them before downgrading"
+        )
+
+    drop_facet_counts(dialect)
+    create_facet_counts(dialect, per_user=False)
+
+    op.drop_index('ix_tombstone_user_id_id', table_name='tombstone')
+    with op.batch_alter_table('tombstone') as batch_op:
+        batch_op.drop_column('user_id')
+
+    op.drop_index('ix_pattern_user_id_updated_at_id', table_name='pattern')
+    op.drop_index('ix_pattern_user_id_id', table_name='pattern')
+    op.create_index('ix_pattern_user_id', 'pattern', ['user_id'])
+    op.drop_index('uq_pattern_unowned_brand_pattern_number', table_name='pattern')
+    op.drop_index('uq_pattern_user_id_brand_pattern_number', table_name='pattern')
+    op.create_index(
+        'uq_pattern_brand_pattern_number', 'pattern',
+        ['brand', 'pattern_number'], unique=True
+    )
@@ -0,0 +1,37 @@
+"""pattern thumbnails
+
+Small JPEGs of the stored pattern images for the gallery (see
+thumbnails.py). Run `flask backfill-thumbnails` to make them for images
+stored earlier.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'pattern_thumbnail',
+        sa.Column('pattern_id', sa.Integer(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('width', sa.Integer(), nullable=False),
+        sa.Column('height', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['pattern_id'], ['pattern.id']),
+        sa.PrimaryKeyConstraint('pattern_id')
+    )
+
+
+def downgrade():
+    op.drop_table('pattern_thumbnail')
@@ -1,8 +1,81 @@
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from werkzeug.security import generate_password_hash, check_password_hash
+from collections import Counter
 from datetime import datetime
+from replicas import RoutingSession
+from measurements import parse_sizes, parse_yardage
+from signed_urls import sign_url
 
-# Initialize SQLAlchemy instance
-db = SQLAlchemy()
+# Initialize SQLAlchemy instance (reads may be routed to replicas, see replicas.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+class utc_now(FunctionElement):
+    """The database's current UTC time.
+    
+    Timestamps the changes feed compares (Pattern.updated_at,
+    Tombstone.deleted_at and the feed's settle horizon) come from this one
+    clock rather than from each app server's.
+    """
+    type = db.DateTime()
+    inherit_cache = True
+
+@compiles(utc_now)
+def _utc_now(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP"
+
+@compiles(utc_now, 'postgresql')
+def _utc_now_postgresql(element, compiler, **kw):
+    return "TIMEZONE('utc', CLOCK_TIMESTAMP())"
+
+@compiles(utc_now, 'sqlite')
+def _utc_now_sqlite(element, compiler, **kw):
+    # Same text format as SQLAlchemy stores, so stored and bound values compare in order
+    return "STRFTIME('%Y-%m-%d %H:%M:%f000', 'now')"
+
+def database_now(session=None):
+    """Current UTC time on the primary database's clock."""
+    session = session or db.session
+    return session.execute(db.select(utc_now()), bind_arguments={'bind': db.engine}).scalar()
+
+# User model
+class User(db.Model):
+    """User model for authentication."""
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(50), unique=True, nullable=False)
+    email = db.Column(db.String(100), unique=True, nullable=False)
+    password_hash = db.Column(db.String(200), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    is_admin = db.Column(db.Boolean, default=False)
+    
+    def set_password(self, password):
+        """Hash and set the user password."""
+        self.password_hash = generate_password_hash(password)
+        
+    def check_password(self, password):
+        """Check if the provided password matches the stored hash."""
+        return check_password_hash(self.password_hash, password)
+    
+    def to_dict(self):
+        """Convert user object to dictionary (excluding sensitive data)."""
+        return {
+            'id': self.id,
+            'username': self.username,
+            'email': self.email,
+            'created_at': self.created_at.isoformat(),
+            'is_admin': self.is_admin
+        }
+
+# Keys produced by Pattern.to_dict(), for sparse field selection
+PATTERN_FIELDS = (
+    'id', 'brand', 'pattern_number', 'title', 'description', 'difficulty',
+    'size', 'sex', 'item_type', 'format', 'inventory_qty', 'cut_status',
+    'cut_size', 'cosplay_hackable', 'cosplay_notes', 'material_recommendations',
+    'yardage', 'notions', 'notes', 'created_at', 'updated_at', 'user_id',
+    'pdf_files', 'has_image', 'image_url'
+)
 
 class Pattern(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -13,7 +86,8 @@ class Pattern(db.Model):
     
     # Image handling
     image = db.Column(db.String(500))  # Fallback URL for the image
-    image_data = db.Column(db.LargeBinary, nullable=True)  # Binary image data
+    image_data = db.deferred(db.Column(db.LargeBinary, nullable=True))  # Binary image data, loaded on access
+    has_image_data = db.column_property(image_data.expression.isnot(None))
     
     # Pattern details
     difficulty = db.Column(db.String(50))
@@ -37,16 +111,44 @@ class Pattern(db.Model):
     
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # On the database's clock, like everything the changes feed compares
+    updated_at = db.Column(db.DateTime, default=utc_now(), onupdate=utc_now())
     
     # Relationships
     pdf_files = db.relationship('PatternPDF', backref='pattern', lazy=True, cascade="all, delete-orphan")
     
-    # Add user relationship for ownership
+    # Parsed from size/cut_size and yardage by sync_measurements()
+    size_ranges = db.relationship('PatternSizeRange', lazy=True, cascade="all, delete-orphan")
+    yardages = db.relationship('PatternYardage', lazy=True, cascade="all, delete-orphan")
+
+    # Small copy of image_data for the gallery, see thumbnails.py
+    thumbnail = db.relationship('PatternThumbnail', uselist=False, lazy=True, cascade="all, delete-orphan")
+
+    # Owner of the pattern; collection queries are scoped to it (ownership.py)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     
-    def to_dict(self, include_image_data=False):
-        """Convert pattern object to dictionary."""
+    __table_args__ = (
+        # One row per pattern in each user's collection, and one among the
+        # patterns without an owner; writes go through pattern_store.upsert_pattern
+        db.Index('uq_pattern_user_id_brand_pattern_number', 'user_id', 'brand', 'pattern_number',
+                 unique=True, postgresql_where=db.text('user_id IS NOT NULL'),
+                 sqlite_where=db.text('user_id IS NOT NULL')),
+        db.Index('uq_pattern_unowned_brand_pattern_number', 'brand', 'pattern_number',
+                 unique=True, postgresql_where=db.text('user_id IS NULL'),
+                 sqlite_where=db.text('user_id IS NULL')),
+        # Page order of a user's list, and keyset order of the changes feed
+        # overall and per user
+        db.Index('ix_pattern_user_id_id', 'user_id', 'id'),
+        db.Index('ix_pattern_updated_at_id', 'updated_at', 'id'),
+        db.Index('ix_pattern_user_id_updated_at_id', 'user_id', 'updated_at', 'id'),
+    )
+    
+    def to_dict(self, include_image_data=False, fields=None):
+        """Convert pattern object to dictionary.
+        
+        If fields is given, only those keys (and 'id') are returned, and the
+        PDF list is only loaded when 'pdf_files' is among them.
+        """
         result = {
             'id': self.id,
             'brand': self.brand,
@@ -69,28 +171,40 @@ class Pattern(db.Model):
             'notes': self.notes,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'pdf_files': [pdf.to_dict() for pdf in self.pdf_files],
             'user_id': self.user_id
         }
         
+        if fields is None or 'pdf_files' in fields:
+            result['pdf_files'] = [pdf.to_dict() for pdf in self.pdf_files]
+        
         # Handle image data
-        if self.image_data and not include_image_data:
+        if self.has_image_data and not include_image_data:
             result['has_image'] = True
-            result['image_url'] = f"/api/patterns/{self.id}/image"
+            # Signed, since <img> tags can't send a token (see signed_urls.py)
+            result['image_url'] = sign_url(f"/api/patterns/{self.id}/image")
         else:
             result['has_image'] = False
             result['image_url'] = self.image
+        
+        if fields is not None:
+            result = {key: value for key, value in result.items() if key == 'id' or key in fields}
             
         return result
 
 class PatternPDF(db.Model):
     """PDF files associated with patterns."""
     id = db.Column(db.Integer, primary_key=True)
-    pattern_id = db.Column(db.Integer, db.ForeignKey('pattern.id'), nullable=False)
+    pattern_id = db.Column(db.Integer, db.ForeignKey('pattern.id'), nullable=False, index=True)
     category = db.Column(db.String(20), nullable=False)
     file_order = db.Column(db.Integer, nullable=True)
     pdf_url = db.Column(db.String(500))  # Fallback URL for the PDF
-    pdf_data = db.Column(db.LargeBinary, nullable=True)  # Binary PDF file data
+    pdf_data = db.deferred(db.Column(db.LargeBinary, nullable=True))  # Binary PDF file data, loaded on access
+    has_pdf_data = db.column_property(pdf_data.expression.isnot(None))
+    
+    # Set by the ingest step (pdf_ingest.py)
+    upload_sha256 = db.Column(db.String(64), nullable=True, index=True)  # Hash of the file as uploaded
+    original_size = db.Column(db.Integer, nullable=True)  # Bytes as uploaded
+    stored_size = db.Column(db.Integer, nullable=True)  # Bytes in pdf_data
     
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -103,20 +217,170 @@ class PatternPDF(db.Model):
             'pattern_id': self.pattern_id,
             'category': self.category,
             'file_order': self.file_order,
+            'original_size': self.original_size,
+            'stored_size': self.stored_size,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
         
         # Handle PDF data
-        if self.pdf_data:
+        if self.has_pdf_data:
             result['has_pdf'] = True
-            result['pdf_url'] = f"/api/pdfs/{self.id}"
+            result['pdf_url'] = sign_url(f"/api/pdfs/{self.id}")
         else:
             result['has_pdf'] = False
             result['pdf_url'] = self.pdf_url
             
         return result
 
-# Import User model from auth.py to avoid circular imports
-# This is referenced in the Pattern model above
-from auth import User
+class PatternSizeRange(db.Model):
+    """A range of sizes a pattern comes in (field 'size') or is cut to ('cut_size').
+    
+    Letter sizes are stored by their position in measurements.LETTER_SIZES.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    pattern_id = db.Column(db.Integer, db.ForeignKey('pattern.id'), nullable=False, index=True)
+    field = db.Column(db.String(20), nullable=False)
+    system = db.Column(db.String(10), nullable=False)
+    min_value = db.Column(db.Float, nullable=False)
+    max_value = db.Column(db.Float, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_pattern_size_range_lookup', 'system', 'min_value', 'max_value'),
+    )
+    
+    def key(self):
+        return (self.field, self.system, self.min_value, self.max_value)
+
+class PatternYardage(db.Model):
+    """Fabric a pattern (or one of its views) needs at a given width."""
+    id = db.Column(db.Integer, primary_key=True)
+    pattern_id = db.Column(db.Integer, db.ForeignKey('pattern.id'), nullable=False, index=True)
+    view = db.Column(db.String(50), nullable=True)
+    yards = db.Column(db.Float, nullable=False)
+    width_inches = db.Column(db.Float, nullable=True)
+    
+    __table_args__ = (
+        db.Index('ix_pattern_yardage_width_yards', 'width_inches', 'yards'),
+    )
+    
+    def key(self):
+        return (self.view, self.yards, self.width_inches)
+
+class PatternThumbnail(db.Model):
+    """JPEG thumbnail of a pattern's stored image, served in batches to the gallery."""
+    pattern_id = db.Column(db.Integer, db.ForeignKey('pattern.id'), primary_key=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+    width = db.Column(db.Integer, nullable=False)
+    height = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+def sync_measurements(pattern):
+    """Re-parse a pattern's size, cut_size and yardage text into
+    size_ranges and yardages, leaving the rows alone if nothing changed."""
+    size_ranges = [
+        PatternSizeRange(field=field, system=system, min_value=low, max_value=high)
+        for field in ('size', 'cut_size')
+        for system, low, high in parse_sizes(getattr(pattern, field))
+    ]
+    if Counter(r.key() for r in size_ranges) != Counter(r.key() for r in pattern.size_ranges):
+        pattern.size_ranges = size_ranges
+    
+    yardages = [
+        PatternYardage(view=view, yards=yards, width_inches=width)
+        for view, yards, width in parse_yardage(pattern.yardage)
+    ]
+    if Counter(y.key() for y in yardages) != Counter(y.key() for y in pattern.yardages):
+        pattern.yardages = yardages
+
+class PatternFacetCount(db.Model):
+    """Number of patterns per owner and value of each filter facet.
+    
+    Kept current by database triggers on the pattern table (see migrations
+    0005 and 0008), so counts cost one small read instead of GROUP BY scans.
+    An empty value stands for patterns with the field not set, and user_id
+    0 for patterns without an owner.
+    """
+    user_id = db.Column(db.Integer, primary_key=True)
+    facet = db.Column(db.String(30), primary_key=True)
+    value = db.Column(db.String(100), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class Tombstone(db.Model):
+    """Record of a deleted pattern or PDF, served by the changes feed."""
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)  # 'pattern' or 'pdf'
+    entity_id = db.Column(db.Integer, nullable=False)
+    pattern_id = db.Column(db.Integer, nullable=True)  # Parent pattern of a deleted PDF
+    user_id = db.Column(db.Integer, nullable=True)  # Owner of the pattern
+    deleted_at = db.Column(db.DateTime, default=utc_now(), nullable=False)
+    
+    __table_args__ = (
+        # Per-user feed of deletions
+        db.Index('ix_tombstone_user_id_id', 'user_id', 'id'),
+    )
+    
+    def to_dict(self):
+        """Convert tombstone object to dictionary."""
+        return {
+            'type': self.entity,
+            'id': self.entity_id,
+            'pattern_id': self.pattern_id,
+            'deleted_at': self.deleted_at.isoformat() if self.deleted_at else None
+        }
+
+@db.event.listens_for(Session, 'before_flush')
+def track_changes(session, flush_context, instances):
+    """Keep the changes feed complete.
+    
+    Deleting a pattern or PDF leaves a tombstone, as does moving a pattern
+    to another collection (for the previous owner, whose clients must drop
+    it). Adding, changing or removing a PDF bumps its pattern's
+    updated_at, since PDFs are served as part of the pattern.
+    """
+    now = utc_now()
+    touched = set()
+    
+    with session.no_autoflush:
+        for obj in list(session.deleted):
+            if isinstance(obj, Pattern):
+                session.add(Tombstone(entity='pattern', entity_id=obj.id, pattern_id=obj.id,
+                                      user_id=obj.user_id, deleted_at=now))
+            elif isinstance(obj, PatternPDF):
+                owner = obj.pattern.user_id if obj.pattern is not None else None
+                session.add(Tombstone(entity='pdf', entity_id=obj.id, pattern_id=obj.pattern_id,
+                                      user_id=owner, deleted_at=now))
+                touched.add(obj.pattern_id)
+        
+        for obj in list(session.dirty):
+            if isinstance(obj, Pattern) and obj not in session.deleted:
+                for previous_owner in db.inspect(obj).attrs.user_id.history.deleted:
+                    if previous_owner is not None and previous_owner != obj.user_id:
+                        session.add(Tombstone(entity='pattern', entity_id=obj.id, pattern_id=obj.id,
+                                              user_id=previous_owner, deleted_at=now))
+        
+        for obj in list(session.new) + list(session.dirty):
+            if isinstance(obj, PatternPDF) and (obj in session.new or session.is_modified(obj)):
+                touched.add(obj.pattern_id)
+        
+        for pattern_id in touched:
+            pattern = session.get(Pattern, pattern_id) if pattern_id else None
+            if pattern is not None and pattern not in session.deleted:
+                pattern.updated_at = now
+
+# Pattern fields parsed into size_ranges and yardages
+MEASUREMENT_FIELDS = ('size', 'cut_size', 'yardage')
+
+@db.event.listens_for(Session, 'before_flush')
+def parse_measurements(session, flush_context, instances):
+    """Keep the parsed size and yardage rows in step with the text fields.
+    
+    Covers ORM writes; upsert_pattern() calls sync_measurements() itself.
+    """
+    with session.no_autoflush:
+        for obj in list(session.new) + list(session.dirty):
+            if not isinstance(obj, Pattern) or obj in session.deleted:
+                continue
+            state = db.inspect(obj)
+            if obj in session.new or any(state.attrs[f].history.has_changes() for f in MEASUREMENT_FIELDS):
+                sync_measurements(obj)
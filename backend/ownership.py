@@ -0,0 +1,118 @@
+"""
+Owner scoping of pattern queries.
+
+Patterns belong to the user who added or imported them (Pattern.user_id).
+Collection queries (list, search, counts, facets, stash matching, the
+changes feed) only see the requesting user's patterns, off indexes that
+lead on user_id. Admins can widen them with ?owner=all or look at another
+user's collection with ?owner=<user id>, and can open any pattern by id.
+
+Patterns without an owner, added before ownership was recorded, are only
+visible to admins until `flask assign-patterns` gives them one.
+
+Images and PDFs are opened with an access token or with the signed URL
+handed out in the pattern's dict (@signed_url_or_token).
+"""
+from functools import wraps
+from flask import request, jsonify, g
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from models import db, User, Pattern
+from signed_urls import verify_url
+
+# ?owner= value that lifts the scope (admins only)
+ALL_OWNERS = 'all'
+
+class OwnerScopeError(Exception):
+    """Raised for an ?owner= the requesting user may not use."""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+def requesting_user():
+    """The authenticated user, loaded once per request."""
+    if 'requesting_user' not in g:
+        g.requesting_user = db.session.get(User, int(get_jwt_identity()))
+    return g.requesting_user
+
+def is_admin():
+    """Whether the authenticated user is an admin."""
+    user = requesting_user()
+    return bool(user and user.is_admin)
+
+def resolve_owner(value):
+    """
+    Owner whose patterns a collection request covers.
+
+    Args:
+        value (str): The ?owner= argument, or None
+
+    Returns:
+        int or str: A user id, or ALL_OWNERS
+
+    Raises:
+        OwnerScopeError: If a non-admin asks for another collection, or
+            value is not 'all' or a user id
+    """
+    user = requesting_user()
+    if user is None:
+        raise OwnerScopeError("User not found", 404)
+    if value is None or value == '' or value == str(user.id):
+        return user.id
+    if not user.is_admin:
+        raise OwnerScopeError("Only admins can view other users' patterns", 403)
+    if value == ALL_OWNERS:
+        return ALL_OWNERS
+    try:
+        return int(value)
+    except ValueError:
+        raise OwnerScopeError("owner must be 'all' or a user id", 400)
+
+def owner_scoped(view):
+    """Resolve ?owner= for a collection endpoint before running it (see pattern_owner())."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            g.pattern_owner = resolve_owner(request.args.get('owner'))
+        except OwnerScopeError as e:
+            return jsonify({"error": str(e)}), e.status_code
+        return view(*args, **kwargs)
+    return wrapper
+
+def pattern_owner():
+    """Owner resolved by @owner_scoped for this request."""
+    return g.pattern_owner
+
+def scope_to_owner(query, column=Pattern.user_id, owner=None):
+    """Limit a collection query to the owner of this request (see @owner_scoped)."""
+    owner = pattern_owner() if owner is None else owner
+    if owner == ALL_OWNERS:
+        return query
+    return query.filter(column == owner)
+
+def accessible_patterns(query, column=Pattern.user_id):
+    """Limit a query by pattern id to patterns the requesting user may open."""
+    user = requesting_user()
+    if user is None:
+        return query.filter(db.false())
+    if user.is_admin:
+        return query
+    return query.filter(column == user.id)
+
+def get_accessible_pattern(pattern_id):
+    """The pattern if it exists and the requesting user may open it, else None."""
+    return accessible_patterns(Pattern.query.filter(Pattern.id == pattern_id)).first()
+
+def signed_url_or_token(view):
+    """Let a view be opened with a signed URL (signed_urls.py) or an access token.
+
+    g.signed_url tells the view the URL was signed, i.e. the owner check
+    was made when it was handed out; otherwise the view must make it.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.signed_url = verify_url(request.path, request.args.get('expires'), request.args.get('signature'))
+        if not g.signed_url:
+            verify_jwt_in_request()
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,151 @@
+"""
+Idempotent writes of patterns keyed on (brand, pattern_number) within the
+owner's collection (user_id; see ownership.py).
+
+Creating a pattern that already exists, or re-running a scrape or import,
+updates the existing row with a single INSERT ... ON CONFLICT DO UPDATE
+instead of adding a duplicate. The conflict target is the partial unique
+index for owned patterns, or the one for patterns without an owner.
+
+Merge policy:
+- SOURCE_USER (create_pattern): every field the user supplied replaces the
+  stored value; fields left empty keep what is stored.
+- SOURCE_SCRAPE (scraper-driven imports): scraped values only fill fields
+  that are empty or still hold a scraper placeholder, so re-scraping never
+  overwrites anything a user has edited.
+
+Rows are only touched when a value actually changes, so repeated imports
+leave updated_at alone.
+"""
+from sqlalchemy import case, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, Pattern, sync_measurements, database_now
+from scraper import PLACEHOLDER_IMAGE_URL, PLACEHOLDER_VALUES
+from thumbnails import refresh_thumbnail
+
+SOURCE_USER = 'user'
+SOURCE_SCRAPE = 'scrape'
+
+# Columns that make up a pattern's identity within a collection
+CONFLICT_COLUMNS = ('brand', 'pattern_number')
+OWNER_COLUMN = 'user_id'
+
+# Columns never set from user or scraped data
+SERVER_COLUMNS = ('id', 'created_at', 'updated_at')
+
+INSERT_FACTORIES = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+def is_unset(value, source=SOURCE_SCRAPE):
+    """True for values that don't count as data.
+
+    That is None and blank strings, plus the scraper's placeholders when
+    the value comes from a scrape.
+    """
+    if value is None:
+        return True
+    if isinstance(value, str):
+        if value.strip() == '':
+            return True
+        return source == SOURCE_SCRAPE and (value in PLACEHOLDER_VALUES or value == PLACEHOLDER_IMAGE_URL)
+    return False
+
+def _stored_is_unset(column):
+    """SQL version of is_unset() for a stored column value."""
+    if isinstance(column.type, db.String):
+        return or_(
+            column.is_(None),
+            column == '',
+            column.in_(sorted(PLACEHOLDER_VALUES | {PLACEHOLDER_IMAGE_URL}))
+        )
+    return column.is_(None)
+
+def conflict_target(table, owner):
+    """Index columns and predicate of the unique index covering owner's patterns."""
+    if owner is None:
+        return list(CONFLICT_COLUMNS), table.c[OWNER_COLUMN].is_(None)
+    return [OWNER_COLUMN, *CONFLICT_COLUMNS], table.c[OWNER_COLUMN].isnot(None)
+
+def upsert_pattern(data, source=SOURCE_USER, session=None):
+    """
+    Insert a pattern or merge data into the existing one with the same
+    owner, brand and pattern number.
+
+    Args:
+        data (dict): Pattern column values; brand and pattern_number are
+            required, user_id (the owner) is None for no owner
+        source (str): SOURCE_USER or SOURCE_SCRAPE, selects the merge policy
+        session: SQLAlchemy session to use (defaults to db.session); the
+            caller commits
+
+    Returns:
+        tuple: (Pattern, created) where created is True for a new row
+    """
+    session = session or db.session
+    table = Pattern.__table__
+    values = {
+        key: value for key, value in data.items()
+        if key in table.c and key not in SERVER_COLUMNS and not is_unset(value, source)
+    }
+    for key in CONFLICT_COLUMNS:
+        if not values.get(key):
+            raise ValueError(f"'{key}' is required")
+
+    now = database_now(session)
+    dialect = session.get_bind().dialect.name
+    if dialect not in INSERT_FACTORIES:
+        raise RuntimeError(f"Upsert is not supported on '{dialect}'")
+    insert = INSERT_FACTORIES[dialect](table).values(created_at=now, updated_at=now, **values)
+
+    owner = values.get(OWNER_COLUMN)
+    index_elements, index_where = conflict_target(table, owner)
+
+    updates = {}
+    for key in values:
+        if key in index_elements:
+            continue
+        column = table.c[key]
+        if source == SOURCE_SCRAPE:
+            updates[key] = case((_stored_is_unset(column), insert.excluded[key]), else_=column)
+        else:
+            updates[key] = insert.excluded[key]
+
+    if updates:
+        changed = or_(*(table.c[key].is_distinct_from(value) for key, value in updates.items()))
+        statement = insert.on_conflict_do_update(
+            index_elements=index_elements,
+            index_where=index_where,
+            set_=dict(updates, updated_at=now),
+            where=changed
+        )
+    else:
+        statement = insert.on_conflict_do_nothing(index_elements=index_elements, index_where=index_where)
+
+    returning = [table.c.id, table.c.created_at]
+    if 'image_data' in values:
+        # A scrape merge may keep the stored image instead
+        returning.append(table.c.image_data.is_not_distinct_from(values['image_data']).label('image_stored'))
+    row = session.execute(statement.returning(*returning)).first()
+
+    if row is None:
+        # Nothing changed: the existing row was left as it is
+        pattern_id = session.execute(
+            select(table.c.id).where(
+                index_where if owner is None else table.c[OWNER_COLUMN] == owner,
+                table.c.brand == values['brand'],
+                table.c.pattern_number == values['pattern_number']
+            )
+        ).scalar_one()
+        created = False
+    else:
+        pattern_id, created_at = row[:2]
+        created = created_at == now
+
+    pattern = session.get(Pattern, pattern_id, populate_existing=True)
+    # The Core statement above bypasses the ORM flush hooks
+    sync_measurements(pattern)
+    if row is not None and 'image_data' in values and row.image_stored:
+        refresh_thumbnail(pattern)
+    return pattern, created
@@ -0,0 +1,73 @@
+"""
+Ingest step for uploaded PDFs.
+
+Uploads are linearized ("fast web view", so a viewer fetching the file
+with Range requests can show the first page before the rest arrives) and,
+optionally, have their streams losslessly recompressed and packed into
+object streams. The optimized file is kept only if it is not noticeably
+larger than the upload. Files pikepdf can't open or save are stored as
+uploaded.
+
+pikepdf is optional; without it PDFs are stored byte-for-byte.
+"""
+import hashlib
+import io
+import logging
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Linearization adds hint tables; accept this much growth to get it
+MAX_GROWTH = 0.02
+
+IngestedPDF = namedtuple('IngestedPDF', ['data', 'upload_sha256', 'original_size', 'stored_size'])
+
+def upload_hash(data):
+    """Hex SHA-256 of the bytes as uploaded, used to spot duplicate uploads."""
+    return hashlib.sha256(data).hexdigest()
+
+def optimize_pdf(data, recompress=True):
+    """
+    Linearize a PDF and optionally recompress its streams.
+
+    Args:
+        data (bytes): PDF file as uploaded
+        recompress (bool): Re-deflate Flate streams at the best level and
+            pack objects into object streams
+
+    Returns:
+        bytes: The optimized PDF, or data itself if pikepdf is missing,
+            can't read the file, or the result is larger than allowed
+    """
+    try:
+        import pikepdf
+    except ImportError:
+        logger.info("pikepdf is not installed, storing PDF as uploaded")
+        return data
+
+    try:
+        with pikepdf.open(io.BytesIO(data)) as pdf:
+            pdf.remove_unreferenced_resources()
+            out = io.BytesIO()
+            pdf.save(
+                out,
+                linearize=True,
+                compress_streams=True,
+                recompress_flate=recompress,
+                object_stream_mode=(pikepdf.ObjectStreamMode.generate if recompress
+                                    else pikepdf.ObjectStreamMode.preserve),
+            )
+    except Exception as e:
+        # Not only PdfError: qpdf can fail in other ways on malformed files
+        logger.warning("Could not optimize PDF, storing it as uploaded: %s", e)
+        return data
+
+    optimized = out.getvalue()
+    if len(optimized) > len(data) * (1 + MAX_GROWTH):
+        return data
+    return optimized
+
+def ingest_pdf(data, optimize=True, recompress=True):
+    """Hash and optimize an uploaded PDF; returns an IngestedPDF."""
+    stored = optimize_pdf(data, recompress) if optimize else data
+    return IngestedPDF(stored, upload_hash(data), len(data), len(stored))
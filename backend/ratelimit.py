@@ -0,0 +1,286 @@
+"""
+Per-client rate limits and load shedding for the expensive endpoints.
+
+Each endpoint class (auth, list, blob, image, scrape) has a token bucket
+per client, keyed by user id when the request carries a valid token and by
+IP address otherwise. Pattern images get their own, larger class: the
+gallery loads one per card. On top of that:
+
+- blob streaming is capped at BLOB_MAX_CONCURRENT responses at a time;
+- when the server is overloaded, new list, blob, image and scrape requests are
+  turned away with 503 instead of queueing, so light requests keep being
+  served. Overload is either of:
+  - more than SHED_MAX_BACKLOG connections waiting to be accepted on the
+    listening socket (SHED_LISTEN_PORT), read from /proc/net/tcp on
+    Linux. All workers share that queue, so this works with any server,
+    including sync gunicorn workers that each handle one request at a
+    time.
+  - more than SHED_MAX_IN_FLIGHT requests in progress in this process.
+    This only means something for threaded or async workers (the Flask
+    server run by app.py, gunicorn --threads, asgi.py); a sync worker
+    never has more than one.
+
+Rejections are immediate: 429 (over the client's limit) or 503 (server
+busy), both with Retry-After. Token buckets and counters are kept in
+process, so limits apply per worker.
+
+    @api_bp.route('/api/pdfs/<int:pdf_id>')
+    @rate_limit('blob')
+    def get_pdf(pdf_id): ...
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from functools import wraps
+from flask import current_app, request, jsonify, g
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+
+logger = logging.getLogger(__name__)
+
+ENDPOINT_CLASSES = ('auth', 'list', 'blob', 'image', 'scrape')
+
+# Endpoint classes turned away first when the server is overloaded
+SHEDDABLE_CLASSES = ('list', 'blob', 'image', 'scrape')
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600}
+
+Rejection = namedtuple('Rejection', ['status', 'error', 'retry_after'])
+
+def parse_limit(value):
+    """Parse a limit like '60/minute' into (tokens per second, burst)."""
+    count, _, period = value.partition('/')
+    if period not in PERIODS:
+        raise ValueError(f"Invalid rate limit '{value}', expected e.g. '60/minute'")
+    return int(count) / PERIODS[period], int(count)
+
+class TokenBucket:
+    """Bucket holding up to burst tokens, refilled at rate tokens per second."""
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, burst, now):
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, rate, burst, now):
+        """Take a token; returns 0 if one was available, else seconds until one is."""
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / rate
+
+class RateLimiter:
+    """Token buckets per client key for one endpoint class."""
+
+    def __init__(self, rate, burst, max_clients):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        """Returns 0 if the request may go ahead, else seconds to wait."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.burst, now)
+                if len(self._buckets) > self.max_clients:
+                    # Forget the least recently seen client
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket.take(self.rate, self.burst, now)
+
+class Counter:
+    """Thread-safe count of things in progress, with an optional cap."""
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Count one more unless the cap is reached; returns whether it was counted."""
+        with self._lock:
+            if self.limit is not None and self.value >= self.limit:
+                return False
+            self.value += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.value -= 1
+
+# Kernel socket tables; for listening sockets rx_queue is the accept queue length
+PROC_NET_TCP = ('/proc/net/tcp', '/proc/net/tcp6')
+TCP_LISTEN = '0A'
+
+# How long a reading of the accept queue is reused
+BACKLOG_CHECK_SECONDS = 0.05
+
+def read_listen_backlog(port, paths=PROC_NET_TCP):
+    """
+    Connections waiting to be accepted on the sockets listening on port.
+
+    Returns:
+        int: The queue length summed over IPv4 and IPv6, or None if the
+            socket tables can't be read (not Linux)
+    """
+    backlog, readable = 0, False
+    for path in paths:
+        try:
+            with open(path) as table:
+                lines = table.readlines()[1:]
+        except OSError:
+            continue
+        readable = True
+        for line in lines:
+            fields = line.split()
+            if len(fields) < 5 or fields[3] != TCP_LISTEN:
+                continue
+            if int(fields[1].rsplit(':', 1)[1], 16) == port:
+                backlog += int(fields[4].split(':')[1], 16)
+    return backlog if readable else None
+
+class ListenBacklog:
+    """Cached length of the listening socket's accept queue."""
+
+    def __init__(self, port):
+        self.port = port
+        self.enabled = bool(port)
+        self._value = 0
+        self._read_at = float('-inf')
+        self._lock = threading.Lock()
+
+    @property
+    def value(self):
+        if not self.enabled:
+            return 0
+        now = time.monotonic()
+        if now - self._read_at >= BACKLOG_CHECK_SECONDS and self._lock.acquire(blocking=False):
+            try:
+                value = read_listen_backlog(self.port)
+                if value is None:
+                    logger.warning("Cannot read %s, not shedding on the listen backlog",
+                                   ' or '.join(PROC_NET_TCP))
+                    self.enabled = False
+                    value = 0
+                self._value, self._read_at = value, now
+            finally:
+                self._lock.release()
+        return self._value
+
+class RateLimits:
+    """All limiter state for one app, shared by the Flask and ASGI routes."""
+
+    def __init__(self, config):
+        self.enabled = config['RATE_LIMITS_ENABLED']
+        self.limiters = {
+            endpoint_class: RateLimiter(*parse_limit(config['RATE_LIMITS'][endpoint_class]),
+                                        max_clients=config['RATE_LIMIT_MAX_CLIENTS'])
+            for endpoint_class in ENDPOINT_CLASSES
+        }
+        self.blob_streams = Counter(config['BLOB_MAX_CONCURRENT'])
+        self.in_flight = Counter()
+        self.shed_threshold = config['SHED_MAX_IN_FLIGHT']
+        self.backlog = ListenBacklog(config['SHED_LISTEN_PORT'])
+        self.backlog_threshold = config['SHED_MAX_BACKLOG']
+        self.shed_retry_after = config['SHED_RETRY_AFTER']
+
+    def admit(self, endpoint_class, client):
+        """Check a request against its limits; returns a Rejection or None."""
+        if not self.enabled:
+            return None
+        if endpoint_class in SHEDDABLE_CLASSES and self.overloaded():
+            return Rejection(503, "Server busy, try again shortly", self.shed_retry_after)
+        wait = self.limiters[endpoint_class].take(client)
+        if wait:
+            return Rejection(429, "Too many requests", math.ceil(wait))
+        return None
+
+    def overloaded(self):
+        """Whether requests are queueing up, in this process or on the socket."""
+        return (self.in_flight.value > self.shed_threshold
+                or self.backlog.value > self.backlog_threshold)
+
+    def acquire_blob_stream(self):
+        """Reserve a blob streaming slot; returns a Rejection if none are free."""
+        if not self.enabled or self.blob_streams.acquire():
+            return None
+        return Rejection(503, "Too many downloads in progress, try again shortly", self.shed_retry_after)
+
+    def release_blob_stream(self):
+        if self.enabled:
+            self.blob_streams.release()
+
+def client_key(identity, address):
+    """Bucket key: the user if known, else the remote address."""
+    return f"user:{identity}" if identity is not None else f"ip:{address}"
+
+def current_client():
+    """Bucket key for the current Flask request."""
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        identity = None
+    return client_key(identity, request.remote_addr)
+
+def rejection_response(rejection):
+    response = jsonify({"error": rejection.error, "retry_after": rejection.retry_after})
+    response.status_code = rejection.status
+    response.headers['Retry-After'] = str(rejection.retry_after)
+    return response
+
+def rate_limit(endpoint_class):
+    """Apply the limits of endpoint_class to a view.
+
+    Blob views also take a streaming slot, held until the response has
+    been sent in full.
+    """
+    if endpoint_class not in ENDPOINT_CLASSES:
+        raise ValueError(f"Unknown endpoint class '{endpoint_class}'")
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            limits = current_app.extensions['rate_limits']
+            rejection = limits.admit(endpoint_class, current_client())
+            if rejection:
+                return rejection_response(rejection)
+            if endpoint_class != 'blob':
+                return view(*args, **kwargs)
+
+            rejection = limits.acquire_blob_stream()
+            if rejection:
+                return rejection_response(rejection)
+            try:
+                response = current_app.make_response(view(*args, **kwargs))
+            except Exception:
+                limits.release_blob_stream()
+                raise
+            response.call_on_close(limits.release_blob_stream)
+            return response
+        return wrapper
+    return decorator
+
+def init_rate_limits(app):
+    """Set up the limiter state and in-flight request tracking for app."""
+    limits = app.extensions['rate_limits'] = RateLimits(app.config)
+
+    @app.before_request
+    def count_request():
+        limits.in_flight.acquire()
+        g.counted_in_flight = True
+
+    @app.teardown_request
+    def uncount_request(exc):
+        if g.pop('counted_in_flight', False):
+            limits.in_flight.release()
+
+    return limits
@@ -0,0 +1,190 @@
+"""
+Read-replica routing.
+
+When DATABASE_REPLICA_URLS is set, each replica becomes a Flask-SQLAlchemy
+bind ('replica_0', 'replica_1', ...) and queries made while serving a GET
+or HEAD request go to a healthy replica; everything else, including
+flushes and DML in any request, goes to the primary.
+
+- Read-your-writes: after a successful write request the client (user, or
+  IP when anonymous) reads from the primary for REPLICA_STICKY_SECONDS.
+  This is remembered in process and in a cookie, so same-origin clients
+  stay sticky across workers.
+- Lag and health: each replica's replay lag is checked at most every
+  REPLICA_CHECK_SECONDS; replicas lagging more than REPLICA_MAX_LAG_SECONDS,
+  unreachable, or that just raised a connection error are skipped until
+  the next check. With no usable replica, reads go to the primary.
+
+Views decorated with @read_from_primary never read from a replica (the
+changes feed, whose cursor must not move past rows a lagging replica
+hasn't received yet).
+
+Non-Postgres replicas (e.g. the primary's SQLite file as a local
+stand-in) are treated as never lagging.
+"""
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request, g, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, exc, text
+from ratelimit import current_client
+
+logger = logging.getLogger(__name__)
+
+# Bind keys of replicas in SQLALCHEMY_BINDS (see Config)
+REPLICA_BIND_PREFIX = 'replica_'
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+STICKY_COOKIE = 'read_primary_until'
+
+# Most clients remembered as sticky per process
+MAX_STICKY_CLIENTS = 10000
+
+REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+class Replicas:
+    """Health, lag and stickiness state for an app's replicas."""
+
+    def __init__(self, engines, config):
+        self.engines = engines
+        self.max_lag = config['REPLICA_MAX_LAG_SECONDS']
+        self.check_interval = config['REPLICA_CHECK_SECONDS']
+        self.sticky_seconds = config['REPLICA_STICKY_SECONDS']
+        # bind key -> (checked at, usable)
+        self._status = {key: (0, False) for key in engines}
+        self._checking = {key: threading.Lock() for key in engines}
+        self._sticky = OrderedDict()
+        self._sticky_lock = threading.Lock()
+
+        for key, engine in engines.items():
+            event.listen(engine, 'handle_error', self._on_error(key))
+
+    def _on_error(self, key):
+        def handle_error(context):
+            if context.is_disconnect or isinstance(context.original_exception, exc.OperationalError):
+                logger.warning("Replica %s failed, reading from the primary until it recovers: %s",
+                               key, context.original_exception)
+                self._status[key] = (time.monotonic(), False)
+        return handle_error
+
+    def lag(self, key):
+        """Seconds the replica is behind the primary."""
+        engine = self.engines[key]
+        if engine.dialect.name != 'postgresql':
+            return 0
+        with engine.connect() as conn:
+            return float(conn.execute(REPLICA_LAG_SQL).scalar())
+
+    def usable(self, key):
+        """Whether the replica passed its last check, re-checking it when due."""
+        checked_at, usable = self._status[key]
+        if time.monotonic() - checked_at < self.check_interval:
+            return usable
+        # One thread re-checks; the others go with the previous result
+        if not self._checking[key].acquire(blocking=False):
+            return usable
+        try:
+            lag = self.lag(key)
+            usable = lag <= self.max_lag
+            if not usable:
+                logger.warning("Replica %s is %.1fs behind, reading from the primary", key, lag)
+        except exc.SQLAlchemyError as e:
+            logger.warning("Replica %s is unavailable: %s", key, e)
+            usable = False
+        finally:
+            self._status[key] = (time.monotonic(), usable)
+            self._checking[key].release()
+        return usable
+
+    def choose(self):
+        """Bind key of a usable replica, or None for the primary."""
+        usable = [key for key in self.engines if self.usable(key)]
+        return random.choice(usable) if usable else None
+
+    def stick(self, client):
+        """Send client's reads to the primary for the next sticky_seconds."""
+        until = time.time() + self.sticky_seconds
+        with self._sticky_lock:
+            self._sticky[client] = until
+            self._sticky.move_to_end(client)
+            while len(self._sticky) > MAX_STICKY_CLIENTS:
+                self._sticky.popitem(last=False)
+        return until
+
+    def is_sticky(self, client):
+        return self._sticky.get(client, 0) > time.time()
+
+def _cookie_is_sticky():
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+def replica_for_request():
+    """Bind key to read from for the current request (None for the primary).
+
+    Decided once per request, so all its reads see the same database.
+    """
+    if not has_request_context() or request.method not in READ_METHODS:
+        return None
+    replicas = current_app.extensions.get('replicas')
+    if replicas is None:
+        return None
+    if 'replica_bind_key' not in g:
+        if _cookie_is_sticky() or replicas.is_sticky(current_client()):
+            g.replica_bind_key = None
+        else:
+            g.replica_bind_key = replicas.choose()
+    return g.replica_bind_key
+
+def read_from_primary(view):
+    """Send all reads of a view to the primary (see replica_for_request())."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.replica_bind_key = None
+        return view(*args, **kwargs)
+    return wrapper
+
+def read_engine(db):
+    """Engine for raw reads (e.g. blob streaming) in the current request."""
+    return db.engines[replica_for_request()]
+
+class RoutingSession(Session):
+    """Session sending the reads of read-only requests to a replica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not getattr(clause, 'is_dml', False):
+            key = replica_for_request()
+            if key is not None:
+                return self._db.engines[key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def init_replicas(app, db):
+    """Set up replica routing for app if it has replica binds."""
+    with app.app_context():
+        engines = {
+            key: db.engines[key] for key in app.config.get('SQLALCHEMY_BINDS') or {}
+            if key.startswith(REPLICA_BIND_PREFIX)
+        }
+    if not engines:
+        return None
+    replicas = app.extensions['replicas'] = Replicas(engines, app.config)
+
+    @app.after_request
+    def stick_to_primary_after_write(response):
+        if request.method not in READ_METHODS and response.status_code < 400:
+            until = replicas.stick(current_client())
+            response.set_cookie(STICKY_COOKIE, str(int(until) + 1), max_age=int(replicas.sticky_seconds),
+                                httponly=True, samesite='Lax')
+        return response
+
+    return replicas
@@ -1,17 +1,21 @@
-import requests
-from bs4 import BeautifulSoup
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# requests, httpx and bs4 are imported inside the functions below so that
+# only the processes that actually scrape pay for loading them.
+
 logger = logging.getLogger(__name__)
 
+# Scraped images larger than this are skipped rather than held in memory
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+IMAGE_CHUNK_SIZE = 64 * 1024
+
 # Define valid fields for pattern data
 VALID_FIELDS = {
     "brand", 
     "pattern_number", 
     "title", 
     "description", 
+    "image", 
     "image_data", 
     "format", 
     "size", 
@@ -37,111 +41,248 @@ def download_image_data(image_url):
     Returns:
         bytes: Binary image data or None if download fails
     """
+    import requests
+
     try:
-        response = requests.get(image_url, stream=True, timeout=10)
-        response.raise_for_status()
-        return response.content
+        with requests.get(image_url, stream=True, timeout=10) as response:
+            response.raise_for_status()
+            chunks, size = [], 0
+            for chunk in response.iter_content(IMAGE_CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_IMAGE_BYTES:
+                    logger.warning("Image %s is larger than %s bytes, skipping it", image_url, MAX_IMAGE_BYTES)
+                    return None
+                chunks.append(chunk)
+            return b''.join(chunks)
     except requests.RequestException as e:
-        logger.error(f"Error downloading image {image_url}: {e}")
+        logger.error("Error downloading image %s: %s", image_url, e)
         return None
 
-def scrape_pattern(brand, pattern_number):
-    # Brand mappings for URL construction
-    brand_mappings = {
-        "Butterick": ("butterick", "b"),
-        "Vogue": ("vogue-patterns", "v"),
-        "Simplicity": ("simplicity", "s"),
-        "McCall's": ("mccalls", "m"),
-        "Know Me": ("know-me", "me"),
-        "New Look": ("new-look", "n"),
-        "Burda": ("burda-style", "bur"),
+# Brand mappings for URL construction
+BRAND_MAPPINGS = {
+    "Butterick": ("butterick", "b"),
+    "Vogue": ("vogue-patterns", "v"),
+    "Simplicity": ("simplicity", "s"),
+    "McCall's": ("mccalls", "m"),
+    "Know Me": ("know-me", "me"),
+    "New Look": ("new-look", "n"),
+    "Burda": ("burda-style", "bur"),
+}
+
+# Set headers to mimic browser
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/110.0.0.0 Safari/537.36",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+PLACEHOLDER_IMAGE_URL = "https://via.placeholder.com/150"
+
+# Default values filled in for details the product page doesn't provide
+PLACEHOLDER_VALUES = {"Unknown", "Not specified", "No description available"}
+
+def build_pattern_urls(brand, pattern_number):
+    """
+    Build the product page URL and its "pd" (PDF pattern) alternative.
+    
+    Returns:
+        tuple: (url, pd_url), or None if the brand is not supported
+    """
+    if brand not in BRAND_MAPPINGS:
+        return None
+    url_path, prefix = BRAND_MAPPINGS[brand]
+    return (
+        f"https://www.simplicity.com/{url_path}/{prefix}{pattern_number}/",
+        f"https://www.simplicity.com/{url_path}/pd{prefix}{pattern_number}/"
+    )
+
+def parse_pattern_page(html, brand, pattern_number, page_url):
+    """
+    Extract pattern data from a product page.
+    
+    Args:
+        html (str): Page body
+        brand (str): Pattern brand
+        pattern_number (str): Pattern number
+        page_url (str): Final URL of the page (after redirects)
+        
+    Returns:
+        tuple: (pattern data without image_data, image URL)
+    """
+    from bs4 import BeautifulSoup
+
+    # Parse response
+    soup = BeautifulSoup(html, "html.parser")
+    
+    # Extract title
+    title_tag = soup.find("meta", property="og:title")
+    title = title_tag["content"] if title_tag else f"{brand} {pattern_number}"
+    logger.debug("Title: %s", title)
+    
+    # Extract description
+    desc_tag = soup.find("meta", attrs={"name": "description"})
+    description = desc_tag["content"] if desc_tag else "No description available"
+    logger.debug("Description: %s characters", len(description))
+    
+    # Extract image URL
+    image_tag = soup.find("meta", property="og:image")
+    image_url = image_tag["content"] if image_tag else PLACEHOLDER_IMAGE_URL
+    logger.debug("Image URL: %s", image_url)
+    
+    # Create pattern data dictionary with default values
+    pattern_data = {
+        "brand": brand,
+        "pattern_number": pattern_number,
+        "title": title,
+        "description": description,
+        "image": image_url,
+        "format": "PDF" if "pd" in page_url else "Paper",
+        "size": "Unknown",
+        "difficulty": "Unknown",
+        "material_recommendations": "Not specified",
+        "yardage": "Not specified",
+        "notions": "Not specified",
+        "cut_status": "Uncut",
+        "cut_size": "Not specified",
+        "inventory_qty": 1,
+        "cosplay_hackable": False,
+        "cosplay_notes": "",
+        "notes": "",
     }
+    return pattern_data, image_url
+
+def scrape_pattern(brand, pattern_number, include_image=True):
+    """
+    Scrape pattern details from the vendor site.
     
+    Args:
+        brand (str): Pattern brand, one of BRAND_MAPPINGS
+        pattern_number (str): Pattern number
+        include_image (bool): Also download the image into image_data
+        
+    Returns:
+        dict: Pattern fields, or {"error": message}
+    """
+    import requests
+
     # Validate brand
-    if brand not in brand_mappings:
-        logger.warning(f"Brand '{brand}' is not supported")
+    urls = build_pattern_urls(brand, pattern_number)
+    if urls is None:
+        logger.warning("Brand '%s' is not supported", brand)
         return {"error": f"Brand '{brand}' is not supported"}
     
     # Construct URL
-    url_path, prefix = brand_mappings[brand]
-    url = f"https://www.simplicity.com/{url_path}/{prefix}{pattern_number}/"
-    logger.info(f"Requesting URL: {url}")
-    
-    # Set headers to mimic browser
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/110.0.0.0 Safari/537.36",
-        "Accept-Language": "en-US,en;q=0.9",
-    }
+    url, pd_url = urls
+    logger.info("Requesting URL: %s", url)
     
     try:
         # Make request
-        response = requests.get(url, headers=headers, timeout=10)
-        logger.info(f"HTTP Status Code: {response.status_code}")
+        response = requests.get(url, headers=HEADERS, timeout=10)
+        logger.info("HTTP Status Code: %s", response.status_code)
         
         # Handle 404 with retry
         if response.status_code == 404:
             # Retry with alternative "pd" prefix
-            pd_url = f"https://www.simplicity.com/{url_path}/pd{prefix}{pattern_number}/"
-            logger.info(f"Retrying with alternative URL: {pd_url}")
-            response = requests.get(pd_url, headers=headers, timeout=10)
-            logger.info(f"HTTP Status Code (Retry): {response.status_code}")
+            logger.info("Retrying with alternative URL: %s", pd_url)
+            response = requests.get(pd_url, headers=HEADERS, timeout=10)
+            logger.info("HTTP Status Code (Retry): %s", response.status_code)
             
             if response.status_code != 200:
                 return {"error": f"Failed to retrieve data from {url} and {pd_url}"}
         elif response.status_code != 200:
             return {"error": f"Failed to retrieve data from {url}"}
         
-        # Parse response
-        soup = BeautifulSoup(response.text, "html.parser")
-        
-        # Extract title
-        title_tag = soup.find("meta", property="og:title")
-        title = title_tag["content"] if title_tag else f"{brand} {pattern_number}"
-        logger.info(f"Title: {title}")
-        
-        # Extract description
-        desc_tag = soup.find("meta", attrs={"name": "description"})
-        description = desc_tag["content"] if desc_tag else "No description available"
-        logger.info(f"Description: {description}")
-        
-        # Extract image URL
-        image_tag = soup.find("meta", property="og:image")
-        image_url = image_tag["content"] if image_tag else "https://via.placeholder.com/150"
-        logger.info(f"Image URL: {image_url}")
+        pattern_data, image_url = parse_pattern_page(response.text, brand, pattern_number, response.url)
         
         # Download the image binary data
-        image_data = download_image_data(image_url)
-        if image_data is None:
-            logger.warning("Using placeholder image data because download failed")
-            image_data = download_image_data("https://via.placeholder.com/150")
-        
-        # Create pattern data dictionary with default values
-        pattern_data = {
-            "brand": brand,
-            "pattern_number": pattern_number,
-            "title": title,
-            "description": description,
-            "image_data": image_data,
-            "format": "PDF" if "pd" in response.url else "Paper",
-            "size": "Unknown",
-            "difficulty": "Unknown",
-            "material_recommendations": "Not specified",
-            "yardage": "Not specified",
-            "notions": "Not specified",
-            "cut_status": "Uncut",
-            "cut_size": "Not specified",
-            "inventory_qty": 1,
-            "cosplay_hackable": False,
-            "cosplay_notes": "",
-            "notes": "",
-        }
+        if include_image:
+            image_data = download_image_data(image_url)
+            if image_data is None:
+                logger.warning("Using placeholder image data because download failed")
+                image_data = download_image_data(PLACEHOLDER_IMAGE_URL)
+            pattern_data["image_data"] = image_data
         
         # Filter out invalid fields before returning
         return {k: v for k, v in pattern_data.items() if k in VALID_FIELDS}
         
     except requests.RequestException as e:
-        logger.error(f"Network error: {str(e)}")
+        logger.error("Network error: %s", e)
+        return {"error": f"Network error: {str(e)}"}
+    except Exception as e:
+        logger.error("Scraper error: %s", e)
+        return {"error": f"Scraper error: {str(e)}"}
+
+async def download_image_data_async(client, image_url):
+    """
+    Async variant of download_image_data using a shared httpx client.
+    
+    Returns:
+        bytes: Binary image data or None if download fails
+    """
+    import httpx
+
+    try:
+        async with client.stream('GET', image_url, timeout=10) as response:
+            response.raise_for_status()
+            chunks, size = [], 0
+            async for chunk in response.aiter_bytes(IMAGE_CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_IMAGE_BYTES:
+                    logger.warning("Image %s is larger than %s bytes, skipping it", image_url, MAX_IMAGE_BYTES)
+                    return None
+                chunks.append(chunk)
+            return b''.join(chunks)
+    except httpx.HTTPError as e:
+        logger.error("Error downloading image %s: %s", image_url, e)
+        return None
+
+async def scrape_pattern_async(brand, pattern_number, include_image=True):
+    """
+    Async variant of scrape_pattern for the ASGI server (see asgi.py).
+    
+    Same result shape as scrape_pattern, but the page and image fetches
+    wait on the event loop instead of holding a worker thread.
+    """
+    import httpx
+
+    # Validate brand
+    urls = build_pattern_urls(brand, pattern_number)
+    if urls is None:
+        logger.warning("Brand '%s' is not supported", brand)
+        return {"error": f"Brand '{brand}' is not supported"}
+    
+    url, pd_url = urls
+    logger.info("Requesting URL: %s", url)
+    
+    try:
+        async with httpx.AsyncClient(headers=HEADERS, follow_redirects=True) as client:
+            response = await client.get(url, timeout=10)
+            logger.info("HTTP Status Code: %s", response.status_code)
+            
+            # Handle 404 with retry
+            if response.status_code == 404:
+                logger.info("Retrying with alternative URL: %s", pd_url)
+                response = await client.get(pd_url, timeout=10)
+                logger.info("HTTP Status Code (Retry): %s", response.status_code)
+                
+                if response.status_code != 200:
+                    return {"error": f"Failed to retrieve data from {url} and {pd_url}"}
+            elif response.status_code != 200:
+                return {"error": f"Failed to retrieve data from {url}"}
+            
+            pattern_data, image_url = parse_pattern_page(response.text, brand, pattern_number, str(response.url))
+            
+            if include_image:
+                image_data = await download_image_data_async(client, image_url)
+                if image_data is None:
+                    logger.warning("Using placeholder image data because download failed")
+                    image_data = await download_image_data_async(client, PLACEHOLDER_IMAGE_URL)
+                pattern_data["image_data"] = image_data
+        
+        return {k: v for k, v in pattern_data.items() if k in VALID_FIELDS}
+        
+    except httpx.HTTPError as e:
+        logger.error("Network error: %s", e)
         return {"error": f"Network error: {str(e)}"}
     except Exception as e:
-        logger.error(f"Scraper error: {str(e)}")
+        logger.error("Scraper error: %s", e)
         return {"error": f"Scraper error: {str(e)}"}
@@ -0,0 +1,41 @@
+"""
+Short-lived signed URLs for the image and PDF endpoints.
+
+<img> tags and download links can't send an Authorization header, so the
+pattern and PDF dicts hand out URLs signed with the app's SECRET_KEY. A
+signed URL opens its one path without a token until it expires; whether
+the user may open the pattern was settled when the URL was handed out.
+
+URLs are signed per BLOB_URL_MAX_AGE window: every URL issued for a path
+within a window is the same, so browsers can cache what it points to, and
+it stays valid for between one and two windows.
+
+    /api/patterns/12/image?expires=1760000000&signature=3f1c...
+"""
+import hashlib
+import hmac
+import time
+from flask import current_app
+
+def url_signature(secret, path, expires):
+    """Hex HMAC-SHA256 of a path and its expiry time."""
+    return hmac.new(secret.encode(), f"{path}\n{expires}".encode(), hashlib.sha256).hexdigest()
+
+def sign_url(path, secret=None, max_age=None, now=None):
+    """path with expires and signature arguments added."""
+    secret = secret or current_app.config['SECRET_KEY']
+    max_age = max_age or current_app.config['BLOB_URL_MAX_AGE']
+    now = time.time() if now is None else now
+    expires = (int(now) // max_age + 2) * max_age
+    return f"{path}?expires={expires}&signature={url_signature(secret, path, expires)}"
+
+def verify_url(path, expires, signature, secret=None, now=None):
+    """Whether expires and signature (the request's arguments) are a valid, current signature of path."""
+    secret = secret or current_app.config['SECRET_KEY']
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        return False
+    if expires < (time.time() if now is None else now):
+        return False
+    return hmac.compare_digest(url_signature(secret, path, expires), signature or '')
@@ -0,0 +1,93 @@
+"""
+Stash matching: which patterns fit a size and a piece of fabric.
+
+    GET /api/patterns/stash-match?size=14&width=60&max_yards=3[&<list filters>]
+
+Answered in the database from the parsed size and yardage tables
+(measurements.py): a pattern matches if one of its size ranges contains
+the size and one of its yardage entries at about that width needs at
+most max_yards. Each item carries yards_needed, the least fabric it
+needs under those conditions.
+"""
+import logging
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required
+from marshmallow import ValidationError, EXCLUDE
+from sqlalchemy import and_
+from filters import load_pattern_filters, apply_pattern_filters
+from measurements import parse_size_value
+from models import db, Pattern, PatternSizeRange, PatternYardage
+from ownership import owner_scoped, scope_to_owner
+from ratelimit import rate_limit
+from validation import StashMatchQuerySchema
+
+logger = logging.getLogger(__name__)
+
+stash_bp = Blueprint('stash', __name__)
+
+stash_query_schema = StashMatchQuerySchema(unknown=EXCLUDE)
+
+@stash_bp.route('/api/patterns/stash-match', methods=['GET'])
+@jwt_required()
+@rate_limit('list')
+@owner_scoped
+def stash_match():
+    """Find the user's patterns for a size that can be made from the given fabric"""
+    try:
+        params = stash_query_schema.load({key: value for key, value in request.args.items() if value != ''})
+        filters = load_pattern_filters(request.args)
+    except ValidationError as err:
+        return jsonify({"error": "Validation error", "details": err.messages}), 400
+
+    if not any(params.get(key) is not None for key in ('size', 'width', 'max_yards')):
+        return jsonify({"error": "Give at least one of size, width and max_yards"}), 400
+
+    try:
+        size = parse_size_value(params['size']) if params.get('size') else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 20, type=int)
+
+        query = scope_to_owner(apply_pattern_filters(Pattern.query, filters))
+        if size:
+            system, value = size
+            query = query.filter(Pattern.size_ranges.any(and_(
+                PatternSizeRange.field == params['size_field'],
+                PatternSizeRange.system == system,
+                PatternSizeRange.min_value <= value,
+                PatternSizeRange.max_value >= value
+            )))
+
+        fabric = []
+        if params.get('width') is not None:
+            tolerance = current_app.config['STASH_WIDTH_TOLERANCE']
+            fabric.append(PatternYardage.width_inches.between(params['width'] - tolerance,
+                                                              params['width'] + tolerance))
+        if params.get('max_yards') is not None:
+            fabric.append(PatternYardage.yards <= params['max_yards'])
+        if fabric:
+            query = query.filter(Pattern.yardages.any(and_(*fabric)))
+
+        total_count = query.count()
+        patterns = query.order_by(Pattern.id).limit(per_page).offset((page-1)*per_page).all()
+
+        yards_needed = {}
+        if fabric and patterns:
+            yards_needed = dict(db.session.query(
+                PatternYardage.pattern_id, db.func.min(PatternYardage.yards)
+            ).filter(
+                PatternYardage.pattern_id.in_([pattern.id for pattern in patterns]), *fabric
+            ).group_by(PatternYardage.pattern_id).all())
+
+        return jsonify({
+            'items': [dict(pattern.to_dict(), yards_needed=yards_needed.get(pattern.id)) for pattern in patterns],
+            'total': total_count,
+            'page': page,
+            'per_page': per_page
+        })
+    except Exception as e:
+        logger.error("Error matching stash: %s", e)
+        return jsonify({"error": str(e)}), 500
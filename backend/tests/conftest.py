@@ -0,0 +1,84 @@
+"""
+Shared fixtures: one app per test session on an in-memory SQLite database
+built by the real migrations (so the facet count triggers exist), emptied
+after every test.
+"""
+import os
+import sqlite3
+import pytest
+from flask_jwt_extended import create_access_token
+from flask_migrate import Migrate, upgrade
+from sqlalchemy.pool import QueuePool
+from app import create_app
+from config import Config
+from models import db, User
+
+# Shared-cache in-memory database, reachable from every pooled connection
+# while KEEPALIVE_URI holds one open
+DATABASE_NAME = '/sewing-patterns-tests'
+KEEPALIVE_URI = f'file:{DATABASE_NAME}?mode=memory&cache=shared'
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = f'sqlite:///file:{DATABASE_NAME}?mode=memory&cache=shared&uri=true'
+    # A real pool, so tests can see which connections are checked out
+    SQLALCHEMY_ENGINE_OPTIONS = {'poolclass': QueuePool, 'connect_args': {'check_same_thread': False}}
+    SQLALCHEMY_REPLICA_URIS = []
+    SQLALCHEMY_BINDS = {}
+    JWT_SECRET_KEY = 'test-jwt-secret-key-of-a-reasonable-length'
+    RATE_LIMITS_ENABLED = False
+    MEMORY_TRACKING = 'off'
+    FRONTEND_DIST = None
+    LOG_LEVEL = 'WARNING'
+    CHANGES_SETTLE_SECONDS = 0
+
+@pytest.fixture(scope='session')
+def app():
+    keepalive = sqlite3.connect(KEEPALIVE_URI, uri=True)
+    app = create_app(TestConfig)
+    Migrate(app, db, directory=os.path.join(app.root_path, 'migrations'))
+    with app.app_context():
+        upgrade()
+    yield app
+    keepalive.close()
+
+@pytest.fixture(autouse=True)
+def clean_database(app):
+    """Empty every table after each test."""
+    yield
+    with app.app_context():
+        db.session.remove()
+        with db.engine.begin() as conn:
+            for table in reversed(db.metadata.sorted_tables):
+                conn.execute(table.delete())
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def make_user(username, is_admin=False):
+    user = User(username=username, email=f'{username}@example.com', is_admin=is_admin)
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+@pytest.fixture
+def user(app_context):
+    return make_user('sue')
+
+@pytest.fixture
+def other_user(app_context):
+    return make_user('bob')
+
+@pytest.fixture
+def admin(app_context):
+    return make_user('admin', is_admin=True)
+
+def auth_headers(user):
+    return {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
@@ -0,0 +1,50 @@
+import pytest
+from models import db, Pattern, PatternPDF
+from conftest import auth_headers
+
+def add(user, number, **values):
+    pattern = Pattern(brand='Simplicity', pattern_number=number, title=f'Pattern {number}', user_id=user.id,
+                      **values)
+    db.session.add(pattern)
+    db.session.commit()
+    return pattern
+
+def test_get_keeps_the_requested_order(client, user, other_user):
+    first, second = add(user, '1'), add(user, '2')
+    theirs = add(other_user, '3')
+    response = client.get(f'/api/patterns/batch?ids={second.id},{theirs.id},999,{first.id},{second.id}',
+                          headers=auth_headers(user))
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [item['id'] for item in body['items']] == [second.id, first.id]
+    # Other users' patterns look the same as ids that don't exist
+    assert body['missing'] == [theirs.id, 999]
+
+def test_post_with_sparse_fields(client, user):
+    pattern = add(user, '1', pdf_files=[PatternPDF(category='Pieces', pdf_data=b'%PDF')])
+    response = client.post('/api/patterns/batch', json={'ids': [pattern.id], 'fields': ['title']},
+                           headers=auth_headers(user))
+    assert response.status_code == 200
+    assert response.get_json()['items'] == [{'id': pattern.id, 'title': 'Pattern 1'}]
+
+    response = client.post('/api/patterns/batch', json={'ids': [pattern.id], 'fields': ['pdf_files']},
+                           headers=auth_headers(user))
+    assert [pdf['category'] for pdf in response.get_json()['items'][0]['pdf_files']] == ['Pieces']
+
+@pytest.mark.parametrize('query', ['', 'ids=a,b', 'ids=1&fields=title,password'])
+def test_invalid_get_requests(client, user, query):
+    assert client.get(f'/api/patterns/batch?{query}', headers=auth_headers(user)).status_code == 400
+
+def test_invalid_post_requests(client, user):
+    headers = auth_headers(user)
+    assert client.post('/api/patterns/batch', json={'ids': []}, headers=headers).status_code == 400
+    assert client.post('/api/patterns/batch', data='not json', headers=headers).status_code == 400
+
+def test_id_limit(app, client, user, monkeypatch):
+    monkeypatch.setitem(app.config, 'BATCH_MAX_IDS', 2)
+    headers = auth_headers(user)
+    assert client.get('/api/patterns/batch?ids=1,2,1', headers=headers).status_code == 200
+    assert client.get('/api/patterns/batch?ids=1,2,3', headers=headers).status_code == 400
+
+def test_requires_a_token(client):
+    assert client.get('/api/patterns/batch?ids=1').status_code == 401
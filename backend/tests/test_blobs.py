@@ -0,0 +1,80 @@
+import io
+import zipfile
+import pytest
+from blobs import resolve_range, stream_zip, blob_etag, iter_blob
+from models import db, Pattern
+
+LENGTH = 1000
+ETAG = 'etag-1'
+
+def test_no_range_sends_everything():
+    result = resolve_range(LENGTH, ETAG)
+    assert (result.status, result.start, result.stop) == (200, 0, LENGTH)
+    assert result.headers['ETag'] == f'"{ETAG}"'
+    assert result.headers['Accept-Ranges'] == 'bytes'
+
+def test_closed_range():
+    result = resolve_range(LENGTH, ETAG, 'bytes=0-99')
+    assert (result.status, result.start, result.stop) == (206, 0, 100)
+    assert result.headers['Content-Range'] == 'bytes 0-99/1000'
+
+def test_open_ended_range():
+    result = resolve_range(LENGTH, ETAG, 'bytes=900-')
+    assert (result.status, result.start, result.stop) == (206, 900, LENGTH)
+    assert result.headers['Content-Range'] == 'bytes 900-999/1000'
+
+def test_suffix_range():
+    result = resolve_range(LENGTH, ETAG, 'bytes=-100')
+    assert (result.status, result.start, result.stop) == (206, 900, LENGTH)
+
+def test_range_past_the_end_is_clamped():
+    result = resolve_range(LENGTH, ETAG, 'bytes=990-2000')
+    assert (result.status, result.start, result.stop) == (206, 990, LENGTH)
+
+def test_unsatisfiable_range():
+    result = resolve_range(LENGTH, ETAG, 'bytes=5000-6000')
+    assert result.status == 416
+    assert result.headers['Content-Range'] == 'bytes */1000'
+
+def test_multiple_ranges_send_everything():
+    result = resolve_range(LENGTH, ETAG, 'bytes=0-9,20-29')
+    assert (result.status, result.start, result.stop) == (200, 0, LENGTH)
+
+def test_if_range_mismatch_sends_everything():
+    result = resolve_range(LENGTH, ETAG, 'bytes=0-9', if_range_header='"other"')
+    assert result.status == 200
+
+def test_if_range_match_sends_range():
+    result = resolve_range(LENGTH, ETAG, 'bytes=0-9', if_range_header=f'"{ETAG}"')
+    assert (result.status, result.start, result.stop) == (206, 0, 10)
+
+def test_if_none_match():
+    assert resolve_range(LENGTH, ETAG, 'bytes=0-9', if_none_match_header=f'"{ETAG}"').status == 304
+
+def test_blob_etag_changes_with_updated_at():
+    from datetime import datetime
+    assert blob_etag(1, datetime(2024, 1, 1)) != blob_etag(1, datetime(2024, 1, 2))
+    assert blob_etag(1, None) == '1-0'
+
+def test_stream_zip_round_trip():
+    files = {'a/one.pdf': b'%PDF-1.4 one', 'b/two.pdf': b'x' * 100000}
+    entries = [
+        (name, (2024, 1, 2, 3, 4, 6), len(data), [data[i:i + 4096] for i in range(0, len(data), 4096)])
+        for name, data in files.items()
+    ]
+    archive = b''.join(stream_zip(entries))
+    with zipfile.ZipFile(io.BytesIO(archive)) as zf:
+        assert zf.testzip() is None
+        assert {name: zf.read(name) for name in zf.namelist()} == files
+        assert zf.getinfo('a/one.pdf').date_time == (2024, 1, 2, 3, 4, 6)
+
+@pytest.mark.parametrize('start', [0, 5, 4095, 4096])
+def test_iter_blob_reads_in_chunks(app_context, start):
+    data = bytes(range(256)) * 40
+    pattern = Pattern(brand='Simplicity', pattern_number='1', title='t', image_data=data)
+    db.session.add(pattern)
+    db.session.commit()
+
+    chunks = list(iter_blob(Pattern.image_data, Pattern.id, pattern.id, len(data), chunk_size=1000, start=start))
+    assert b''.join(chunks) == data[start:]
+    assert all(len(chunk) <= 1000 for chunk in chunks)
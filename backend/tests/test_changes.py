@@ -0,0 +1,102 @@
+from datetime import datetime
+import pytest
+from changes import encode_cursor, decode_cursor, InvalidCursor
+from models import db, Pattern, User
+from conftest import make_user, auth_headers
+
+def test_cursor_round_trip():
+    position = (datetime(2024, 5, 6, 7, 8, 9, 123456), 42, 7)
+    assert decode_cursor(encode_cursor(*position)) == position
+    assert decode_cursor(encode_cursor(None, 0, 0)) == (None, 0, 0)
+
+@pytest.mark.parametrize('cursor', ['', 'not-a-cursor', encode_cursor(None, 0, 0)[:-3]])
+def test_invalid_cursor(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+def add(user, number):
+    pattern = Pattern(brand='Simplicity', pattern_number=number, title='t', user_id=user.id)
+    db.session.add(pattern)
+    db.session.commit()
+    return pattern
+
+def sync(client, user, cursor=None, limit=None):
+    """Follow the feed from cursor until has_more is false."""
+    changed, deleted, pages = [], [], 0
+    while True:
+        args = {key: value for key, value in (('since', cursor), ('limit', limit)) if value}
+        response = client.get('/api/patterns/changes', query_string=args, headers=auth_headers(user))
+        assert response.status_code == 200
+        body = response.get_json()
+        changed += [item['id'] for item in body['changes']]
+        deleted += [(item['type'], item['id']) for item in body['deleted']]
+        cursor, pages = body['cursor'], pages + 1
+        if not body['has_more']:
+            return changed, deleted, cursor, pages
+
+def test_full_sync_pages_through_everything(client, user):
+    ids = [add(user, str(number)).id for number in range(5)]
+    changed, deleted, _, pages = sync(client, user, limit=2)
+    assert changed == ids
+    assert deleted == []
+    assert pages == 3
+
+def test_incremental_sync(client, user, other_user):
+    first = add(user, '1')
+    second = add(user, '2')
+    add(other_user, '3')
+    _, _, cursor, _ = sync(client, user)
+
+    # Nothing new
+    assert sync(client, user, cursor)[:2] == ([], [])
+
+    first.title = 'changed'
+    db.session.commit()
+    db.session.delete(second)
+    db.session.commit()
+    third = add(user, '4')
+
+    changed, deleted, cursor, _ = sync(client, user, cursor)
+    assert changed == [first.id, third.id]
+    assert deleted == [('pattern', second.id)]
+    assert sync(client, user, cursor)[:2] == ([], [])
+
+def test_bad_cursor_is_rejected(client, user):
+    response = client.get('/api/patterns/changes?since=garbage', headers=auth_headers(user))
+    assert response.status_code == 400
+
+def test_moving_a_pattern_tombstones_it_for_the_previous_owner(app, client):
+    # A fresh app context per step, so each request resolves its own user
+    with app.app_context():
+        sue, bob = make_user('sue').id, make_user('bob').id
+        admin = make_user('admin', is_admin=True).id
+        pattern_id = add(db.session.get(User, sue), '1').id
+        _, _, cursor, _ = sync(client, db.session.get(User, sue))
+    with app.app_context():
+        _, _, other_cursor, _ = sync(client, db.session.get(User, bob))
+
+    with app.app_context():
+        db.session.get(Pattern, pattern_id).user_id = bob
+        db.session.commit()
+
+    with app.app_context():
+        assert sync(client, db.session.get(User, sue), cursor)[:2] == ([], [('pattern', pattern_id)])
+    with app.app_context():
+        assert sync(client, db.session.get(User, bob), other_cursor)[:2] == ([pattern_id], [])
+    with app.app_context():
+        # Across all collections the pattern was only updated
+        response = client.get('/api/patterns/changes?owner=all',
+                              headers=auth_headers(db.session.get(User, admin)))
+        assert [item['id'] for item in response.get_json()['changes']] == [pattern_id]
+        assert response.get_json()['deleted'] == []
+
+def test_updated_at_comes_from_the_database_clock(app_context, user):
+    pattern = add(user, '1')
+    stamped = db.session.execute(
+        db.select(db.func.typeof(Pattern.updated_at)).where(Pattern.id == pattern.id)
+    ).scalar()
+    assert stamped == 'text'
+    # Stored in SQLAlchemy's own format, so keyset comparisons with bound values hold
+    assert db.session.execute(
+        db.select(Pattern.id).where(Pattern.updated_at == pattern.updated_at)
+    ).scalar() == pattern.id
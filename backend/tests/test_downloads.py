@@ -0,0 +1,128 @@
+import io
+import zipfile
+import pytest
+from models import db, Pattern, PatternPDF
+from signed_urls import sign_url
+from conftest import make_user, auth_headers
+
+# Spans several iter_blob chunks
+BLOB = bytes(range(256)) * 3000
+
+@pytest.fixture
+def stored(app):
+    """A pattern with an image and two PDFs, created outside any request."""
+    with app.app_context():
+        user = make_user('sue')
+        pattern = Pattern(brand='Simplicity', pattern_number='1234', title='t', user_id=user.id, image_data=BLOB)
+        pattern.pdf_files = [
+            PatternPDF(category='Pieces', file_order=1, pdf_data=BLOB),
+            PatternPDF(category='Instructions', file_order=2, pdf_data=b'%PDF-1.4 small'),
+        ]
+        db.session.add(pattern)
+        db.session.commit()
+        ids = {'user': user.id, 'pattern': pattern.id, 'pdf': pattern.pdf_files[0].id,
+               'headers': auth_headers(user)}
+        db.session.remove()
+    return ids
+
+@pytest.mark.parametrize('url', [
+    '/api/patterns/{pattern}/image',
+    '/api/pdfs/{pdf}',
+    '/api/patterns/{pattern}/pdfs.zip',
+])
+def test_streams_hold_no_connection(app, client, stored, url):
+    with app.app_context():
+        pool = db.engine.pool
+    response = client.get(url.format(**stored), headers=stored['headers'], buffered=False)
+    assert response.status_code == 200
+    chunks = iter(response.response)
+    body = next(chunks)
+
+    # Mid-download, between chunks
+    assert pool.checkedout() == 0
+
+    body += b''.join(chunks)
+    response.close()
+    assert len(body) >= len(BLOB)
+    assert pool.checkedout() == 0
+
+def test_pdf_range(client, stored):
+    response = client.get(f"/api/pdfs/{stored['pdf']}", headers={'Range': 'bytes=-10', **stored['headers']})
+    assert response.status_code == 206
+    assert response.data == BLOB[-10:]
+
+def test_pattern_zip(client, stored):
+    response = client.get(f"/api/patterns/{stored['pattern']}/pdfs.zip", headers=stored['headers'])
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        assert archive.namelist() == ['01_Pieces.pdf', '02_Instructions.pdf']
+        assert archive.read('01_Pieces.pdf') == BLOB
+
+def test_patterns_zip_folders_are_unique(app, client, stored):
+    # The same brand and number in another collection
+    with app.app_context():
+        admin = make_user('admin', is_admin=True)
+        headers = auth_headers(admin)
+        other = make_user('bob')
+        copy = Pattern(brand='Simplicity', pattern_number='1234', title='t', user_id=other.id,
+                       pdf_files=[PatternPDF(category='Pieces', file_order=1, pdf_data=b'%PDF-1.4 copy')])
+        db.session.add(copy)
+        db.session.commit()
+        copy_id = copy.id
+
+    response = client.get(f"/api/pdfs/zip?pattern_ids={stored['pattern']},{copy_id}", headers=headers)
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        names = archive.namelist()
+    assert len(names) == len(set(names)) == 3
+    assert f"{copy_id}_Simplicity_1234/01_Pieces.pdf" in names
+
+def test_zips_are_scoped_to_the_user(app, client, stored):
+    with app.app_context():
+        other = make_user('bob')
+        headers = auth_headers(other)
+        theirs = Pattern(brand='Butterick', pattern_number='1', title='t', user_id=other.id,
+                         pdf_files=[PatternPDF(category='Pieces', pdf_data=b'%PDF-1.4 mine')])
+        db.session.add(theirs)
+        db.session.commit()
+        theirs_id = theirs.id
+
+    assert client.get(f"/api/patterns/{stored['pattern']}/pdfs.zip").status_code == 401
+    assert client.get(f"/api/pdfs/zip?pattern_ids={stored['pattern']}").status_code == 401
+    assert client.get(f"/api/patterns/{stored['pattern']}/pdfs.zip", headers=headers).status_code == 404
+
+    response = client.get(f"/api/pdfs/zip?pattern_ids={theirs_id},{stored['pattern']}", headers=headers)
+    assert response.status_code == 404
+    assert response.get_json()['missing'] == [stored['pattern']]
+
+    response = client.get(f"/api/pdfs/zip?pattern_ids={theirs_id}", headers=headers)
+    assert response.status_code == 200
+
+@pytest.mark.parametrize('url', ['/api/patterns/{pattern}/image', '/api/pdfs/{pdf}'])
+def test_blobs_are_scoped_to_the_owner(app, client, stored, url):
+    url = url.format(**stored)
+    assert client.get(url).status_code == 401
+    with app.app_context():
+        headers = auth_headers(make_user('bob'))
+    assert client.get(url, headers=headers).status_code == 404
+
+def test_signed_urls_open_without_a_token(app, client, stored):
+    with app.app_context():
+        pattern = db.session.get(Pattern, stored['pattern']).to_dict()
+    for url in (pattern['image_url'], pattern['pdf_files'][0]['pdf_url']):
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.data == BLOB
+
+    # Only for the path that was signed, and not once expired
+    image_url = pattern['image_url']
+    assert client.get(image_url.replace(f"/{stored['pattern']}/", '/999/')).status_code == 401
+    assert client.get(image_url[:-1] + ('0' if image_url[-1] != '0' else '1')).status_code == 401
+    with app.test_request_context():
+        expired = sign_url(f"/api/patterns/{stored['pattern']}/image", now=0)
+    assert client.get(expired).status_code == 401
+
+def test_signed_urls_are_stable_within_a_window(app):
+    with app.test_request_context():
+        assert sign_url('/api/pdfs/1', max_age=60, now=120) == sign_url('/api/pdfs/1', max_age=60, now=179)
+        assert sign_url('/api/pdfs/1', max_age=60, now=120) != sign_url('/api/pdfs/1', max_age=60, now=180)
@@ -0,0 +1,60 @@
+from models import db, Pattern, PatternFacetCount
+from conftest import auth_headers
+
+def counts(facet):
+    """{(user_id, value): count} of one facet, leaving out zero counts."""
+    return {
+        (row.user_id, row.value): row.count
+        for row in PatternFacetCount.query.filter_by(facet=facet)
+        if row.count
+    }
+
+def add(**fields):
+    pattern = Pattern(**dict({'brand': 'Simplicity', 'title': 't'}, **fields))
+    db.session.add(pattern)
+    db.session.commit()
+    return pattern
+
+def test_insert_counts_every_facet(app_context, user):
+    add(pattern_number='1', user_id=user.id, difficulty='Easy', cosplay_hackable=True)
+    add(pattern_number='2', user_id=user.id, difficulty='Easy')
+    add(pattern_number='3', difficulty='Hard')
+
+    assert counts('difficulty') == {(user.id, 'Easy'): 2, (0, 'Hard'): 1}
+    assert counts('brand') == {(user.id, 'Simplicity'): 2, (0, 'Simplicity'): 1}
+    assert counts('cosplay_hackable') == {(user.id, 'true'): 1, (user.id, ''): 1, (0, ''): 1}
+
+def test_update_moves_counts(app_context, user, other_user):
+    pattern = add(pattern_number='1', user_id=user.id, difficulty='Easy')
+
+    pattern.difficulty = 'Hard'
+    db.session.commit()
+    assert counts('difficulty') == {(user.id, 'Hard'): 1}
+
+    pattern.user_id = other_user.id
+    db.session.commit()
+    assert counts('difficulty') == {(other_user.id, 'Hard'): 1}
+
+    pattern.difficulty = None
+    db.session.commit()
+    assert counts('difficulty') == {(other_user.id, ''): 1}
+
+def test_delete_removes_counts(app_context, user):
+    pattern = add(pattern_number='1', user_id=user.id, difficulty='Easy')
+    add(pattern_number='2', user_id=user.id, difficulty='Easy')
+
+    db.session.delete(pattern)
+    db.session.commit()
+    assert counts('difficulty') == {(user.id, 'Easy'): 1}
+
+def test_endpoint_reads_the_users_counts(client, user, other_user):
+    add(pattern_number='1', user_id=user.id, difficulty='Easy')
+    add(pattern_number='2', user_id=other_user.id, difficulty='Hard')
+
+    response = client.get('/api/patterns/facets', headers=auth_headers(user))
+    assert response.status_code == 200
+    assert response.get_json()['difficulty'] == [{'value': 'Easy', 'count': 1}]
+
+    # Filtered counts are computed over the matching patterns instead
+    response = client.get('/api/patterns/facets?difficulty=Hard', headers=auth_headers(user))
+    assert response.get_json()['difficulty'] == []
@@ -0,0 +1,33 @@
+import gzip
+import pytest
+from flask import Flask
+from frontend import init_frontend
+
+@pytest.fixture
+def frontend_client(tmp_path):
+    (tmp_path / 'index.html').write_text('<html></html>')
+    (tmp_path / 'index.html.gz').write_bytes(gzip.compress(b'<html></html>'))
+    (tmp_path / 'assets').mkdir()
+    (tmp_path / 'assets' / 'app-1234.js').write_text('app()')
+    app = Flask(__name__)
+    app.config['FRONTEND_DIST'] = str(tmp_path)
+    init_frontend(app)
+    return app.test_client()
+
+def test_precompressed_variant_is_sent_encoded(frontend_client):
+    response = frontend_client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.mimetype == 'text/html'
+    assert gzip.decompress(response.data) == b'<html></html>'
+    assert frontend_client.get('/').data == b'<html></html>'
+
+def test_variants_are_not_served_by_name(frontend_client):
+    assert frontend_client.get('/index.html.gz').status_code == 404
+    assert frontend_client.get('/assets/app-1234.js.br').status_code == 404
+
+def test_routes_and_assets(frontend_client):
+    response = frontend_client.get('/assets/app-1234.js')
+    assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    assert frontend_client.get('/patterns/12').data == b'<html></html>'
+    assert frontend_client.get('/assets/missing-1.js').status_code == 404
+    assert frontend_client.get('/api/nothing').status_code == 404
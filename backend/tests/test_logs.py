@@ -0,0 +1,97 @@
+import json
+import logging
+import queue
+import pytest
+from logs import (new_request_id, start_request, end_request, access_logger, RequestIdFilter, SamplingFilter,
+                  JsonFormatter, NonBlockingQueueHandler, REQUEST_ID_HEADER)
+
+class Capture(logging.Handler):
+    """Keeps records, stamped with their request id like the real handler."""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.addFilter(RequestIdFilter())
+
+    def emit(self, record):
+        self.records.append(record)
+
+@pytest.fixture
+def access_records():
+    capture = Capture()
+    level, disabled = access_logger.level, access_logger.disabled
+    # The migrations' logging config disables existing loggers
+    access_logger.disabled = False
+    access_logger.setLevel(logging.INFO)
+    access_logger.addHandler(capture)
+    yield capture.records
+    access_logger.removeHandler(capture)
+    access_logger.setLevel(level)
+    access_logger.disabled = disabled
+
+def record(level=logging.INFO, msg='hello %s', args=('world',)):
+    return logging.LogRecord('test', level, __file__, 1, msg, args, None)
+
+def test_new_request_id():
+    assert new_request_id('abc-123.x_y') == 'abc-123.x_y'
+    for unusable in (None, '', 'has spaces', 'x' * 65, 'quote"d'):
+        generated = new_request_id(unusable)
+        assert generated != unusable and len(generated) == 32
+
+def test_requests_get_an_id_and_an_access_log_line(client, access_records):
+    response = client.get('/api/patterns/changes', headers={REQUEST_ID_HEADER: 'client-id-1'})
+    assert response.headers[REQUEST_ID_HEADER] == 'client-id-1'
+    (line,) = access_records
+    assert (line.request_id, line.method, line.path, line.status) == (
+        'client-id-1', 'GET', '/api/patterns/changes', 401)
+
+    response = client.get('/api/patterns/changes', headers={REQUEST_ID_HEADER: 'not valid!'})
+    generated = response.headers[REQUEST_ID_HEADER]
+    assert generated != 'not valid!'
+    assert access_records[1].request_id == generated
+
+def test_records_outside_a_request_have_no_id():
+    entry = record()
+    RequestIdFilter().filter(entry)
+    assert entry.request_id == '-'
+
+def test_records_inside_a_request_get_its_id(access_records):
+    token = start_request('abc')
+    entry = record()
+    RequestIdFilter().filter(entry)
+    end_request(token, 'GET', '/x', 200)
+    assert entry.request_id == 'abc'
+    assert access_records[0].levelno == logging.INFO
+
+def test_server_errors_are_logged_as_warnings(access_records):
+    end_request(start_request('abc'), 'GET', '/x', 502)
+    assert access_records[0].levelno == logging.WARNING
+
+def test_sampling_keeps_warnings():
+    never = SamplingFilter(0)
+    assert not never.filter(record(logging.INFO))
+    assert not never.filter(record(logging.DEBUG))
+    assert never.filter(record(logging.WARNING))
+    assert SamplingFilter(1).filter(record(logging.DEBUG))
+
+def test_json_lines_include_extra_fields():
+    entry = logging.getLogger('test').makeRecord('test', logging.INFO, __file__, 1, 'GET %s', ('/x',), None,
+                                                 extra={'status': 200})
+    entry.request_id = 'abc'
+    line = json.loads(JsonFormatter().format(entry))
+    assert line['message'] == 'GET /x'
+    assert (line['request_id'], line['status'], line['level']) == ('abc', 200, 'INFO')
+
+def test_full_queue_drops_and_reports():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=2))
+    for _ in range(3):
+        handler.enqueue(record())
+    assert handler.dropped == 1
+
+    # The drop count is reported once there is room again
+    handler.queue.get_nowait()
+    handler.queue.get_nowait()
+    handler.enqueue(record())
+    assert handler.queue.get_nowait().getMessage() == 'hello world'
+    assert handler.queue.get_nowait().getMessage() == 'Dropped 1 log records, the log queue was full'
+    assert handler.dropped == 0
@@ -0,0 +1,74 @@
+import pytest
+from measurements import parse_sizes, parse_size_value, parse_yardage, SIZE_LETTER, SIZE_NUMERIC
+from models import db, Pattern
+from conftest import auth_headers
+
+@pytest.mark.parametrize('text, expected', [
+    ('6-8-10-12-14', [(SIZE_NUMERIC, 6, 14)]),
+    ('XS-M, 18W-24W', [(SIZE_LETTER, 1, 3), (SIZE_NUMERIC, 18, 24)]),
+    ('S-L', [(SIZE_LETTER, 2, 4)]),
+    ('8, 10, 12', [(SIZE_NUMERIC, 8, 12)]),
+    ('6-10, 16-20', [(SIZE_NUMERIC, 6, 10), (SIZE_NUMERIC, 16, 20)]),
+    ('Not specified', []),
+    ('', []),
+    (None, []),
+])
+def test_parse_sizes(text, expected):
+    assert parse_sizes(text) == expected
+
+@pytest.mark.parametrize('text, expected', [
+    ('14', (SIZE_NUMERIC, 14.0)),
+    ('18W', (SIZE_NUMERIC, 18.0)),
+    ('m', (SIZE_LETTER, 3.0)),
+    (' XL ', (SIZE_LETTER, 5.0)),
+])
+def test_parse_size_value(text, expected):
+    assert parse_size_value(text) == expected
+
+def test_parse_size_value_rejects_other_text():
+    with pytest.raises(ValueError):
+        parse_size_value('large-ish')
+
+@pytest.mark.parametrize('text, expected', [
+    ('View A: 2 1/4 yds 45"; 1 3/4 yds 60"', [('A', 2.25, 45), ('A', 1.75, 60)]),
+    ('45": 3 yds, 60": 2 yds', [(None, 3, 45), (None, 2, 60)]),
+    ('1½ yards', [(None, 1.5, None)]),
+    ('Not specified', []),
+    (None, []),
+])
+def test_parse_yardage(text, expected):
+    assert parse_yardage(text) == expected
+
+def test_parse_yardage_converts_metric():
+    [(view, yards, width)] = parse_yardage('2 m 150 cm')
+    assert view is None
+    assert yards == pytest.approx(2 / 0.9144, abs=0.001)
+    assert width == pytest.approx(59.1)
+
+def test_parse_yardage_skips_narrow_widths():
+    # A 1" elastic is not a fabric width
+    assert parse_yardage('1 yd 1" elastic') == [(None, 1, None)]
+
+def test_stash_match(client, user):
+    patterns = [
+        Pattern(brand='Simplicity', pattern_number='1', title='t', user_id=user.id,
+                size='6-14', yardage='View A: 2 1/4 yds 45"; 1 3/4 yds 60"'),
+        Pattern(brand='Simplicity', pattern_number='2', title='t', user_id=user.id,
+                size='16-24', yardage='1 yd 60"'),
+        Pattern(brand='Simplicity', pattern_number='3', title='t', user_id=user.id,
+                size='XS-M', yardage='4 yds 60"'),
+    ]
+    db.session.add_all(patterns)
+    db.session.commit()
+
+    response = client.get('/api/patterns/stash-match?size=14&width=60&max_yards=3', headers=auth_headers(user))
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [item['id'] for item in body['items']] == [patterns[0].id]
+    assert body['items'][0]['yards_needed'] == 1.75
+
+    response = client.get('/api/patterns/stash-match?size=M', headers=auth_headers(user))
+    assert [item['id'] for item in response.get_json()['items']] == [patterns[2].id]
+
+    response = client.get('/api/patterns/stash-match?size=huge', headers=auth_headers(user))
+    assert response.status_code == 400
@@ -0,0 +1,70 @@
+import io
+import pytest
+from memory import MemoryTracker
+from models import db, Pattern
+from conftest import auth_headers
+
+@pytest.fixture
+def tracker_config():
+    return {'MEMORY_TRACKING': 'rss', 'MEMORY_SAMPLE_RATE': 1.0, 'MEMORY_OUTLIER_BYTES': 1024}
+
+def test_pdf_upload_over_budget_is_refused(app, client, user, monkeypatch):
+    monkeypatch.setitem(app.config, 'PDF_UPLOAD_MAX_BYTES', 1000)
+    pattern = Pattern(brand='Simplicity', pattern_number='1', title='t', user_id=user.id)
+    db.session.add(pattern)
+    db.session.commit()
+
+    response = client.post(f'/api/patterns/{pattern.id}/pdfs', headers=auth_headers(user),
+                           data={'pdf': (io.BytesIO(b'%PDF' + b'x' * 2000), 'big.pdf')})
+    assert response.status_code == 413
+    assert pattern.pdf_files == []
+
+    response = client.post(f'/api/patterns/{pattern.id}/pdfs', headers=auth_headers(user),
+                           data={'pdf': (io.BytesIO(b'%PDF small'), 'small.pdf')})
+    assert response.status_code == 201
+
+def test_image_upload_over_budget_is_refused(app, client, user, monkeypatch):
+    monkeypatch.setitem(app.config, 'IMAGE_UPLOAD_MAX_BYTES', 1000)
+    response = client.post('/api/patterns', headers=auth_headers(user), data={
+        'brand': 'Simplicity', 'pattern_number': '1', 'title': 't',
+        'image': (io.BytesIO(b'x' * 2000), 'big.jpg'),
+    })
+    assert response.status_code == 413
+    assert Pattern.query.count() == 0
+
+def test_tracker_records_requests_and_outliers(tracker_config):
+    tracker = MemoryTracker(tracker_config)
+    for rss_delta in (10, 4096):
+        state = tracker.start()
+        state['rss'] -= rss_delta
+        tracker.finish('api.get_pdf', 'GET', 200, state)
+
+    stats = tracker.to_dict()['api.get_pdf']
+    assert stats['requests'] == 2
+    assert stats['rss_delta_max'] >= 4096
+    assert [outlier['status'] for outlier in stats['outliers']] == [200]
+
+def test_sampled_requests_record_a_peak(tracker_config):
+    tracker = MemoryTracker(dict(tracker_config, MEMORY_TRACKING='sample', MEMORY_OUTLIER_BYTES=10 ** 9))
+    state = tracker.start()
+    assert state['sampled']
+    data = bytearray(1024 * 1024)
+    tracker.finish('api.get_pdf', 'GET', 200, state)
+    del data
+    stats = tracker.to_dict()['api.get_pdf']
+    assert stats['samples'] == 1
+    assert stats['peak_max'] >= 1024 * 1024
+
+def test_unknown_tracking_mode(tracker_config):
+    with pytest.raises(ValueError):
+        MemoryTracker(dict(tracker_config, MEMORY_TRACKING='verbose'))
+
+def test_metrics_are_for_admins(app, client, user, admin, tracker_config, monkeypatch):
+    tracker = MemoryTracker(tracker_config)
+    tracker.finish('api.get_pdf', 'GET', 200, tracker.start())
+    monkeypatch.setitem(app.extensions, 'memory', tracker)
+
+    assert client.get('/api/metrics/memory', headers=auth_headers(user)).status_code == 403
+    response = client.get('/api/metrics/memory', headers=auth_headers(admin))
+    assert response.status_code == 200
+    assert response.get_json()['endpoints']['api.get_pdf']['requests'] == 1
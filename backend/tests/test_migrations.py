@@ -0,0 +1,47 @@
+import os
+import pytest
+from flask_migrate import Migrate, upgrade
+from sqlalchemy import text
+from app import create_app
+from models import db
+from conftest import TestConfig
+
+@pytest.fixture
+def file_app(tmp_path):
+    """An app on its own SQLite file, for upgrading step by step."""
+    config = type('MigrationConfig', (TestConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'migrations.db'}",
+        'SQLALCHEMY_ENGINE_OPTIONS': {},
+    })
+    app = create_app(config)
+    Migrate(app, db, directory=os.path.join(app.root_path, 'migrations'))
+    return app
+
+def test_0003_merges_existing_duplicates(file_app):
+    with file_app.app_context():
+        upgrade(revision='0002')
+        with db.engine.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO pattern (id, brand, pattern_number, title, description, difficulty, "
+                "inventory_qty, updated_at) VALUES "
+                "(1, 'Simplicity', '1234', 't', 'Not specified', NULL, 1, '2024-01-01 00:00:00'), "
+                "(2, 'Simplicity', '1234', 't', 'Old', 'Hard', 3, '2024-01-02 00:00:00'), "
+                "(3, 'Simplicity', '1234', 't', 'New', NULL, NULL, '2024-01-03 00:00:00'), "
+                "(4, 'Simplicity', '9999', 't', NULL, NULL, NULL, NULL)"
+            ))
+            conn.execute(text(
+                "INSERT INTO pattern_pdf (id, pattern_id, category) VALUES (1, 2, 'Pieces'), (2, 3, 'Instructions')"
+            ))
+
+        upgrade(revision='0003')
+
+        with db.engine.connect() as conn:
+            patterns = conn.execute(text(
+                "SELECT id, description, difficulty, inventory_qty FROM pattern ORDER BY id"
+            )).all()
+            pdfs = conn.execute(text("SELECT pattern_id FROM pattern_pdf ORDER BY id")).scalars().all()
+        assert patterns == [(1, 'New', 'Hard', 3), (4, None, None, None)]
+        assert pdfs == [1, 1]
+
+        # And on to the current schema
+        upgrade()
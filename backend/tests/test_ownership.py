@@ -0,0 +1,66 @@
+import pytest
+from models import db, Pattern
+from conftest import make_user, auth_headers
+
+@pytest.fixture
+def collections(user, other_user):
+    """One pattern in sue's collection, one in bob's and one without an owner."""
+    patterns = [
+        Pattern(brand='Simplicity', pattern_number='1', title='t', size='6-14', difficulty='Easy', user_id=user.id),
+        Pattern(brand='Butterick', pattern_number='2', title='t', size='6-14', difficulty='Hard',
+                user_id=other_user.id),
+        Pattern(brand='McCall', pattern_number='3', title='t', size='6-14', difficulty='Hard'),
+    ]
+    db.session.add_all(patterns)
+    db.session.commit()
+    return [pattern.id for pattern in patterns]
+
+def ids(response):
+    assert response.status_code == 200
+    return [item['id'] for item in response.get_json()['items']]
+
+def test_list_covers_the_users_patterns(client, user, collections):
+    response = client.get('/api/patterns', headers=auth_headers(user))
+    assert ids(response) == [collections[0]]
+    assert response.get_json()['total'] == 1
+
+def test_stash_match_covers_the_users_patterns(client, user, collections):
+    assert ids(client.get('/api/patterns/stash-match?size=12', headers=auth_headers(user))) == [collections[0]]
+
+def test_facets_cover_the_users_patterns(client, user, collections):
+    response = client.get('/api/patterns/facets', headers=auth_headers(user))
+    assert response.get_json()['brand'] == [{'value': 'Simplicity', 'count': 1}]
+    response = client.get('/api/patterns/facets?size=12', headers=auth_headers(user))
+    assert response.get_json()['difficulty'] == [{'value': 'Easy', 'count': 1}]
+
+def test_other_patterns_are_not_found_by_id(client, user, collections):
+    theirs = collections[1]
+    headers = auth_headers(user)
+    assert client.get(f'/api/patterns/{theirs}', headers=headers).status_code == 404
+    assert client.put(f'/api/patterns/{theirs}', json={'title': 'mine'}, headers=headers).status_code == 404
+    assert client.delete(f'/api/patterns/{theirs}', headers=headers).status_code == 404
+    assert db.session.get(Pattern, theirs).title == 't'
+
+@pytest.mark.parametrize('url', ['/api/patterns', '/api/patterns/stash-match?size=12', '/api/patterns/facets',
+                                 '/api/patterns/changes'])
+@pytest.mark.parametrize('owner', ['all', '{other}'])
+def test_only_admins_see_other_collections(client, user, other_user, collections, url, owner):
+    separator = '&' if '?' in url else '?'
+    owner = owner.format(other=other_user.id)
+    response = client.get(f'{url}{separator}owner={owner}', headers=auth_headers(user))
+    assert response.status_code == 403
+
+def test_own_id_is_not_an_admin_request(client, user, collections):
+    assert ids(client.get(f'/api/patterns?owner={user.id}', headers=auth_headers(user))) == [collections[0]]
+
+def test_admins_choose_the_collection(client, collections):
+    admin = make_user('admin', is_admin=True)
+    headers = auth_headers(admin)
+    assert ids(client.get('/api/patterns?owner=all', headers=headers)) == collections
+    bob = db.session.get(Pattern, collections[1]).user_id
+    assert ids(client.get(f'/api/patterns?owner={bob}', headers=headers)) == [collections[1]]
+    # Their own, empty collection by default
+    assert ids(client.get('/api/patterns', headers=headers)) == []
+    assert client.get('/api/patterns?owner=nobody', headers=headers).status_code == 400
+    response = client.get('/api/patterns/facets?owner=all', headers=headers)
+    assert sum(item['count'] for item in response.get_json()['brand']) == 3
@@ -0,0 +1,79 @@
+import pytest
+from models import db, Pattern
+from pattern_store import upsert_pattern, is_unset, SOURCE_USER, SOURCE_SCRAPE
+
+def upsert(data, source=SOURCE_USER):
+    pattern, created = upsert_pattern(data, source)
+    db.session.commit()
+    return pattern, created
+
+def base(**fields):
+    return dict({'brand': 'Simplicity', 'pattern_number': '1234', 'title': 'Dress'}, **fields)
+
+def test_is_unset():
+    assert is_unset(None)
+    assert is_unset('  ')
+    assert is_unset('Not specified', SOURCE_SCRAPE)
+    assert not is_unset('Not specified', SOURCE_USER)
+    assert not is_unset(0)
+    assert not is_unset(False)
+
+def test_creates_then_updates_the_same_row(app_context, user):
+    pattern, created = upsert(base(user_id=user.id, size='6-14'))
+    assert created
+
+    again, created = upsert(base(user_id=user.id, size='16-24'))
+    assert not created
+    assert again.id == pattern.id
+    assert again.size == '16-24'
+    assert Pattern.query.count() == 1
+
+def test_user_source_keeps_fields_left_empty(app_context, user):
+    upsert(base(user_id=user.id, notes='lined', difficulty='Easy'))
+    pattern, _ = upsert(base(user_id=user.id, notes='', difficulty=None, title='New title'))
+    assert pattern.title == 'New title'
+    assert pattern.notes == 'lined'
+    assert pattern.difficulty == 'Easy'
+
+def test_scrape_only_fills_unset_and_placeholder_fields(app_context, user):
+    upsert(base(user_id=user.id, difficulty='Easy', description='Not specified'), SOURCE_SCRAPE)
+    pattern, _ = upsert(base(
+        user_id=user.id, title='Scraped title', difficulty='Hard',
+        description='A wrap dress', size='8-16'
+    ), SOURCE_SCRAPE)
+    # Existing data wins over scraped data...
+    assert pattern.title == 'Dress'
+    assert pattern.difficulty == 'Easy'
+    # ...but placeholders and empty fields are filled in
+    assert pattern.description == 'A wrap dress'
+    assert pattern.size == '8-16'
+
+def test_scrape_never_stores_placeholders_over_data(app_context, user):
+    upsert(base(user_id=user.id, description='Mine'))
+    pattern, _ = upsert(base(user_id=user.id, description='No description available'), SOURCE_SCRAPE)
+    assert pattern.description == 'Mine'
+
+def test_unchanged_upsert_leaves_updated_at_alone(app_context, user):
+    pattern, _ = upsert(base(user_id=user.id, size='10'))
+    updated_at = pattern.updated_at
+
+    again, created = upsert(base(user_id=user.id, size='10'))
+    assert not created
+    assert again.updated_at == updated_at
+
+def test_owners_have_separate_copies(app_context, user, other_user):
+    mine, _ = upsert(base(user_id=user.id, notes='mine'))
+    theirs, created = upsert(base(user_id=other_user.id, notes='theirs'))
+    unowned, _ = upsert(base(notes='nobody'))
+    assert created
+    assert len({mine.id, theirs.id, unowned.id}) == 3
+    assert db.session.get(Pattern, mine.id).notes == 'mine'
+
+def test_brand_and_number_are_required(app_context):
+    with pytest.raises(ValueError):
+        upsert_pattern({'brand': 'Simplicity', 'title': 'x'})
+
+def test_measurements_are_parsed(app_context, user):
+    pattern, _ = upsert(base(user_id=user.id, size='6-14', yardage='2 yds 45"'))
+    assert [r.key() for r in pattern.size_ranges] == [('size', 'numeric', 6, 14)]
+    assert [y.key() for y in pattern.yardages] == [(None, 2, 45)]
@@ -0,0 +1,40 @@
+from models import db, Pattern
+from conftest import auth_headers
+
+def add(user, number, **values):
+    pattern = Pattern(brand='Simplicity', pattern_number=number, title='t', user_id=user.id, **values)
+    db.session.add(pattern)
+    db.session.commit()
+    return pattern
+
+def put(client, user, pattern_id, body):
+    return client.put(f'/api/patterns/{pattern_id}', json=body, headers=auth_headers(user))
+
+def test_update_only_touches_editable_columns(client, user, other_user):
+    pattern = add(user, '1', image_data=b'image')
+    created_at = pattern.created_at
+    body = dict(pattern.to_dict(), title='New', inventory_qty='', id=999, created_at='2000-01-01',
+                image_data=None, user_id=other_user.id, has_image=False)
+    response = put(client, user, pattern.id, body)
+    assert response.status_code == 200
+    assert response.get_json()['title'] == 'New'
+
+    db.session.expire_all()
+    stored = db.session.get(Pattern, pattern.id)
+    assert (stored.title, stored.inventory_qty, stored.created_at) == ('New', None, created_at)
+    assert stored.image_data == b'image'
+    # Only admins move patterns between collections
+    assert stored.user_id == user.id
+
+def test_invalid_update_is_rejected(client, user):
+    pattern = add(user, '1')
+    assert put(client, user, pattern.id, {'inventory_qty': 'lots'}).status_code == 400
+    assert put(client, user, pattern.id, {'title': ''}).status_code == 400
+    assert put(client, user, pattern.id, ['title']).status_code == 400
+
+def test_update_onto_an_existing_pattern_conflicts(client, user):
+    add(user, '1')
+    pattern = add(user, '2')
+    response = put(client, user, pattern.id, {'pattern_number': '1'})
+    assert response.status_code == 409
+    assert put(client, user, pattern.id, {'pattern_number': '3'}).status_code == 200
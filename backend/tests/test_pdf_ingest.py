@@ -0,0 +1,18 @@
+import sys
+import types
+from pdf_ingest import ingest_pdf, upload_hash
+
+UPLOAD = b'%PDF-1.4 not really a pdf'
+
+def test_without_optimizing():
+    ingested = ingest_pdf(UPLOAD, optimize=False)
+    assert ingested.data == UPLOAD
+    assert ingested.upload_sha256 == upload_hash(UPLOAD)
+    assert ingested.original_size == ingested.stored_size == len(UPLOAD)
+
+def test_any_optimizer_failure_stores_the_upload(monkeypatch):
+    def fail(stream):
+        raise RuntimeError('qpdf gave up')
+    fake = types.SimpleNamespace(open=fail, PdfError=type('PdfError', (Exception,), {}))
+    monkeypatch.setitem(sys.modules, 'pikepdf', fake)
+    assert ingest_pdf(UPLOAD).data == UPLOAD
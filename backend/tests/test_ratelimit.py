@@ -0,0 +1,125 @@
+import socket
+import pytest
+from ratelimit import (TokenBucket, RateLimiter, RateLimits, Counter, parse_limit, client_key,
+                       read_listen_backlog)
+
+def test_parse_limit():
+    assert parse_limit('60/minute') == (1, 60)
+    assert parse_limit('10/second') == (10, 10)
+    with pytest.raises(ValueError):
+        parse_limit('10/fortnight')
+
+def test_token_bucket_refills_over_time():
+    bucket = TokenBucket(burst=2, now=0)
+    assert bucket.take(rate=1, burst=2, now=0) == 0
+    assert bucket.take(rate=1, burst=2, now=0) == 0
+    assert bucket.take(rate=1, burst=2, now=0) == pytest.approx(1)
+    assert bucket.take(rate=1, burst=2, now=0.5) == pytest.approx(0.5)
+    assert bucket.take(rate=1, burst=2, now=1.5) == 0
+    # Never holds more than burst
+    bucket = TokenBucket(burst=2, now=0)
+    for _ in range(2):
+        assert bucket.take(rate=1, burst=2, now=100) == 0
+    assert bucket.take(rate=1, burst=2, now=100) > 0
+
+def test_rate_limiter_keeps_clients_apart():
+    limiter = RateLimiter(rate=0.001, burst=1, max_clients=10)
+    assert limiter.take('a') == 0
+    assert limiter.take('a') > 0
+    assert limiter.take('b') == 0
+
+def test_rate_limiter_forgets_least_recent_clients():
+    limiter = RateLimiter(rate=0.001, burst=1, max_clients=2)
+    for key in ('a', 'b', 'c'):
+        limiter.take(key)
+    # 'a' was dropped, so it starts with a full bucket again
+    assert limiter.take('a') == 0
+    assert limiter.take('c') > 0
+
+def test_counter_cap():
+    counter = Counter(limit=1)
+    assert counter.acquire()
+    assert not counter.acquire()
+    counter.release()
+    assert counter.acquire()
+
+def test_client_key():
+    assert client_key('7', '10.0.0.1') == 'user:7'
+    assert client_key(None, '10.0.0.1') == 'ip:10.0.0.1'
+
+@pytest.fixture
+def limits_config():
+    return {
+        'RATE_LIMITS_ENABLED': True,
+        'RATE_LIMITS': {'auth': '1/minute', 'list': '100/minute', 'blob': '100/minute', 'image': '100/minute', 'scrape': '1/minute'},
+        'RATE_LIMIT_MAX_CLIENTS': 100,
+        'BLOB_MAX_CONCURRENT': 1,
+        'SHED_MAX_IN_FLIGHT': 2,
+        'SHED_LISTEN_PORT': 0,
+        'SHED_MAX_BACKLOG': 2,
+        'SHED_RETRY_AFTER': 3,
+    }
+
+def test_admit_rejects_over_the_limit(limits_config):
+    limits = RateLimits(limits_config)
+    assert limits.admit('auth', 'ip:1') is None
+    rejection = limits.admit('auth', 'ip:1')
+    assert rejection.status == 429
+    assert rejection.retry_after >= 1
+
+def test_images_have_their_own_bucket(limits_config):
+    limits = RateLimits(dict(limits_config, RATE_LIMITS=dict(limits_config['RATE_LIMITS'], blob='1/minute')))
+    assert limits.admit('blob', 'ip:1') is None
+    assert limits.admit('blob', 'ip:1').status == 429
+    # A gallery page's worth of images still loads
+    for _ in range(100):
+        assert limits.admit('image', 'ip:1') is None
+
+def test_blob_streams_are_capped(limits_config):
+    limits = RateLimits(limits_config)
+    assert limits.acquire_blob_stream() is None
+    assert limits.acquire_blob_stream().status == 503
+    limits.release_blob_stream()
+    assert limits.acquire_blob_stream() is None
+
+def test_disabled_limits_admit_everything(limits_config):
+    limits = RateLimits(dict(limits_config, RATE_LIMITS_ENABLED=False))
+    for _ in range(5):
+        assert limits.admit('auth', 'ip:1') is None
+
+def test_in_flight_requests_shed_sheddable_classes(limits_config):
+    limits = RateLimits(limits_config)
+    for _ in range(3):
+        limits.in_flight.acquire()
+    assert limits.admit('list', 'ip:1').status == 503
+    # Logins are never shed
+    assert limits.admit('auth', 'ip:1') is None
+
+def test_listen_backlog_sheds(limits_config):
+    limits = RateLimits(limits_config)
+    limits.backlog.enabled = True
+    limits.backlog._read_at = float('inf')
+    limits.backlog._value = 3
+    assert limits.admit('blob', 'ip:1').status == 503
+    limits.backlog._value = 2
+    assert limits.admit('blob', 'ip:1') is None
+
+def test_read_listen_backlog_counts_unaccepted_connections():
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen(16)
+    port = server.getsockname()[1]
+    if read_listen_backlog(port) is None:
+        pytest.skip('no /proc/net/tcp')
+    clients = [socket.create_connection(('127.0.0.1', port)) for _ in range(3)]
+    try:
+        assert read_listen_backlog(port) == 3
+        server.accept()[0].close()
+        assert read_listen_backlog(port) == 2
+    finally:
+        for client in clients:
+            client.close()
+        server.close()
+
+def test_read_listen_backlog_without_proc(tmp_path):
+    assert read_listen_backlog(5000, paths=(str(tmp_path / 'missing'),)) is None
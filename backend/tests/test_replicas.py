@@ -0,0 +1,94 @@
+import os
+import shutil
+import pytest
+from flask_migrate import Migrate, upgrade
+from app import create_app
+from models import db, Pattern
+from conftest import TestConfig, make_user, auth_headers
+
+@pytest.fixture
+def replicated(tmp_path):
+    """An app with a primary and one replica, each its own SQLite file.
+
+    The replica is a copy of the primary taken after a user was added;
+    rows written afterwards only exist on the primary, like a lagging
+    replica.
+    """
+    primary, replica = tmp_path / 'primary.db', tmp_path / 'replica.db'
+    config = type('ReplicatedConfig', (TestConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{primary}',
+        'SQLALCHEMY_ENGINE_OPTIONS': {},
+        'SQLALCHEMY_REPLICA_URIS': [f'sqlite:///{replica}'],
+        'SQLALCHEMY_BINDS': {'replica_0': f'sqlite:///{replica}'},
+    })
+    app = create_app(config)
+    Migrate(app, db, directory=os.path.join(app.root_path, 'migrations'))
+    with app.app_context():
+        upgrade()
+        user = make_user('sue')
+        headers = auth_headers(user)
+        db.session.remove()
+        db.engine.dispose()
+        shutil.copy(primary, replica)
+        db.session.add(Pattern(brand='Simplicity', pattern_number='1', title='t', user_id=user.id))
+        db.session.commit()
+        db.session.remove()
+    return app, headers
+
+def test_reads_go_to_the_replica(replicated):
+    app, headers = replicated
+    response = app.test_client().get('/api/patterns', headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['items'] == []
+
+def test_changes_feed_reads_from_the_primary(replicated):
+    app, headers = replicated
+    response = app.test_client().get('/api/patterns/changes', headers=headers)
+    assert response.status_code == 200
+    assert [item['pattern_number'] for item in response.get_json()['changes']] == ['1']
+
+def listed(client, headers):
+    response = client.get('/api/patterns', headers=headers)
+    assert response.status_code == 200
+    return [item['pattern_number'] for item in response.get_json()['items']]
+
+def test_writer_reads_from_the_primary_afterwards(replicated):
+    app, headers = replicated
+    client = app.test_client()
+    response = client.post('/api/patterns', json={'brand': 'Simplicity', 'pattern_number': '2', 'title': 't'},
+                           headers=headers)
+    assert response.status_code == 201
+    assert 'read_primary_until' in response.headers['Set-Cookie']
+    assert listed(client, headers) == ['1', '2']
+
+def test_stickiness_is_remembered_in_process(replicated):
+    app, headers = replicated
+    app.test_client().post('/api/patterns', json={'brand': 'Simplicity', 'pattern_number': '2', 'title': 't'},
+                           headers=headers)
+    # A client without the cookie, e.g. another origin
+    assert listed(app.test_client(), headers) == ['1', '2']
+
+def test_stickiness_is_remembered_in_the_cookie(replicated):
+    app, headers = replicated
+    client = app.test_client()
+    client.post('/api/patterns', json={'brand': 'Simplicity', 'pattern_number': '2', 'title': 't'},
+                headers=headers)
+    # Another worker, which never saw the write
+    app.extensions['replicas']._sticky.clear()
+    assert listed(client, headers) == ['1', '2']
+    client.delete_cookie('localhost', 'read_primary_until')
+    assert listed(client, headers) == []
+
+def test_failed_writes_do_not_stick(replicated):
+    app, headers = replicated
+    client = app.test_client()
+    response = client.post('/api/patterns', json={'brand': 'Simplicity'}, headers=headers)
+    assert response.status_code == 400
+    assert 'Set-Cookie' not in response.headers
+    assert listed(client, headers) == []
+
+def test_lagging_replica_is_skipped(replicated, monkeypatch):
+    app, headers = replicated
+    replicas = app.extensions['replicas']
+    monkeypatch.setattr(replicas, 'lag', lambda key: replicas.max_lag + 1)
+    assert listed(app.test_client(), headers) == ['1']
@@ -0,0 +1,116 @@
+import io
+import json
+import struct
+from collections import namedtuple
+from datetime import datetime
+import pytest
+import pattern_store
+from models import db, Pattern, PatternThumbnail
+from pattern_store import upsert_pattern, SOURCE_SCRAPE
+import app as app_module
+from thumbnails import pack_thumbnails, thumbnails_etag, THUMBNAIL_MIMETYPE
+from conftest import auth_headers
+
+Row = namedtuple('Row', ['pattern_id', 'data', 'width', 'height'])
+
+def unpack(body):
+    """Split a packed response into its index and {id: image bytes}."""
+    (length,) = struct.unpack('>I', body[:4])
+    index = json.loads(body[4:4 + length])
+    data = body[4 + length:]
+    return index, {item['id']: data[item['offset']:item['offset'] + item['length']] for item in index['items']}
+
+def test_pack_keeps_the_requested_order():
+    rows = [Row(1, b'one', 10, 20), Row(2, b'second', 30, 40)]
+    index, images = unpack(pack_thumbnails([2, 3, 1], rows))
+    assert index['mimetype'] == THUMBNAIL_MIMETYPE
+    assert [item['id'] for item in index['items']] == [2, 1]
+    assert index['items'][0] == {'id': 2, 'offset': 0, 'length': 6, 'width': 30, 'height': 40}
+    assert index['missing'] == [3]
+    assert images == {1: b'one', 2: b'second'}
+
+def test_pack_nothing_found():
+    index, images = unpack(pack_thumbnails([5], []))
+    assert index == {'mimetype': THUMBNAIL_MIMETYPE, 'items': [], 'missing': [5]}
+    assert images == {}
+
+def jpeg(size):
+    Image = pytest.importorskip('PIL.Image')
+    out = io.BytesIO()
+    Image.new('RGB', size, 'red').save(out, 'JPEG')
+    return out.getvalue()
+
+def test_storing_an_image_makes_a_thumbnail(app_context, user):
+    pattern = Pattern(brand='Simplicity', pattern_number='1', title='t', user_id=user.id,
+                      image_data=jpeg((1200, 600)))
+    db.session.add(pattern)
+    db.session.commit()
+    thumbnail = db.session.get(PatternThumbnail, pattern.id)
+    assert (thumbnail.width, thumbnail.height) == (320, 160)
+
+    pattern.image_data = None
+    db.session.commit()
+    assert db.session.get(PatternThumbnail, pattern.id) is None
+
+def test_endpoint_is_scoped_to_the_user(client, user, other_user):
+    mine = Pattern(brand='Simplicity', pattern_number='1', title='t', user_id=user.id, image_data=jpeg((100, 100)))
+    theirs = Pattern(brand='Simplicity', pattern_number='2', title='t', user_id=other_user.id,
+                     image_data=jpeg((100, 100)))
+    db.session.add_all([mine, theirs])
+    db.session.commit()
+
+    response = client.get(f'/api/patterns/thumbnails?ids={theirs.id},{mine.id}', headers=auth_headers(user))
+    assert response.status_code == 200
+    index, images = unpack(response.data)
+    assert list(images) == [mine.id]
+    assert index['missing'] == [theirs.id]
+
+    cached = client.get(f'/api/patterns/thumbnails?ids={theirs.id},{mine.id}',
+                        headers=dict(auth_headers(user), **{'If-None-Match': response.headers['ETag']}))
+    assert cached.status_code == 304
+
+def test_etag_follows_the_thumbnails():
+    made = datetime(2026, 1, 1)
+    etag = thumbnails_etag([1, 2], [(1, made)])
+    assert thumbnails_etag([1, 2], [(1, made)]) == etag
+    assert thumbnails_etag([2, 1], [(1, made)]) != etag
+    assert thumbnails_etag([1, 2], [(1, made), (2, made)]) != etag
+    assert thumbnails_etag([1, 2], [(1, made.replace(second=1))]) != etag
+
+def test_revalidation_skips_the_thumbnail_data(client, user, monkeypatch):
+    pattern = Pattern(brand='Simplicity', pattern_number='1', title='t', user_id=user.id,
+                      image_data=jpeg((100, 100)))
+    db.session.add(pattern)
+    db.session.commit()
+    url = f'/api/patterns/thumbnails?ids={pattern.id}'
+    etag = client.get(url, headers=auth_headers(user)).headers['ETag']
+
+    def unread(query):
+        raise AssertionError('thumbnail data read for a 304')
+    monkeypatch.setattr(app_module, 'thumbnail_rows', unread)
+    response = client.get(url, headers=dict(auth_headers(user), **{'If-None-Match': etag}))
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    monkeypatch.undo()
+
+    # A new image means a new thumbnail and a new ETag
+    pattern.image_data = jpeg((200, 100))
+    db.session.commit()
+    response = client.get(url, headers=dict(auth_headers(user), **{'If-None-Match': etag}))
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+def test_upserts_only_remake_thumbnails_for_stored_images(app_context, user, monkeypatch):
+    refreshed = []
+    monkeypatch.setattr(pattern_store, 'refresh_thumbnail', lambda pattern: refreshed.append(pattern.id))
+    data = {'brand': 'Simplicity', 'pattern_number': '1', 'title': 't', 'user_id': user.id}
+
+    pattern, _ = upsert_pattern(dict(data, image_data=jpeg((100, 100))))
+    assert refreshed == [pattern.id]
+
+    # The scrape fills the description but keeps the user's image
+    upsert_pattern(dict(data, description='Dress', image_data=jpeg((50, 50))), SOURCE_SCRAPE)
+    assert refreshed == [pattern.id]
+
+    upsert_pattern(dict(data, image_data=jpeg((50, 50))))
+    assert refreshed == [pattern.id, pattern.id]
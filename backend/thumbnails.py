@@ -0,0 +1,179 @@
+"""
+Gallery thumbnails.
+
+Whenever a pattern's image_data is stored, a small JPEG of it is kept in
+pattern_thumbnail (longest side THUMBNAIL_SIZE). The gallery fetches the
+thumbnails of a whole page with one request and one query:
+
+    GET /api/patterns/thumbnails?ids=1,2,3
+
+The response (application/octet-stream) is packed as:
+
+    4 bytes   length N of the index, unsigned big-endian
+    N bytes   the index, UTF-8 JSON:
+              {"mimetype": "image/jpeg",
+               "items": [{"id", "offset", "length", "width", "height"}, ...],
+               "missing": [ids without a thumbnail the user may see]}
+    ...       the thumbnails back to back; offsets count from the end of
+              the index
+
+so a client slices each image out of the body (a Blob per item) without
+parsing anything else. Patterns listed as missing fall back to image_url.
+
+The ETag is built from the requested ids and their thumbnails' created_at
+(thumbnails_etag()), so a revalidation answered with 304 never reads the
+thumbnail data.
+
+Pillow is optional; without it no thumbnails are made and every id comes
+back as missing. `flask backfill-thumbnails` makes them for images stored
+earlier.
+"""
+import hashlib
+import io
+import json
+import logging
+import struct
+from datetime import datetime
+from flask import current_app
+from flask_sqlalchemy.session import Session
+from models import db, Pattern, PatternThumbnail
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_MIMETYPE = 'image/jpeg'
+
+# Prefix of a packed response holding the index length
+INDEX_LENGTH = struct.Struct('>I')
+
+def make_thumbnail(data, size, quality):
+    """
+    Scale an image down to fit a size x size box.
+
+    Args:
+        data (bytes): The stored image
+        size (int): Longest side of the thumbnail in pixels
+        quality (int): JPEG quality
+
+    Returns:
+        tuple: (JPEG bytes, width, height), or None if Pillow is missing
+            or can't read the image
+    """
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        logger.info("Pillow is not installed, not making a thumbnail")
+        return None
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            # Lets the JPEG decoder scale down while decoding
+            image.draft('RGB', (size, size))
+            image = ImageOps.exif_transpose(image)
+            if image.mode in ('RGBA', 'LA', 'P'):
+                image = image.convert('RGBA')
+                background = Image.new('RGB', image.size, 'white')
+                background.paste(image, mask=image.getchannel('A'))
+                image = background
+            elif image.mode != 'RGB':
+                image = image.convert('RGB')
+            image.thumbnail((size, size), Image.LANCZOS)
+
+            out = io.BytesIO()
+            image.save(out, 'JPEG', quality=quality, optimize=True)
+            return out.getvalue(), image.width, image.height
+    except Exception as e:
+        logger.warning("Could not make a thumbnail: %s", e)
+        return None
+
+def refresh_thumbnail(pattern):
+    """Make pattern's thumbnail match its image_data (none without one)."""
+    thumbnail = None
+    if pattern.image_data:
+        thumbnail = make_thumbnail(
+            pattern.image_data,
+            current_app.config['THUMBNAIL_SIZE'],
+            current_app.config['THUMBNAIL_QUALITY']
+        )
+
+    if thumbnail is None:
+        pattern.thumbnail = None
+        return
+    data, width, height = thumbnail
+    if pattern.thumbnail is None:
+        pattern.thumbnail = PatternThumbnail()
+    pattern.thumbnail.data = data
+    pattern.thumbnail.width = width
+    pattern.thumbnail.height = height
+    # Set explicitly: replacing a thumbnail is an UPDATE, and the ETag of
+    # cached batches is built from it (thumbnails_etag())
+    pattern.thumbnail.created_at = datetime.utcnow()
+
+@db.event.listens_for(Session, 'before_flush')
+def sync_thumbnails(session, flush_context, instances):
+    """Remake thumbnails of patterns whose image_data was set.
+
+    Covers ORM writes; upsert_pattern() calls refresh_thumbnail() itself.
+    """
+    with session.no_autoflush:
+        for obj in list(session.new) + list(session.dirty):
+            if not isinstance(obj, Pattern) or obj in session.deleted:
+                continue
+            if db.inspect(obj).attrs.image_data.history.has_changes():
+                refresh_thumbnail(obj)
+
+def thumbnail_versions(query):
+    """(pattern_id, created_at) of the thumbnails of the patterns query selects."""
+    return query.join(PatternThumbnail, PatternThumbnail.pattern_id == Pattern.id).with_entities(
+        PatternThumbnail.pattern_id, PatternThumbnail.created_at
+    ).all()
+
+def thumbnails_etag(ids, versions):
+    """ETag of the packed response for ids, from thumbnail_versions() rows.
+
+    Changes when a requested thumbnail is made, replaced or removed, or
+    the user's access to one changes.
+    """
+    made = {pattern_id: created_at for pattern_id, created_at in versions}
+    parts = [f"{pattern_id}:{made[pattern_id].isoformat() if pattern_id in made else '-'}" for pattern_id in ids]
+    return hashlib.sha256(','.join(parts).encode()).hexdigest()[:32]
+
+def thumbnail_rows(query):
+    """(pattern_id, data, width, height) of the thumbnails of the patterns
+    query selects, in a single query."""
+    return query.join(PatternThumbnail, PatternThumbnail.pattern_id == Pattern.id).with_entities(
+        PatternThumbnail.pattern_id, PatternThumbnail.data, PatternThumbnail.width,
+        PatternThumbnail.height
+    ).all()
+
+def pack_thumbnails(ids, rows):
+    """
+    Pack thumbnails into one response body.
+
+    Args:
+        ids (list): Requested pattern ids, in the order to pack them
+        rows: Rows from thumbnail_rows()
+
+    Returns:
+        bytes: The packed body, see the module docstring
+    """
+    found = {row.pattern_id: row for row in rows}
+    items, offset = [], 0
+    for pattern_id in ids:
+        row = found.get(pattern_id)
+        if row is None:
+            continue
+        items.append({
+            'id': pattern_id,
+            'offset': offset,
+            'length': len(row.data),
+            'width': row.width,
+            'height': row.height
+        })
+        offset += len(row.data)
+
+    index = json.dumps({
+        'mimetype': THUMBNAIL_MIMETYPE,
+        'items': items,
+        'missing': [pattern_id for pattern_id in ids if pattern_id not in found]
+    }, separators=(',', ':')).encode('utf-8')
+    return b''.join([INDEX_LENGTH.pack(len(index)), index] + [found[item['id']].data for item in items])
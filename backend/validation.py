@@ -21,6 +21,11 @@ class PatternSchema(Schema):
     notions = fields.Str(allow_none=True)
     notes = fields.Str(allow_none=True)
 
+class PatternUpdateSchema(PatternSchema):
+    """Schema for validating pattern edits (load with partial=True)."""
+    image = fields.Str(allow_none=True, validate=validate.Length(max=500))
+    user_id = fields.Int(allow_none=True)
+
 class PatternPDFSchema(Schema):
     """Schema for validating pattern PDF data."""
     pattern_id = fields.Int(required=True)
@@ -35,9 +40,27 @@ class PatternQuerySchema(Schema):
     title = fields.Str(allow_none=True)
     difficulty = fields.Str(allow_none=True)
     item_type = fields.Str(allow_none=True)
+    format = fields.Str(allow_none=True)
+    cut_status = fields.Str(allow_none=True)
     cosplay_hackable = fields.Bool(allow_none=True)
     
 class ScrapeQuerySchema(Schema):
     """Schema for validating pattern scraping query parameters."""
     brand = fields.Str(required=True)
     pattern_number = fields.Str(required=True)
+
+class PatternBatchSchema(Schema):
+    """Schema for validating batch pattern fetch requests."""
+    ids = fields.List(fields.Int(), required=True, validate=validate.Length(min=1))
+    fields = fields.List(fields.Str(), allow_none=True)
+
+class ThumbnailBatchSchema(Schema):
+    """Schema for validating batch thumbnail requests."""
+    ids = fields.List(fields.Int(), required=True, validate=validate.Length(min=1))
+
+class StashMatchQuerySchema(Schema):
+    """Schema for validating stash-match query parameters."""
+    size = fields.Str(allow_none=True)
+    size_field = fields.Str(load_default='size', validate=validate.OneOf(['size', 'cut_size']))
+    width = fields.Float(allow_none=True, validate=validate.Range(min=1))
+    max_yards = fields.Float(allow_none=True, validate=validate.Range(min=0))
@@ -0,0 +1,539 @@
+#!/usr/bin/env python3
+"""
+Backups for the Sewing Patterns database.
+
+Each backup is a directory holding:
+  dump/             parallel, compressed directory-format pg_dump of
+                    everything except the pattern and pattern_pdf rows
+  <table>.csv.gz    those rows without their image/PDF blobs, with the
+                    SHA-256 of each blob in its place
+  manifest.json     timings, sizes, row counts and referenced blobs
+
+Blobs are stored once, by content hash, in <backup dir>/blobs, so each run
+only copies blobs that are new since the last one. Every run appends a
+summary line to <backup dir>/manifest.jsonl.
+
+All tables are dumped from one exported snapshot, so the dump, the CSVs
+and the blobs are consistent with each other.
+
+Usage:
+    backup_db.py [backup]            take a backup and prune old ones
+    backup_db.py verify [NAME]       restore a backup (default: latest) into
+                                     a scratch database and check it
+    backup_db.py restore NAME DBNAME restore a backup into a new database
+
+By default the PostgreSQL tools run inside the database container with
+`docker exec`; the container sees the backup directory at
+--container-backup-dir (the ./backups volume in docker-compose.yml).
+"""
+import argparse
+import base64
+import csv
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Blob column of each table whose rows are exported separately
+BLOB_COLUMNS = {
+    'pattern': 'image_data',
+    'pattern_pdf': 'pdf_data',
+}
+
+# Tables with identity sequences to move past the restored rows
+SEQUENCE_TABLES = ('pattern', 'pattern_pdf')
+
+# NULL marker in the exported CSVs
+NULL = '\\N'
+
+# Age after which an unfinished backup directory is taken to be abandoned
+STALE_PARTIAL_SECONDS = 24 * 60 * 60
+
+class Postgres:
+    """Runs the PostgreSQL client tools, in the database container unless container is None."""
+
+    def __init__(self, container, user, dbname):
+        self.container = container
+        self.user = user
+        self.dbname = dbname
+
+    def command(self, *args, interactive=False):
+        prefix = []
+        if self.container:
+            prefix = ['docker', 'exec'] + (['-i'] if interactive else []) + [self.container]
+        return prefix + list(args)
+
+    def run(self, *args):
+        subprocess.run(self.command(*args), check=True)
+
+    def psql_args(self, sql_commands, dbname=None, snapshot=None):
+        """psql arguments running sql_commands in one session, optionally in a snapshot."""
+        args = ['psql', '-U', self.user, '-d', dbname or self.dbname,
+                '-v', 'ON_ERROR_STOP=1', '-X', '-q', '-A', '-t', '-F', '\t']
+        if snapshot:
+            sql_commands = ['BEGIN ISOLATION LEVEL REPEATABLE READ',
+                            f"SET TRANSACTION SNAPSHOT '{snapshot}'",
+                            *sql_commands, 'COMMIT']
+        for sql in sql_commands:
+            args += ['-c', sql]
+        return args
+
+    def query(self, sql, dbname=None, snapshot=None):
+        """Run a query and return its rows as lists of strings."""
+        result = subprocess.run(
+            self.command(*self.psql_args([sql], dbname, snapshot)),
+            check=True, capture_output=True, text=True
+        )
+        return [line.split('\t') for line in result.stdout.splitlines() if line]
+
+    @contextmanager
+    def copy_out(self, sql, snapshot=None, options=None):
+        """Yield a text stream with the output of COPY (sql) TO STDOUT."""
+        copy = f"COPY ({sql}) TO STDOUT" + (f" WITH ({options})" if options else "")
+        process = subprocess.Popen(
+            self.command(*self.psql_args([copy], snapshot=snapshot)),
+            stdout=subprocess.PIPE, text=True
+        )
+        try:
+            yield process.stdout
+        finally:
+            process.stdout.close()
+            if process.wait() != 0:
+                raise subprocess.CalledProcessError(process.returncode, 'psql COPY')
+
+    @contextmanager
+    def script(self, dbname):
+        """Yield a writable stream executed by psql as a single transaction."""
+        process = subprocess.Popen(
+            self.command('psql', '-U', self.user, '-d', dbname, '-v', 'ON_ERROR_STOP=1',
+                         '-X', '-q', '-1', interactive=True),
+            stdin=subprocess.PIPE, text=True
+        )
+        try:
+            yield process.stdin
+        finally:
+            process.stdin.close()
+            if process.wait() != 0:
+                raise subprocess.CalledProcessError(process.returncode, 'psql script')
+
+    @contextmanager
+    def exported_snapshot(self):
+        """Hold a repeatable-read transaction open and yield its snapshot id."""
+        process = subprocess.Popen(
+            self.command('psql', '-U', self.user, '-d', self.dbname, '-X', '-q', '-A', '-t',
+                         interactive=True),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+        )
+        try:
+            process.stdin.write("BEGIN ISOLATION LEVEL REPEATABLE READ;\nSELECT pg_export_snapshot();\n")
+            process.stdin.flush()
+            yield process.stdout.readline().strip()
+        finally:
+            process.stdin.write("COMMIT;\n")
+            process.stdin.close()
+            process.wait()
+
+class BlobStore:
+    """Content-addressed blob files: blobs/ab/abcdef..."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def has(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def put(self, digest, data):
+        """Store data under its digest after checking it; returns its size."""
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Blob content does not match its hash {digest}")
+        path = self.path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = path + '.partial'
+        with open(partial, 'wb') as f:
+            f.write(data)
+        os.replace(partial, path)
+        return len(data)
+
+    def get(self, digest):
+        with open(self.path(digest), 'rb') as f:
+            return f.read()
+
+    def prune(self, keep):
+        """Delete blobs whose digest is not in keep; returns (count, bytes)."""
+        removed, removed_bytes = 0, 0
+        if not os.path.isdir(self.root):
+            return removed, removed_bytes
+        for prefix in os.listdir(self.root):
+            folder = os.path.join(self.root, prefix)
+            for digest in os.listdir(folder):
+                if digest not in keep:
+                    path = os.path.join(folder, digest)
+                    removed_bytes += os.path.getsize(path)
+                    os.remove(path)
+                    removed += 1
+        return removed, removed_bytes
+
+def directory_size(path):
+    total = 0
+    for folder, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(folder, name)) for name in files)
+    return total
+
+@contextmanager
+def timed(manifest, step):
+    """Record how long a step took in manifest['timings']."""
+    start = time.monotonic()
+    yield
+    manifest['timings'][step] = round(time.monotonic() - start, 3)
+
+def append_log(backup_dir, entry):
+    """Append a one-line summary to manifest.jsonl."""
+    with open(os.path.join(backup_dir, 'manifest.jsonl'), 'a') as f:
+        f.write(json.dumps(entry) + '\n')
+
+def write_manifest(path, manifest):
+    with open(os.path.join(path, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+def read_manifest(path):
+    with open(os.path.join(path, 'manifest.json')) as f:
+        return json.load(f)
+
+def list_backups(backup_dir):
+    """Names of completed backups, oldest first."""
+    names = []
+    for name in sorted(os.listdir(backup_dir)):
+        manifest = os.path.join(backup_dir, name, 'manifest.json')
+        if name.startswith('sewing_patterns_') and os.path.exists(manifest):
+            if read_manifest(os.path.join(backup_dir, name)).get('status') == 'ok':
+                names.append(name)
+    return names
+
+def legacy_backups(backup_dir):
+    """Names of plain SQL dumps left by the old backup_db.sh, oldest first."""
+    return sorted(name for name in os.listdir(backup_dir)
+                  if name.startswith('sewing_patterns_') and name.endswith('.sql'))
+
+def partial_name(name):
+    """Directory a backup is written to until it is complete."""
+    return f".{name}.partial"
+
+def table_columns(pg, table, snapshot):
+    rows = pg.query(
+        "SELECT column_name FROM information_schema.columns "
+        f"WHERE table_schema = 'public' AND table_name = '{table}' ORDER BY ordinal_position",
+        snapshot=snapshot
+    )
+    return [row[0] for row in rows]
+
+def export_rows(pg, path, table, blob_column, snapshot):
+    """Write a table's rows without the blob column to <table>.csv.gz.
+
+    The last CSV column holds the blob's SHA-256. Returns (row count,
+    {digest: row id}) for the blobs referenced.
+    """
+    columns = [c for c in table_columns(pg, table, snapshot) if c != blob_column]
+    sql = (f"SELECT {', '.join(columns)}, encode(sha256({blob_column}), 'hex') AS {blob_column}_sha256 "
+           f"FROM {table} ORDER BY id")
+    csv_path = os.path.join(path, f"{table}.csv.gz")
+    with gzip.open(csv_path, 'wt', newline='') as out:
+        with pg.copy_out(sql, snapshot=snapshot, options=f"FORMAT csv, HEADER, NULL '{NULL}'") as stream:
+            shutil.copyfileobj(stream, out)
+
+    rows, digests = 0, {}
+    id_index = columns.index('id')
+    for row in read_rows(csv_path):
+        rows += 1
+        if row[-1] != NULL:
+            digests.setdefault(row[-1], int(row[id_index]))
+    return rows, digests
+
+def read_rows(csv_path):
+    """Yield the data rows of an exported <table>.csv.gz."""
+    with gzip.open(csv_path, 'rt', newline='') as f:
+        reader = csv.reader(f)
+        next(reader)
+        yield from reader
+
+def fetch_blobs(pg, store, table, blob_column, wanted, snapshot):
+    """Copy blobs missing from the store in one streaming query; returns (count, bytes)."""
+    missing = sorted({row_id for digest, row_id in wanted.items() if not store.has(digest)})
+    if not missing:
+        return 0, 0
+    sql = (f"SELECT encode(sha256({blob_column}), 'hex'), "
+           f"translate(encode({blob_column}, 'base64'), E'\\n', '') "
+           f"FROM {table} WHERE id IN ({', '.join(map(str, missing))})")
+    count, size = 0, 0
+    with pg.copy_out(sql, snapshot=snapshot) as stream:
+        for line in stream:
+            digest, encoded = line.rstrip('\n').split('\t')
+            if store.has(digest):
+                continue
+            size += store.put(digest, base64.b64decode(encoded))
+            count += 1
+    return count, size
+
+def take_backup(args, pg):
+    name = f"sewing_patterns_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}"
+    # Written under a temporary name and renamed once complete, so a failed
+    # or interrupted run never leaves a directory that looks like a backup
+    path = os.path.join(args.backup_dir, partial_name(name))
+    os.makedirs(path)
+    store = BlobStore(os.path.join(args.backup_dir, 'blobs'))
+    manifest = {
+        'name': name,
+        'status': 'running',
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'timings': {},
+        'tables': {},
+    }
+
+    try:
+        with pg.exported_snapshot() as snapshot:
+            with timed(manifest, 'pg_dump'):
+                excluded = [f"--exclude-table-data={table}" for table in BLOB_COLUMNS]
+                pg.run('pg_dump', '-U', args.user, '-d', args.dbname, '-Fd',
+                       '-j', str(args.jobs), '-Z', str(args.compress),
+                       f"--snapshot={snapshot}", *excluded,
+                       '-f', f"{args.container_backup_dir.rstrip('/')}/{partial_name(name)}/dump")
+
+            with timed(manifest, 'row_counts'):
+                counts = pg.query(
+                    "SELECT string_agg(format('SELECT %L, count(*) FROM %I', table_name, table_name), "
+                    "' UNION ALL ') FROM information_schema.tables "
+                    "WHERE table_schema = 'public' AND table_type = 'BASE TABLE'",
+                    snapshot=snapshot
+                )[0][0]
+                for table, count in pg.query(counts, snapshot=snapshot):
+                    manifest['tables'][table] = {'rows': int(count)}
+
+            referenced = set()
+            new_blobs, new_blob_bytes = 0, 0
+            for table, blob_column in BLOB_COLUMNS.items():
+                with timed(manifest, f"export_{table}"):
+                    rows, digests = export_rows(pg, path, table, blob_column, snapshot)
+                    manifest['tables'][table]['exported_rows'] = rows
+                    manifest['tables'][table]['blobs'] = len(digests)
+                with timed(manifest, f"blobs_{table}"):
+                    count, size = fetch_blobs(pg, store, table, blob_column, digests, snapshot)
+                    new_blobs += count
+                    new_blob_bytes += size
+                referenced.update(digests)
+
+        manifest['blobs'] = sorted(referenced)
+        manifest['sizes'] = {
+            'dump_bytes': directory_size(os.path.join(path, 'dump')),
+            'rows_bytes': sum(os.path.getsize(os.path.join(path, f"{t}.csv.gz")) for t in BLOB_COLUMNS),
+            'new_blobs': new_blobs,
+            'new_blob_bytes': new_blob_bytes,
+            'referenced_blob_bytes': sum(os.path.getsize(store.path(d)) for d in referenced),
+        }
+        manifest['status'] = 'ok'
+    except BaseException as e:
+        manifest['status'] = 'failed'
+        manifest['error'] = str(e) or type(e).__name__
+        raise
+    finally:
+        manifest['finished_at'] = datetime.now().isoformat(timespec='seconds')
+        append_log(args.backup_dir, {key: manifest[key] for key in manifest if key != 'blobs'})
+        if manifest['status'] == 'ok':
+            write_manifest(path, manifest)
+        else:
+            # Blobs already copied stay in the store; the next prune drops
+            # them if no backup references them
+            shutil.rmtree(path, ignore_errors=True)
+
+    final_path = os.path.join(args.backup_dir, name)
+    os.rename(path, final_path)
+    prune(args, store)
+    print(f"Backup completed: {final_path} "
+          f"({manifest['sizes']['new_blobs']} new blobs, {sum(manifest['timings'].values()):.1f}s)")
+    return name
+
+def prune(args, store):
+    """Keep the newest args.keep backups and the blobs they reference.
+
+    Plain SQL dumps from the old backup_db.sh count towards args.keep, so
+    they age out as new backups are taken. Directories left for a day by
+    runs that were killed before they could clean up are removed.
+    """
+    # Both kinds of name are sewing_patterns_<timestamp>, so they sort by age
+    names = sorted(list_backups(args.backup_dir) + legacy_backups(args.backup_dir))
+    for name in names[:-args.keep] if args.keep else []:
+        path = os.path.join(args.backup_dir, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    for name in os.listdir(args.backup_dir):
+        path = os.path.join(args.backup_dir, name)
+        if (name.startswith('.sewing_patterns_') and name.endswith('.partial')
+                and time.time() - os.path.getmtime(path) > STALE_PARTIAL_SECONDS):
+            shutil.rmtree(path, ignore_errors=True)
+    keep = set()
+    for name in list_backups(args.backup_dir):
+        keep.update(read_manifest(os.path.join(args.backup_dir, name)).get('blobs', []))
+    removed, removed_bytes = store.prune(keep)
+    if removed:
+        print(f"Pruned {removed} unreferenced blobs ({removed_bytes} bytes)")
+
+def load_rows(script, store, path, table, blob_column):
+    """Write COPY statements restoring a table's rows and blobs to a psql script."""
+    csv_path = os.path.join(path, f"{table}.csv.gz")
+    with gzip.open(csv_path, 'rt', newline='') as f:
+        header = next(csv.reader(f))
+    columns = header[:-1]
+    digest_column = header[-1]
+    digests = {row[-1] for row in read_rows(csv_path) if row[-1] != NULL}
+
+    script.write(f"CREATE TEMP TABLE {table}_stage AS SELECT {', '.join(columns)} FROM {table} WITH NO DATA;\n")
+    script.write(f"ALTER TABLE {table}_stage ADD COLUMN {digest_column} text;\n")
+    script.write(f"COPY {table}_stage FROM STDIN WITH (FORMAT csv, HEADER, NULL '{NULL}');\n")
+    with gzip.open(csv_path, 'rt', newline='') as f:
+        shutil.copyfileobj(f, script)
+    script.write("\\.\n")
+
+    # Base64 never contains tabs or backslashes, so COPY's text format takes it as is
+    script.write(f"CREATE TEMP TABLE {table}_blobs (digest text PRIMARY KEY, data text);\n")
+    script.write(f"COPY {table}_blobs (digest, data) FROM STDIN;\n")
+    for digest in sorted(digests):
+        script.write(f"{digest}\t{base64.b64encode(store.get(digest)).decode()}\n")
+    script.write("\\.\n")
+
+    script.write(
+        f"INSERT INTO {table} ({', '.join(columns)}, {blob_column}) "
+        f"SELECT {', '.join('s.' + c for c in columns)}, decode(b.data, 'base64') "
+        f"FROM {table}_stage s LEFT JOIN {table}_blobs b ON b.digest = s.{digest_column};\n"
+    )
+
+def restore(args, pg, name, target):
+    """Restore backup name into a new database called target."""
+    path = os.path.join(args.backup_dir, name)
+    store = BlobStore(os.path.join(args.backup_dir, 'blobs'))
+    timings = {}
+
+    dump = f"{args.container_backup_dir.rstrip('/')}/{name}/dump"
+    pg.run('createdb', '-U', args.user, target)
+
+    # Tables first, then the exported rows, then the rest of the data: the
+    # rows go in before any foreign key or trigger exists, so neither the
+    # order of tables nor the facet count triggers get in the way
+    start = time.monotonic()
+    pg.run('pg_restore', '-U', args.user, '-d', target, '--section=pre-data', dump)
+    timings['pre_data'] = round(time.monotonic() - start, 3)
+
+    start = time.monotonic()
+    with pg.script(target) as script:
+        for table, blob_column in BLOB_COLUMNS.items():
+            load_rows(script, store, path, table, blob_column)
+        for table in SEQUENCE_TABLES:
+            script.write(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"COALESCE((SELECT max(id) FROM {table}), 0) + 1, false);\n"
+            )
+    timings['load_rows'] = round(time.monotonic() - start, 3)
+
+    for section in ('data', 'post-data'):
+        start = time.monotonic()
+        pg.run('pg_restore', '-U', args.user, '-d', target, '-j', str(args.jobs), f"--section={section}", dump)
+        timings[section.replace('-', '_')] = round(time.monotonic() - start, 3)
+
+    pg.query("ANALYZE", dbname=target)
+    return timings
+
+def verify(args, pg, name):
+    """Restore a backup into a scratch database and compare it with the manifest."""
+    path = os.path.join(args.backup_dir, name)
+    manifest = read_manifest(path)
+    scratch = f"{args.dbname}_verify"
+    pg.run('dropdb', '-U', args.user, '--if-exists', scratch)
+
+    problems = []
+    try:
+        timings = restore(args, pg, name, scratch)
+
+        for table, info in manifest['tables'].items():
+            restored = int(pg.query(f'SELECT count(*) FROM "{table}"', dbname=scratch)[0][0])
+            if restored != info['rows']:
+                problems.append(f"{table}: {restored} rows, expected {info['rows']}")
+
+        for table, blob_column in BLOB_COLUMNS.items():
+            restored = {
+                digest for (digest,) in pg.query(
+                    f"SELECT DISTINCT encode(sha256({blob_column}), 'hex') FROM {table} "
+                    f"WHERE {blob_column} IS NOT NULL", dbname=scratch)
+            }
+            expected = {row[-1] for row in read_rows(os.path.join(path, f"{table}.csv.gz")) if row[-1] != NULL}
+            if restored != expected:
+                problems.append(f"{table}.{blob_column}: {len(expected ^ restored)} blobs differ")
+    finally:
+        if not args.keep_scratch:
+            pg.run('dropdb', '-U', args.user, '--if-exists', scratch)
+
+    manifest['verification'] = {
+        'verified_at': datetime.now().isoformat(timespec='seconds'),
+        'status': 'failed' if problems else 'ok',
+        'problems': problems,
+        'timings': timings,
+    }
+    write_manifest(path, manifest)
+    append_log(args.backup_dir, {'name': name, 'verification': manifest['verification']})
+
+    if problems:
+        print(f"Verification of {name} FAILED:\n  " + "\n  ".join(problems))
+        return 1
+    print(f"Verification of {name} passed ({sum(timings.values()):.1f}s)")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument('command', nargs='?', default='backup', choices=('backup', 'verify', 'restore'))
+    parser.add_argument('name', nargs='?', help='backup to verify or restore (default: latest)')
+    parser.add_argument('target', nargs='?', help='database to restore into')
+    parser.add_argument('--backup-dir', default=os.environ.get('BACKUP_DIR', '/opt/sewing-patterns/backups'))
+    parser.add_argument('--container', default=os.environ.get('DB_CONTAINER', 'sewing_patterns_db'),
+                        help="database container; pass '' to run the tools locally")
+    parser.add_argument('--container-backup-dir', default=os.environ.get('CONTAINER_BACKUP_DIR', '/backups'),
+                        help='where the container sees --backup-dir')
+    parser.add_argument('--user', default=os.environ.get('DB_USER', 'user'))
+    parser.add_argument('--dbname', default=os.environ.get('DB_NAME', 'sewing_patterns'))
+    parser.add_argument('--jobs', type=int, default=4, help='parallel pg_dump/pg_restore jobs')
+    parser.add_argument('--compress', type=int, default=6, help='pg_dump compression level')
+    parser.add_argument('--keep', type=int, default=7, help='number of backups to keep')
+    parser.add_argument('--verify', action='store_true', help='verify the backup after taking it')
+    parser.add_argument('--keep-scratch', action='store_true', help='keep the verification database')
+    args = parser.parse_args()
+
+    if not args.container:
+        args.container_backup_dir = args.backup_dir
+    os.makedirs(args.backup_dir, exist_ok=True)
+    pg = Postgres(args.container or None, args.user, args.dbname)
+
+    if args.command == 'backup':
+        name = take_backup(args, pg)
+        return verify(args, pg, name) if args.verify else 0
+
+    name = args.name or (list_backups(args.backup_dir) or [None])[-1]
+    if not name:
+        print("No backups found", file=sys.stderr)
+        return 1
+    if args.command == 'verify':
+        return verify(args, pg, name)
+    if not args.target:
+        print("restore needs a target database name", file=sys.stderr)
+        return 1
+    restore(args, pg, name, args.target)
+    print(f"Restored {name} into {args.target}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
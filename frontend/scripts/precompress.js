@@ -0,0 +1,61 @@
+// Writes .br and .gz copies of the compressible files in dist/ after
+// `vite build`, for the backend to serve by Accept-Encoding
+// (backend/frontend.py). Copies that don't save space are skipped.
+//
+//   node scripts/precompress.js [dir]
+import { readdir, readFile, writeFile, unlink } from 'node:fs/promises'
+import { join, extname } from 'node:path'
+import { brotliCompressSync, gzipSync, constants } from 'node:zlib'
+
+const COMPRESSIBLE = new Set(['.html', '.js', '.mjs', '.css', '.svg', '.json', '.map', '.txt', '.xml', '.ico', '.webmanifest'])
+
+// Smaller files fit in a packet or two anyway
+const MIN_SIZE = 1024
+
+const VARIANTS = [
+  ['.br', (data) => brotliCompressSync(data, {
+    params: {
+      [constants.BROTLI_PARAM_QUALITY]: constants.BROTLI_MAX_QUALITY,
+      [constants.BROTLI_PARAM_SIZE_HINT]: data.length,
+    },
+  })],
+  ['.gz', (data) => gzipSync(data, { level: constants.Z_BEST_COMPRESSION })],
+]
+
+async function* files(dir) {
+  for (const entry of await readdir(dir, { withFileTypes: true })) {
+    const path = join(dir, entry.name)
+    if (entry.isDirectory()) {
+      yield* files(path)
+    } else {
+      yield path
+    }
+  }
+}
+
+async function precompress(dir) {
+  let original = 0
+  let smallest = 0
+  for await (const path of files(dir)) {
+    if (!COMPRESSIBLE.has(extname(path))) continue
+    const data = await readFile(path)
+    if (data.length < MIN_SIZE) continue
+
+    let best = data.length
+    for (const [suffix, compress] of VARIANTS) {
+      const compressed = compress(data)
+      if (compressed.length < data.length) {
+        await writeFile(path + suffix, compressed)
+        best = Math.min(best, compressed.length)
+      } else {
+        // Don't leave a stale copy from an earlier build behind
+        await unlink(path + suffix).catch(() => {})
+      }
+    }
+    original += data.length
+    smallest += best
+  }
+  console.log(`precompressed ${dir}: ${original} bytes -> ${smallest} bytes (best encoding per file)`)
+}
+
+await precompress(process.argv[2] ?? 'dist')
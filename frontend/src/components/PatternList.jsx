@@ -201,15 +201,16 @@ function PatternList({
                         {pattern.pdf_files.map((pdf) => (
                           <li key={pdf.id || `pdf-${Math.random()}`}>
                             <a
-                              // Fix PDF URL by ensuring it has the correct base URL
-                              href={pdf.url && pdf.url.startsWith('http') 
-                                ? pdf.url 
-                                : `${API_BASE_URL}${pdf.url || `/api/pdfs/${pdf.id}`}`}
+                              // Fix PDF URL by ensuring it has the correct base URL; the
+                              // API's pdf_url is signed, so the link works without a token
+                              href={pdf.pdf_url && pdf.pdf_url.startsWith('http') 
+                                ? pdf.pdf_url 
+                                : `${API_BASE_URL}${pdf.pdf_url || `/api/pdfs/${pdf.id}`}`}
                               target="_blank"
                               rel="noopener noreferrer"
                               onClick={(e) => {
                                 e.stopPropagation();
-                                console.log("Opening PDF:", pdf.url);
+                                console.log("Opening PDF:", pdf.pdf_url);
                               }}
                             >
                               {pdf.category || "Document"} (